@@ -1,29 +1,75 @@
 from flask import Flask, render_template, request, session, redirect, url_for, jsonify
 import os
+import asyncio
 import qrcode
 import base64
 from io import BytesIO
-from src.voting import create_ballot
-from src.bulletin_board import BulletinBoard
+from src.bulletin_board import get_bulletin_board, COMMIT_TIMEOUT
+from src.db import init_db, get_voter, AlreadyVotedError
+from src.tally import get_tally_result_service
+from src.precompute import get_randomness_pool
+from src.workers import get_crypto_pool, build_ballot, PoolSaturated
+from src.voting import ballot_from_client
+from src.keygen import load_public_key
+from src.eligibility import get_eligibility_index, canonical_voter_id
+from src.otp import get_otp_store, RateLimited
+
+ELECTION_OPEN = True # Global State Switch
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
-# Mock Database for Identity
-import random
-from src.voting import create_ballot
-from src.bulletin_board import BulletinBoard
-from src.db import get_voter, mark_voter_as_voted
-from src.tally import reveal_result_with_shares
+def init_services():
+    """
+    Startup work of a serving process, run by the entry points (python
+    app.py, asgi.py) and not at import: the crypto workers are spawned
+    processes that re-import the main module, and must not each load the
+    voter roll or start refill threads.
+    """
+    # Initialize DB (if new env)
+    init_db()
 
-ELECTION_OPEN = True # Global State Switch
+    # Voter roll in memory: login rejections and double-vote checks skip SQLite
+    get_eligibility_index()
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)
+    # Start precomputing ballot randomness while the kiosk is idle
+    try:
+        get_randomness_pool()
+    except FileNotFoundError as e:
+        print(f"Randomness pool not started: {e}")
 
-# Initialize DB (if new env)
-from src.db import init_db
-init_db()
+def board():
+    # Committed batches have their proofs verified in the crypto worker processes
+    return get_bulletin_board(verify_pool=get_crypto_pool())
+
+def rate_limited(e):
+    response = jsonify({"error": "Too many attempts. Please wait and try again."})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def commit_timed_out():
+    # The ballot may still be committed later: the client must check before retrying
+    return jsonify({"error": "Ballot not confirmed in time. Check your voting status before retrying."}), 504
+
+async def await_commit(ballot, user_id):
+    """Block index of the ballot once the board commits it; asyncio.TimeoutError after COMMIT_TIMEOUT."""
+    return await asyncio.wait_for(asyncio.wrap_future(board().submit(ballot, voter_id=user_id)), COMMIT_TIMEOUT)
+
+def pool_saturated(e):
+    # Backpressure: every crypto worker slot is taken
+    response = jsonify({"error": "Server busy. Please retry shortly."})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+async def cast_ballot(vote_val, kiosk_id, user_id):
+    """Encrypt + prove in a worker process, then publish; returns (ballot, block index)."""
+    # A precomputed nonce if one is ready; on a miss the worker draws fresh randomness
+    nonce = get_randomness_pool().try_take()
+    ballot = await build_ballot(get_crypto_pool(), vote_val, kiosk_id, nonce)
+    block_index = await await_commit(ballot, user_id)
+    return ballot, block_index
 
 @app.route('/')
 def home():
@@ -36,21 +82,31 @@ def home():
 def login():
     # Step 1: Verify ID and Send OTP
     data = request.get_json() if request.is_json else request.form
-    aadhaar = data.get('aadhaar')
-    voter = get_voter(aadhaar)
+    # Stored form ("1234-5678-9012"), so the index, the voters table, the
+    # OTP store and the session all see the same ID
+    aadhaar = canonical_voter_id(data.get('aadhaar'))
+    try:
+        # Every attempt counts, including unknown IDs: this slows ID
+        # enumeration down, but the answers still tell unknown, eligible
+        # and already-voted IDs apart
+        get_otp_store().check_ip(request.remote_addr)
+    except RateLimited as e:
+        return rate_limited(e)
+    # Unknown and already-voted IDs are answered from the in-memory index
+    has_voted = get_eligibility_index().lookup(aadhaar)
+    if has_voted:
+        return jsonify({"error": "This Aadhaar ID has already voted."}) if request.is_json else render_template('login.html', error="Already Voted")
+
+    # Name and phone for the OTP step: the only disk read, and only for eligible IDs
+    voter = get_voter(aadhaar) if has_voted is False else None
     
     if voter:
-        if voter['has_voted']:
-            return jsonify({"error": "This Aadhaar ID has already voted."}) if request.is_json else render_template('login.html', error="Already Voted")
-        
-        # Security: Generate Mock OTP (In prod, send via SMS)
-        otp = str(random.randint(100000, 999999))
-        session['otp'] = otp
-        session['user_pending'] = aadhaar
-        session['name_pending'] = voter['name']
-        session['phone'] = voter['phone']
-        
-        print(f"[OTP] Generated for {aadhaar}: {otp}") # Debug log
+        # Security: the code stays server-side (OTP store) and goes out through
+        # the delivery backend; the session only carries the challenge token
+        try:
+            session['otp_challenge'] = get_otp_store().issue(aadhaar, voter['phone'])
+        except RateLimited as e:
+            return rate_limited(e)
         
         if request.is_json:
             return jsonify({"status": "otp_sent", "message": "OTP sent to registered mobile."})
@@ -65,19 +121,25 @@ def verify_otp():
     # Step 2: Verify OTP and Login
     data = request.get_json() if request.is_json else request.form
     user_otp = data.get('otp')
+    challenge = session.get('otp_challenge')
+    store = get_otp_store()
     
-    if 'otp' not in session or 'user_pending' not in session:
+    if challenge is None or not store.is_pending(challenge):
+         session.pop('otp_challenge', None)
          return jsonify({"error": "Session Expired. Login again."}), 401
+
+    try:
+        store.check_ip(request.remote_addr)
+    except RateLimited as e:
+        return rate_limited(e)
          
-    if user_otp == session['otp']:
+    aadhaar = store.verify(challenge, user_otp)
+    if aadhaar is not None:
         # Success! Promote to full session
-        session['user'] = session['user_pending']
-        session['name'] = session['name_pending']
-        
-        # Cleanup temp vars
-        session.pop('otp', None)
-        session.pop('user_pending', None)
-        session.pop('name_pending', None)
+        voter = get_voter(aadhaar)
+        session.pop('otp_challenge', None)
+        session['user'] = aadhaar
+        session['name'] = voter['name']
         
         return jsonify({"status": "success"})
     
@@ -90,9 +152,8 @@ def vote_page():
         
     # STRICT CHECK: If already voted, force logout
     user_id = session['user']
-    voter = get_voter(user_id) # Re-fetch from DB
     
-    if voter and voter['has_voted']:
+    if get_eligibility_index().lookup(user_id):
         session.clear()
         return redirect(url_for('home', message="Security Alert: You have already voted."))
         
@@ -101,7 +162,7 @@ def vote_page():
     return render_template('vote.html', name=session['name'])
 
 @app.route('/submit_vote', methods=['POST'])
-def submit_vote():
+async def submit_vote():
     global ELECTION_OPEN
     if not ELECTION_OPEN:
          return jsonify({"error": "Election is Closed."}), 403
@@ -111,8 +172,7 @@ def submit_vote():
     
     # STRICT CHECK: Prevent Double Voting via API/POST duplication
     user_id = session['user']
-    voter = get_voter(user_id)
-    if voter and voter['has_voted']:
+    if get_eligibility_index().lookup(user_id):
         return jsonify({"error": "Security: Vote already cast."}), 403
     
     try:
@@ -121,20 +181,11 @@ def submit_vote():
             return jsonify({"error": "Invalid Vote"}), 400
             
         # 1. Create Ballot (Encrypt + ZKP)
+        # 2. Publish to Ledger and Mark User as Voted (one transaction)
         # Using a dummy kiosk ID for now
-        ballot = create_ballot(vote_val, kiosk_id="kiosk-web-01")
+        ballot, block_index = await cast_ballot(vote_val, "kiosk-web-01", user_id)
         
-        # 2. Publish to Ledger
-        bb = BulletinBoard()
-        block_index = bb.publish(ballot)
-        
-        # 3. Mark User as Voted
-        user_id = session['user']
-        
-        # 3. Mark User as Voted
-        mark_voter_as_voted(session['user'])
-        
-        # 4. Generate Receipt Data
+        # 3. Generate Receipt Data
         receipt_data = {
             "block": block_index,
             "hash": ballot['ciphertext'][:20] + "...", # Shorten for UI
@@ -146,6 +197,12 @@ def submit_vote():
         
         return jsonify({"status": "success"})
         
+    except PoolSaturated as e:
+        return pool_saturated(e)
+    except asyncio.TimeoutError:
+        return commit_timed_out()
+    except AlreadyVotedError:
+        return jsonify({"error": "Security: Vote already cast."}), 403
     except Exception as e:
         print(e)
         return jsonify({"error": str(e)}), 500
@@ -187,16 +244,12 @@ def results_page():
                                open=True, 
                                message="Polls are still open. Results hidden.")
     
-    # Election Closed -> Compute Tally
-    # 1. Get Decrypted Sum (YES votes)
-    yes_votes = reveal_result_with_shares([1, 2, 3]) # Using threshold 3
-    
-    # 2. Get Total Ballots cast to infer NO votes
-    bb = BulletinBoard()
-    ledger = bb.get_all_ballots()
-    total_votes = len(ledger)
-    
-    no_votes = total_votes - yes_votes
+    # Election Closed -> Signed result for the current ledger tip
+    # (decrypted once from the running tally with shares 1, 2, 3, then cached)
+    result = get_tally_result_service().get_result(board())
+    yes_votes = result['yes_votes']
+    no_votes = result['no_votes']
+    total_votes = result['total_votes']
     
     winner = "TIE"
     if yes_votes > no_votes:
@@ -213,13 +266,67 @@ def results_page():
 
 # --- JSON API for Mobile App ---
 
+@app.route('/api/pool_stats')
+def pool_stats():
+    # Hit / miss counters of the precomputed randomness pool
+    return jsonify(get_randomness_pool().stats())
+
+@app.route('/api/worker_stats')
+def worker_stats():
+    # Load and backpressure counters of the crypto worker pool
+    return jsonify(get_crypto_pool().stats())
+
 @app.route('/api/login', methods=['POST'])
 def api_login():
     # Replaced by main /login which now supports JSON
     return login()
 
+@app.route('/api/public_key')
+def api_public_key():
+    # Everything a client needs to encrypt and prove its own ballot (g = n + 1)
+    public_key = load_public_key()
+    return jsonify({"n": str(public_key.n), "g": str(public_key.g)})
+
+@app.route('/api/cast_encrypted', methods=['POST'])
+async def api_cast_encrypted():
+    # Ballot encrypted and proven on the client (static/js/crypto.js):
+    # the server never sees the vote and only verifies the proof. The kiosk
+    # is set here, never taken from the request: a client-chosen kiosk_id
+    # would tag (and could later pick out) individual ballots in subtotals
+    if not ELECTION_OPEN:
+         return jsonify({"error": "Election is Closed."}), 403
+
+    if 'user' not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if get_eligibility_index().lookup(session['user']):
+        return jsonify({"error": "Already Voted"}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        ballot = ballot_from_client(data.get('ciphertext'), data.get('proof'),
+                                    kiosk_id="mobile-app")
+        # The board verifies the proof before committing (ValueError if invalid)
+        block_index = await await_commit(ballot, session['user'])
+    except asyncio.TimeoutError:
+        return commit_timed_out()
+    except AlreadyVotedError:
+        return jsonify({"error": "Already Voted"}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    receipt_data = {
+        "block": block_index,
+        "hash": ballot['ciphertext'][:20] + "...",
+        "ballot_id": ballot['ballot_id']
+    }
+    session['receipt'] = receipt_data
+    return jsonify({"status": "success", "receipt": receipt_data})
+
 @app.route('/api/vote', methods=['POST'])
-def api_vote():
+async def api_vote():
     global ELECTION_OPEN
     if not ELECTION_OPEN:
          return jsonify({"error": "Election is Closed."}), 403
@@ -227,10 +334,8 @@ def api_vote():
     if 'user' not in session:
         return jsonify({"error": "Unauthorized"}), 401
 
-    voter = get_voter(session['user'])
-
     # STRICT CHECK: API Double Voting
-    if voter and voter['has_voted']:
+    if get_eligibility_index().lookup(session['user']):
         return jsonify({"error": "Already Voted"}), 403
     
     data = request.get_json()
@@ -239,12 +344,7 @@ def api_vote():
         if vote_val not in [0, 1]:
             return jsonify({"error": "Invalid Vote"}), 400
             
-        ballot = create_ballot(vote_val, kiosk_id="mobile-app")
-        bb = BulletinBoard()
-        
-        block_index = bb.publish(ballot)
-        
-        mark_voter_as_voted(session['user'])
+        ballot, block_index = await cast_ballot(vote_val, "mobile-app", session['user'])
         
         receipt_data = {
             "block": block_index,
@@ -253,11 +353,18 @@ def api_vote():
         }
         return jsonify({"status": "success", "receipt": receipt_data})
         
+    except PoolSaturated as e:
+        return pool_saturated(e)
+    except asyncio.TimeoutError:
+        return commit_timed_out()
+    except AlreadyVotedError:
+        return jsonify({"error": "Already Voted"}), 403
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
     print("Starting Kiosk Web Server...")
+    init_services()
     
     # Print Actual IDs for User Convenience
     try:
@@ -272,6 +379,7 @@ if __name__ == '__main__':
     # Using port 5001 to avoid macOS AirPlay Receiver conflict on port 5000
     # Turning off debug mode for stability in background execution
     # Enabling HTTPS with self-signed certs
+    # (for the async serving mode run asgi.py under uvicorn instead)
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     cert_path = os.path.join(BASE_DIR, 'cert.pem')
     key_path = os.path.join(BASE_DIR, 'key.pem')
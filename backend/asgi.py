@@ -0,0 +1,26 @@
+"""
+Async serving mode: uvicorn in front of the Flask app. Each request runs on
+one of SERVER_THREADS threads (a2wsgi), and the async views wait there for
+the ballot crypto running in the worker pool (src/workers.py). Requests are
+served concurrently, up to the thread count.
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5001 \
+        --ssl-certfile cert.pem --ssl-keyfile key.pem
+
+CRYPTO_WORKERS (default: one per core) and CRYPTO_QUEUE_DEPTH set the pool
+size and how many jobs per worker are admitted before HTTP 503.
+SERVER_THREADS defaults to twice the admitted jobs, so page loads and
+logins still get a thread while every crypto slot is busy.
+
+(asgiref's WsgiToAsgi is not used: it runs every request on one
+thread-sensitive thread, one at a time.)
+"""
+import os
+from a2wsgi import WSGIMiddleware
+from app import app, init_services
+from src.workers import CRYPTO_WORKERS, CRYPTO_QUEUE_DEPTH
+
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 0)) or 2 * CRYPTO_WORKERS * CRYPTO_QUEUE_DEPTH
+
+init_services()
+asgi_app = WSGIMiddleware(app, workers=SERVER_THREADS)
@@ -2,7 +2,6 @@ import os
 import sys
 import shutil
 import json
-from secrets import token_hex
 
 # Add parent dir to path to import backend modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -23,22 +22,6 @@ def setup_trustee_dirs(trustees):
         paths[t] = path
     return paths
 
-def split_secret(secret_int, threshold, num_shares, prime):
-    """
-    Shamir's Secret Sharing implementation.
-    Splits 'secret_int' into 'num_shares' where 'threshold' are needed to reconstruct.
-    """
-    # Coefficients: a0 = secret, a1...ak-1 are random
-    coeffs = [secret_int] + [int(token_hex(32), 16) % prime for _ in range(threshold - 1)]
-    
-    shares = []
-    for x in range(1, num_shares + 1):
-        # f(x) = sum(ai * x^i) mod p
-        y = sum([coeffs[i] * pow(x, i, prime) for i in range(threshold)]) % prime
-        shares.append((x, y))
-        
-    return shares
-
 def run_ceremony():
     print("--- ELECTION KEY CEREMONY 2029 ---")
     
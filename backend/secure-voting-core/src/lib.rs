@@ -1,42 +1,407 @@
 use pyo3::prelude::*;
-use num_bigint::{BigInt, RandBigInt};
+use num_bigint::{BigInt, BigUint, RandBigInt, Sign};
 use num_integer::Integer;
-use num_traits::{One, Zero};
-use rand::thread_rng;
+use num_traits::{One, Signed, Zero};
+use rand::{thread_rng, Rng};
+use sha2::{Digest, Sha256};
+use std::thread;
+
+/// Size of the random weights in batch verification (same as ZKPVerifier.BATCH_BITS).
+const BATCH_BITS: u64 = 64;
+/// Miller-Rabin rounds for key generation (error < 4^-40).
+const MR_ROUNDS: usize = 40;
+/// Branch challenges live in [0, 2^CHALLENGE_BITS), as zkp.CHALLENGE_BITS.
+const CHALLENGE_BITS: u64 = 256;
+
+/// Paillier public key with the constants every ballot needs (mirrors keygen.PublicKeyContext).
+struct Key {
+    n: BigUint,
+    ns: BigUint,
+    g: BigUint,
+    g_inv: BigUint,
+    hash_prefix: String,
+}
+
+impl Key {
+    fn new(n: BigUint) -> Key {
+        let ns = &n * &n;
+        let g = &n + BigUint::one();
+        let g_inv = g.modinv(&ns).expect("n + 1 is invertible mod n^2");
+        // Every Fiat-Shamir transcript starts with str(n) + str(g)
+        let hash_prefix = format!("{}{}", n, g);
+        Key { n, ns, g, g_inv, hash_prefix }
+    }
+
+    /// g^m mod n^2 for g = n+1: 1 + (m mod n) * n.
+    fn g_pow(&self, m: &BigInt) -> BigUint {
+        let n = BigInt::from(self.n.clone());
+        let m = m.mod_floor(&n).to_biguint().expect("mod_floor is non-negative");
+        (BigUint::one() + m * &self.n) % &self.ns
+    }
+
+    /// Same value as ZKPUtils.hash_nums([n, g, u, *a]).
+    fn challenge(&self, u: &BigUint, a: &[BigUint]) -> BigInt {
+        let mut h = Sha256::new();
+        h.update(self.hash_prefix.as_bytes());
+        h.update(u.to_string().as_bytes());
+        for x in a {
+            h.update(x.to_string().as_bytes());
+        }
+        BigInt::from_bytes_be(Sign::Plus, &h.finalize())
+    }
+
+    /// base^e mod modulus for a signed exponent (negative -> modular inverse).
+    fn pow_signed(base: &BigUint, e: &BigInt, modulus: &BigUint) -> Option<BigUint> {
+        if e.is_negative() {
+            Some(base.modinv(modulus)?.modpow(e.magnitude(), modulus))
+        } else {
+            Some(base.modpow(e.magnitude(), modulus))
+        }
+    }
+}
+
+/// Runs `f` over `items` on all cores (scoped threads, order preserved).
+fn par_map<T: Sync, R: Send>(items: &[T], f: impl Fn(&T) -> R + Sync) -> Vec<R> {
+    let workers = thread::available_parallelism().map(|n| n.get()).unwrap_or(1);
+    if workers == 1 || items.len() < 2 {
+        return items.iter().map(&f).collect();
+    }
+    let chunk = (items.len() + workers - 1) / workers;
+    thread::scope(|s| {
+        let handles: Vec<_> = items
+            .chunks(chunk)
+            .map(|part| {
+                let f = &f;
+                s.spawn(move || part.iter().map(f).collect::<Vec<R>>())
+            })
+            .collect();
+        handles.into_iter().flat_map(|h| h.join().expect("worker panicked")).collect()
+    })
+}
+
+fn random_unit(n: &BigUint) -> BigUint {
+    let mut rng = thread_rng();
+    loop {
+        let r = rng.gen_biguint_range(&BigUint::one(), n);
+        if r.gcd(n).is_one() {
+            return r;
+        }
+    }
+}
+
+/// x == +-y mod `modulus`, as ZKPUtils.equal_up_to_sign: -1 is an n-th power
+/// for odd n, so a branch equation off by -1 proves the same statement.
+fn equal_up_to_sign(x: &BigUint, y: &BigUint, modulus: &BigUint) -> bool {
+    let y = y % modulus;
+    *x == y || *x == (modulus - &y) % modulus
+}
+
+/// ZKPUtils.challenge_matches: challenges in range add up to the hash mod
+/// 2^CHALLENGE_BITS; legacy (out-of-range) challenges must add up exactly.
+fn challenge_matches(total: &BigInt, e: &[BigInt]) -> bool {
+    let modulus = BigInt::one() << CHALLENGE_BITS;
+    let sum: BigInt = e.iter().sum();
+    if e.iter().all(|x| !x.is_negative() && *x < modulus) {
+        sum.mod_floor(&modulus) == *total
+    } else {
+        sum == *total
+    }
+}
+
+/// ZKPVerifier.well_formed: u and the a_j are units mod n^2, the z_j units
+/// mod n. a = z = 0 would otherwise satisfy every branch for any u.
+fn well_formed(key: &Key, u: &BigUint, a: &[BigUint], z: &[BigUint]) -> bool {
+    let (n, ns) = (&key.n, &key.ns);
+    let unit = |x: &BigUint, modulus: &BigUint| !x.is_zero() && x < modulus && x.gcd(n).is_one();
+    unit(u, ns) && a.iter().all(|x| unit(x, ns)) && z.iter().all(|x| unit(x, n))
+}
+
+fn encrypt_one(key: &Key, m: u32, r: &BigUint) -> BigUint {
+    (key.g_pow(&BigInt::from(m)) * r.modpow(&key.n, &key.ns)) % &key.ns
+}
+
+/// CDS OR-proof that u encrypts 0 or 1, exactly as ZKPProver.prove_vote.
+fn prove_one(key: &Key, u: &BigUint, vote: u8, r: &BigUint) -> Option<(Vec<BigUint>, Vec<BigInt>, Vec<BigUint>)> {
+    let (n, ns) = (&key.n, &key.ns);
+    let mut rng = thread_rng();
+    let one = BigUint::one();
+    let n_plus_one = n + &one;
+
+    let real = vote as usize;
+    let fake = 1 - real;
+    let mut a = vec![BigUint::zero(), BigUint::zero()];
+    let mut e = vec![BigInt::zero(), BigInt::zero()];
+    let mut z = vec![BigUint::zero(), BigUint::zero()];
+
+    let w = rng.gen_biguint_range(&one, &(n / 2u32 + &one));
+
+    // Simulated branch: a = z^n * (u / g^fake)^-e
+    let e_fake = rng.gen_biguint(CHALLENGE_BITS);
+    let z_fake = rng.gen_biguint_range(&one, &n_plus_one);
+    let inv_u = u.modinv(ns)?;
+    let base = if fake == 0 { inv_u } else { (inv_u * &key.g) % ns };
+    a[fake] = (z_fake.modpow(n, ns) * base.modpow(&e_fake, ns)) % ns;
+    e[fake] = BigInt::from(e_fake);
+    z[fake] = z_fake;
+
+    // Real branch
+    a[real] = w.modpow(n, ns);
+    let total = key.challenge(u, &a);
+    e[real] = (&total - &e[fake]).mod_floor(&(BigInt::one() << CHALLENGE_BITS));
+    z[real] = (w * Key::pow_signed(r, &e[real], n)?) % n;
+
+    Some((a, e, z))
+}
+
+/// Per-ballot check, same as ZKPVerifier.verify.
+fn verify_one(key: &Key, u: &BigUint, a: &[BigUint], e: &[BigInt], z: &[BigUint]) -> bool {
+    if a.len() < 2 || e.len() < 2 || z.len() < 2 {
+        return false;
+    }
+    if !well_formed(key, u, &a[..2], &z[..2]) {
+        return false;
+    }
+    if !challenge_matches(&key.challenge(u, &a[..2]), &e[..2]) {
+        return false;
+    }
+    let ns = &key.ns;
+    let rhs0 = match Key::pow_signed(u, &e[0], ns) {
+        Some(x) => (&a[0] * x) % ns,
+        None => return false,
+    };
+    if !equal_up_to_sign(&z[0].modpow(&key.n, ns), &rhs0, ns) {
+        return false;
+    }
+    let val = (u * &key.g_inv) % ns;
+    let rhs1 = match Key::pow_signed(&val, &e[1], ns) {
+        Some(x) => (&a[1] * x) % ns,
+        None => return false,
+    };
+    equal_up_to_sign(&z[1].modpow(&key.n, ns), &rhs1, ns)
+}
+
+/// Random linear combination of all branch equations (see ZKPVerifier.verify_batch).
+fn combined_check(key: &Key, items: &[&ProofItem]) -> bool {
+    let (n, ns) = (&key.n, &key.ns);
+    let mut rng = thread_rng();
+    let mut lhs_z = BigUint::one();
+    let mut lhs_u = BigUint::one();
+    let mut rhs = BigUint::one();
+    let mut g_exp = BigInt::zero();
+    for (u, a, e, z) in items.iter().map(|item| (&item.0, &item.1, &item.2, &item.3)) {
+        // Malformed values fail the group; verify_one then rejects them
+        if !well_formed(key, u, &a[..2], &z[..2]) {
+            return false;
+        }
+        let mut u_exp = BigInt::zero();
+        for j in 0..2 {
+            let d = BigUint::from(rng.gen_range(1..u64::MAX) >> (64 - BATCH_BITS));
+            lhs_z = (lhs_z * z[j].modpow(&d, ns)) % ns;
+            rhs = (rhs * a[j].modpow(&d, ns)) % ns;
+            let weighted = BigInt::from(d) * &e[j];
+            if j == 1 {
+                g_exp -= &weighted;
+            }
+            u_exp += weighted;
+        }
+        if u_exp.is_negative() {
+            lhs_u = (lhs_u * u.modpow(u_exp.magnitude(), ns)) % ns;
+        } else {
+            rhs = (rhs * u.modpow(u_exp.magnitude(), ns)) % ns;
+        }
+    }
+    // A -1 factor can survive an odd weight: accepted up to sign, like verify_one
+    let lhs = (lhs_z.modpow(n, ns) * lhs_u) % ns;
+    let rhs = (rhs * key.g_pow(&g_exp)) % ns;
+    equal_up_to_sign(&lhs, &rhs, ns)
+}
+
+type ProofItem = (BigUint, Vec<BigUint>, Vec<BigInt>, Vec<BigUint>);
+
+/// Encrypts many 0/1 votes. Returns (ciphertext, r) per vote; r is drawn
+/// here unless `rs` supplies it.
+#[pyfunction]
+#[pyo3(signature = (n, votes, rs=None))]
+fn encrypt_votes(py: Python<'_>, n: BigUint, votes: Vec<u32>, rs: Option<Vec<BigUint>>) -> PyResult<Vec<(BigUint, BigUint)>> {
+    if votes.iter().any(|&v| v > 1) {
+        return Err(pyo3::exceptions::PyValueError::new_err("Vote must be 0 or 1"));
+    }
+    if let Some(rs) = &rs {
+        if rs.len() != votes.len() {
+            return Err(pyo3::exceptions::PyValueError::new_err("One r per vote"));
+        }
+    }
+    Ok(py.allow_threads(|| {
+        let key = Key::new(n);
+        let indices: Vec<usize> = (0..votes.len()).collect();
+        par_map(&indices, |&i| {
+            let r = match &rs {
+                Some(rs) => rs[i].clone(),
+                None => random_unit(&key.n),
+            };
+            (encrypt_one(&key, votes[i], &r), r)
+        })
+    }))
+}
+
+/// OR-proofs for many (ciphertext, vote, r). Returns (a, e, z) lists per ballot.
+#[pyfunction]
+fn prove_votes(py: Python<'_>, n: BigUint, items: Vec<(BigUint, u8, BigUint)>) -> PyResult<Vec<(Vec<BigUint>, Vec<BigInt>, Vec<BigUint>)>> {
+    if items.iter().any(|item| item.1 > 1) {
+        return Err(pyo3::exceptions::PyValueError::new_err("Can only prove votes 0 or 1"));
+    }
+    let proofs = py.allow_threads(|| {
+        let key = Key::new(n);
+        par_map(&items, |(u, vote, r)| prove_one(&key, u, *vote, r))
+    });
+    proofs
+        .into_iter()
+        .map(|p| p.ok_or_else(|| pyo3::exceptions::PyValueError::new_err("Ciphertext not invertible mod n^2")))
+        .collect()
+}
+
+/// Exact per-ballot verification of many (ciphertext, a, e, z).
+#[pyfunction]
+fn verify_votes(py: Python<'_>, n: BigUint, items: Vec<ProofItem>) -> Vec<bool> {
+    py.allow_threads(|| {
+        let key = Key::new(n);
+        par_map(&items, |(u, a, e, z)| verify_one(&key, u, a, e, z))
+    })
+}
+
+/// Batch verification: one combined check per thread's share of the
+/// ballots, falling back to exact checks where it fails. Same results
+/// as verify_votes.
+#[pyfunction]
+fn batch_verify_votes(py: Python<'_>, n: BigUint, items: Vec<ProofItem>) -> Vec<bool> {
+    py.allow_threads(|| {
+        let key = Key::new(n);
+        // Challenges first: a bad hash fails the ballot outright
+        let hashed = par_map(&items, |(u, a, e, z)| {
+            a.len() >= 2 && e.len() >= 2 && z.len() >= 2 && challenge_matches(&key.challenge(u, &a[..2]), &e[..2])
+        });
+        let candidates: Vec<usize> = (0..items.len()).filter(|&i| hashed[i]).collect();
+
+        let workers = thread::available_parallelism().map(|n| n.get()).unwrap_or(1);
+        let chunk = ((candidates.len() + workers - 1) / workers).max(1);
+        let groups: Vec<&[usize]> = candidates.chunks(chunk).collect();
+        let passed = par_map(&groups, |group| {
+            let refs: Vec<&ProofItem> = group.iter().map(|&i| &items[i]).collect();
+            combined_check(&key, &refs)
+        });
+
+        let mut results = vec![false; items.len()];
+        let mut retry = Vec::new();
+        for (group, ok) in groups.iter().zip(passed) {
+            for &i in group.iter() {
+                if ok {
+                    results[i] = true;
+                } else {
+                    retry.push(i);
+                }
+            }
+        }
+        let exact = par_map(&retry, |&i| {
+            let (u, a, e, z) = &items[i];
+            verify_one(&key, u, a, e, z)
+        });
+        for (i, ok) in retry.into_iter().zip(exact) {
+            results[i] = ok;
+        }
+        results
+    })
+}
+
+/// Homomorphic sum: product of the ciphertexts mod n^2, reduced in parallel.
+#[pyfunction]
+fn ciphertext_product(py: Python<'_>, nsquare: BigUint, ciphertexts: Vec<BigUint>) -> BigUint {
+    py.allow_threads(|| {
+        let workers = thread::available_parallelism().map(|n| n.get()).unwrap_or(1);
+        let chunk = ((ciphertexts.len() + workers - 1) / workers).max(1);
+        let parts: Vec<&[BigUint]> = ciphertexts.chunks(chunk).collect();
+        let partials = par_map(&parts, |part| {
+            part.iter().fold(BigUint::one(), |acc, c| (acc * c) % &nsquare)
+        });
+        partials.into_iter().fold(BigUint::one() % &nsquare, |acc, p| (acc * p) % &nsquare)
+    })
+}
 
 /// Generates a (n, g) public key and (p, q) private key components.
 /// Returns a tuple of strings: (n, g, p, q)
 #[pyfunction]
-fn generate_keypair(bit_length: usize) -> PyResult<(String, String, String, String)> {
-    let mut rng = thread_rng();
-    
-    // 1. Generate two large primes p and q
-    // Ideally use Miller-Rabin primality test. 
-    // For this prototype, we'll just generate random odd numbers and check is_prime (if available) 
-    // or just assume for speed in this demo (Note: Real implementation needs strict primality testing).
-    // num-bigint doesn't have built-in strict prime gen in standard crate, usually entails a loop.
-    
-    let p = generate_prime(&mut rng, bit_length / 2);
-    let q = generate_prime(&mut rng, bit_length / 2);
-    
-    let n = &p * &q;
-    let g = &n + BigInt::one(); // Simple g=n+1 scheme
-    
+fn generate_keypair(py: Python<'_>, bit_length: usize) -> PyResult<(String, String, String, String)> {
+    if bit_length < 64 {
+        return Err(pyo3::exceptions::PyValueError::new_err("Key too small"));
+    }
+    let (n, g, p, q) = py.allow_threads(|| {
+        let mut rng = thread_rng();
+        loop {
+            // 1. Generate two large primes p and q (Miller-Rabin)
+            let p = generate_prime(&mut rng, bit_length / 2);
+            let q = generate_prime(&mut rng, bit_length / 2);
+            if p == q {
+                continue;
+            }
+            let n = &p * &q;
+            // Paillier with g = n+1 needs gcd(n, (p-1)(q-1)) = 1
+            let phi = (&p - 1u32) * (&q - 1u32);
+            if !n.gcd(&phi).is_one() {
+                continue;
+            }
+            let g = &n + BigUint::one(); // Simple g=n+1 scheme
+            return (n, g, p, q);
+        }
+    });
     Ok((n.to_string(), g.to_string(), p.to_string(), q.to_string()))
 }
 
-// Simple probabilistic prime generator (Fermat test for demo speed)
-// WARNING: Not production secure, just for demo connection
-fn generate_prime(rng: &mut impl RandBigInt, bits: usize) -> BigInt {
+const SMALL_PRIMES: [u32; 24] = [3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97];
+
+fn is_probable_prime(n: &BigUint, rng: &mut impl Rng) -> bool {
+    let two = BigUint::from(2u32);
+    if *n < two {
+        return false;
+    }
+    for &sp in SMALL_PRIMES.iter() {
+        if (n % sp).is_zero() {
+            return *n == BigUint::from(sp);
+        }
+    }
+    if n.is_even() {
+        return *n == two;
+    }
+
+    // n - 1 = d * 2^s
+    let n_minus_one = n - 1u32;
+    let s = n_minus_one.trailing_zeros().unwrap_or(0);
+    let d = &n_minus_one >> s;
+
+    'witness: for _ in 0..MR_ROUNDS {
+        let a = rng.gen_biguint_range(&two, &n_minus_one);
+        let mut x = a.modpow(&d, n);
+        if x.is_one() || x == n_minus_one {
+            continue;
+        }
+        for _ in 1..s {
+            x = (&x * &x) % n;
+            if x == n_minus_one {
+                continue 'witness;
+            }
+        }
+        return false;
+    }
+    true
+}
+
+// Random odd `bits`-bit candidates (top bit set) until one passes Miller-Rabin
+fn generate_prime(rng: &mut impl Rng, bits: usize) -> BigUint {
     loop {
-        let mut candidate: BigInt = rng.gen_bigint(bits as u64);
-        if candidate < BigInt::zero() { candidate = -candidate; }
-        if candidate.is_even() { candidate = candidate + 1; }
-        
-        // This is a placeholder for a real primality test like Miller-Rabin
-        // For the sake of the Rust integration demo, we return the candidate.
-        // In a real optimized implementation, we'd use `openssl` or `glass` crate.
-        return candidate; 
+        let mut candidate = rng.gen_biguint(bits as u64);
+        candidate |= BigUint::one() << (bits - 1);
+        candidate |= BigUint::one();
+        if is_probable_prime(&candidate, rng) {
+            return candidate;
+        }
     }
 }
 
@@ -44,5 +409,10 @@ fn generate_prime(rng: &mut impl RandBigInt, bits: usize) -> BigInt {
 #[pymodule]
 fn secure_voting_core(_py: Python, m: &PyModule) -> PyResult<()> {
     m.add_function(wrap_pyfunction!(generate_keypair, m)?)?;
+    m.add_function(wrap_pyfunction!(encrypt_votes, m)?)?;
+    m.add_function(wrap_pyfunction!(prove_votes, m)?)?;
+    m.add_function(wrap_pyfunction!(verify_votes, m)?)?;
+    m.add_function(wrap_pyfunction!(batch_verify_votes, m)?)?;
+    m.add_function(wrap_pyfunction!(ciphertext_product, m)?)?;
     Ok(())
 }
@@ -0,0 +1,160 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from phe import paillier
+import src.db as db
+from src.db import hash_ledger_entry
+from src.merkle_log import MerkleTree
+from src.zkp import ZKPVerifier
+from src.tally import compute_tally
+
+GENESIS_HASH = "0"*64
+
+def verify_chain(rows, check_merkle=False):
+    """
+    Recomputes the prev_hash chain in a single streaming pass.
+    rows: iterable of (entry, stored_entry_hash) in ledger order.
+    With check_merkle=True the Merkle root stored in every block is
+    recomputed too (frontier-mode tree, O(log N) memory).
+    Returns a report dict; memory use does not depend on ledger size.
+    """
+    expected_prev = GENESIS_HASH
+    blocks = 0
+    errors = []
+    tree = MerkleTree(store_levels=False) if check_merkle else None
+
+    for entry, stored_hash in rows:
+        idx = entry['index']
+        if entry['prev_hash'] != expected_prev:
+            errors.append({"block": idx, "error": "prev_hash does not link to previous block"})
+
+        entry_hash = hash_ledger_entry(entry)
+        if stored_hash is not None and stored_hash != entry_hash:
+            errors.append({"block": idx, "error": "stored entry_hash does not match block content"})
+
+        if tree is not None:
+            tree.add_leaf(json.dumps(entry['ballot'], sort_keys=True))
+            if entry['merkle_root'] != tree.get_root():
+                errors.append({"block": idx, "error": "merkle_root does not match recomputed tree"})
+
+        expected_prev = entry_hash
+        blocks += 1
+
+    report = {
+        "blocks": blocks,
+        "head": expected_prev,
+        "errors": errors,
+        "valid": not errors
+    }
+    if tree is not None:
+        report["merkle_root"] = tree.get_root()
+    return report
+
+def iter_chain_rows(chunk_size=1000):
+    """Yields (entry, stored_entry_hash) from the chunked ledger cursor."""
+    for i, row in enumerate(db.iter_ledger_rows(chunk_size)):
+        # Ledgers from before the entry_hash column only carry prev_hash links
+        stored_hash = row['entry_hash'] if 'entry_hash' in row.keys() else None
+        yield db.row_to_entry(i, row), stored_hash
+
+# --- Parallel ZKP audit ---
+# Each worker opens the ledger itself and verifies an id range with
+# verify_batch, so only (start, stop) and the failing ids cross processes.
+
+_worker_verifier = None
+
+def _init_audit_worker(db_path, n):
+    global _worker_verifier
+    db.DB_PATH = db_path
+    _worker_verifier = ZKPVerifier(paillier.PaillierPublicKey(n=n))
+
+def _verify_id_range(start_id, stop_id, batch_size):
+    ids, items = [], []
+    invalid = []
+    checked = 0
+
+    def flush():
+        for ballot_id, ok in zip(ids, _worker_verifier.verify_batch(items)):
+            if not ok:
+                invalid.append(ballot_id - 1) # block index
+        ids.clear()
+        items.clear()
+
+    for row in db.iter_ledger_rows(batch_size, 'id, ciphertext, proof', start_id, stop_id):
+        try:
+            proof = json.loads(row['proof'])
+        except ValueError:
+            proof = None
+        ids.append(row['id'])
+        items.append((row['ciphertext'], proof))
+        checked += 1
+        if len(items) >= batch_size:
+            flush()
+    flush()
+    return start_id, checked, invalid
+
+def audit_ledger(public_key, workers=None, chunk_size=2000, batch_size=128, on_progress=None):
+    """
+    Full public audit of the SQLite ledger:
+      - every ZKP, in id-range chunks spread over `workers` processes
+        (each chunk verified with ZKPVerifier.verify_batch);
+      - the prev_hash chain, entry hashes and per-block Merkle roots,
+        streamed in this process while the workers run.
+    on_progress(done, total, elapsed) is called as chunks finish.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.time()
+
+    max_id = db.get_max_ballot_id()
+
+    invalid = []
+    verified = 0
+    # spawn, as in CryptoPool: the caller may be the threaded web server
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_audit_worker, initargs=(db.DB_PATH, public_key.n)) as pool:
+        futures = [pool.submit(_verify_id_range, lo, min(lo + chunk_size, max_id + 1), batch_size)
+                   for lo in range(1, max_id + 1, chunk_size)]
+
+        # Sequential hash work overlaps with the ZKP workers
+        chain = verify_chain(iter_chain_rows(), check_merkle=True)
+        total = chain['blocks']
+
+        for future in as_completed(futures):
+            _, checked, bad = future.result()
+            verified += checked
+            invalid.extend(bad)
+            if on_progress:
+                on_progress(verified, total, time.time() - start)
+
+    elapsed = time.time() - start
+    invalid.sort()
+    return {
+        "blocks": chain['blocks'],
+        "proofs_checked": verified,
+        "invalid_proofs": invalid,
+        "chain_errors": chain['errors'],
+        "head": chain['head'],
+        "merkle_root": chain['merkle_root'],
+        "workers": workers,
+        "elapsed": elapsed,
+        "throughput": verified / elapsed if elapsed else 0.0,
+        "valid": chain['valid'] and not invalid and verified == chain['blocks']
+    }
+
+def audit_running_tally(public_key, workers=None):
+    """
+    Recomputes the encrypted tally from scratch over the ballots covered by
+    the stored tally_state checkpoint and compares the two products.
+    """
+    count, stored = db.load_tally_checkpoint(public_key.n)
+    recomputed = compute_tally(public_key, workers=workers, ballot_count=count) if count else None
+    recomputed = recomputed.ciphertext(be_secure=False) if recomputed is not None else 1
+    return {
+        "checkpoint_ballots": count,
+        "ledger_ballots": db.get_max_ballot_id(),
+        "stored_product": stored,
+        "recomputed_product": recomputed,
+        "match": stored == recomputed
+    }
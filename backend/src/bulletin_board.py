@@ -1,72 +1,302 @@
 import os
 import json
-import hashlib
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from phe import paillier
 from src.keygen import load_public_key
 from src.zkp import ZKPVerifier
 from src.merkle_log import MerkleTree
-from src.db import init_db, add_ballot_to_db, get_all_ballots_from_db
+from src.db import (init_db, get_all_ballots_from_db, iter_ledger, get_last_ballot_row,
+                    get_merkle_node, load_merkle_frontier, replace_merkle_nodes,
+                    ledger_entry, hash_ledger_entry, ledger_transaction, claim_voter, insert_ballots,
+                    check_new_ciphertext, DuplicateBallotError,
+                    iter_ciphertexts, load_tally_checkpoint, save_tally_checkpoint)
+from src.tally import multiply_ciphertexts
+from src.workers import verify_ballots
+from src.eligibility import record_vote
+
+GENESIS_HASH = "0"*64
+# Seconds publish() waits for its ballot to be committed
+COMMIT_TIMEOUT = 30
 
 # Resolve paths relative to project root
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # BB_FILE = os.path.join(BASE_DIR, "bb.json") # No longer needed
 
 class BulletinBoard:
-    def __init__(self):
+    """
+    Append-only ledger of verified ballots.
+    Safe to share between request threads: appends are serialized by a lock,
+    ZKP verification runs outside it.
+
+    With group_commit=True a single ingest thread collects ballots arriving
+    within `batch_window` seconds (at most `max_batch`), verifies them,
+    appends them to the Merkle tree and writes them in one transaction.
+
+    The board also keeps the running encrypted tally (product of all accepted
+    ciphertexts mod n^2). It is checkpointed to tally_state in the commit
+    transaction once `tally_checkpoint_every` ballots have accumulated, and
+    rolled forward from the last checkpoint on open.
+
+    With a voting.PackedEncoding the board accepts multi-candidate ballots
+    (one-of-K proofs) instead of 0/1 referendum ballots.
+
+    With a workers.CryptoPool as verify_pool, referendum batches are verified
+    in its worker processes instead of on the committing thread.
+    """
+    def __init__(self, public_key=None, group_commit=False, batch_window=0.005, max_batch=256,
+                 tally_checkpoint_every=100, encoding=None, verify_pool=None):
+        # Public key and verifier are prepared once, not per ballot
+        self.public_key = public_key or load_public_key()
+        self.verifier = ZKPVerifier(self.public_key)
+        self.encoding = encoding
+        self.verify_pool = verify_pool
+        if encoding is not None:
+            encoding.check_key(self.public_key)
+        self._lock = threading.Lock()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.tally_checkpoint_every = tally_checkpoint_every
+        
         # Initialize DB if needed
         # Always ensure DB is initialized (CREATE TABLE IF NOT EXISTS handles idempotency)
         init_db()
-             
-        self.merkle_tree = MerkleTree()
         
-        # Reconstruct Tree from DB
-        ledger = get_all_ballots_from_db()
-        for entry in ledger:
-             self.merkle_tree.add_leaf(json.dumps(entry['ballot'], sort_keys=True))
+        # Reopen the persisted tree (O(log N)) and check it against the ledger tip
+        size, frontier = load_merkle_frontier()
+        self.merkle_tree = MerkleTree.from_frontier(size, frontier, node_loader=get_merkle_node)
+        
+        tip = get_last_ballot_row()
+        ledger_size = tip['id'] if tip else 0
+        stored_root = tip['merkle_root'] if tip else None
+        # Cached chain head: prev_hash for the next block without reading the ledger
+        self.chain_head = tip['entry_hash'] if tip else GENESIS_HASH
+        if size != ledger_size or self.merkle_tree.get_root() != stored_root:
+            print(f"[BB] Merkle state out of sync with ledger ({size} vs {ledger_size} leaves). Rebuilding...")
+            self._rebuild_merkle_tree()
+        
+        self._load_running_tally(ledger_size)
+        
+        self._queue = None
+        if group_commit:
+            self._queue = queue.Queue()
+            threading.Thread(target=self._ingest_loop, name="bb-ingest", daemon=True).start()
+    
+    def _rebuild_merkle_tree(self):
+        """Replays the ledger once and persists the resulting nodes."""
+        self.merkle_tree = MerkleTree(store_levels=False, node_loader=get_merkle_node)
+        nodes = []
+        for entry in iter_ledger():
+            self.merkle_tree.add_leaf(json.dumps(entry['ballot'], sort_keys=True))
+            nodes.extend(self.merkle_tree.last_nodes)
+        replace_merkle_nodes(nodes)
     
-    def publish(self, ballot):
+    def _load_running_tally(self, ledger_size):
+        """Last checkpoint, rolled forward over the ballots committed after it."""
+        n, nsquare = self.public_key.n, self.public_key.nsquare
+        count, product = load_tally_checkpoint(n)
+        if count > ledger_size:
+            # Checkpoint from a ledger that no longer exists: start over
+            count, product = 0, 1
+        if count < ledger_size:
+            tail = multiply_ciphertexts(iter_ciphertexts(start_id=count + 1, stop_id=ledger_size + 1), nsquare)
+            product = (product * tail) % nsquare
+            with ledger_transaction() as conn:
+                save_tally_checkpoint(conn, n, ledger_size, product)
+        self.tally_product = product
+        self._tally_checkpoint_size = ledger_size
+
+    def encrypted_tally(self):
+        """Current homomorphic sum of all accepted votes (None while the ledger is empty)."""
+        return self.tally_snapshot()[2]
+
+    def tally_snapshot(self):
+        """(chain_head, ballot_count, encrypted_tally) taken atomically."""
+        with self._lock:
+            if self.merkle_tree.size == 0:
+                return self.chain_head, 0, None
+            encrypted = paillier.EncryptedNumber(self.public_key, self.tally_product, 0) # exponent is 0 per protocol
+            return self.chain_head, self.merkle_tree.size, encrypted
+
+    def publish(self, ballot, voter_id=None, timeout=COMMIT_TIMEOUT):
         """
         1. Verify ZKP
         2. Add to Merkle Tree
         3. Save to SQL Database (replaces file append)
+        With voter_id, step 3 also marks the voter as voted, atomically.
+        Blocks until the ballot is committed (at most `timeout` seconds,
+        then concurrent.futures.TimeoutError); returns its block index.
         """
-        # 1. Verify ZKP (Zero Knowledge Proof)
-        if not self.verify_proof(ballot):
-            raise ValueError("ZKP Verification Failed: Invalid Vote Proof")
-
-        # 2. Add to Merkle Tree
-        ballot_str = json.dumps(ballot, sort_keys=True)
-        leaf_index, leaf_hash = self.merkle_tree.add_leaf(ballot_str)
-        merkle_root = self.merkle_tree.get_root()
-        
-        # Get Previous Hash (Simulated Blockchain Link)
-        prev_hash = "0"*64 # Genesis
-        ledger = get_all_ballots_from_db()
-        if ledger:
-            # The last entry in the ledger from the DB is a dict, we need to hash its content
-            # Assuming the 'id' column is the primary key and determines order
-            # For a simple hash, we can hash the entire dictionary representation
-            prev_hash = hashlib.sha256(json.dumps(ledger[-1], sort_keys=True).encode()).hexdigest()
-
-        # 3. Save to SQLite
-        block_index = add_ballot_to_db(ballot, prev_hash, merkle_root)
-        
-        # Debug Log
-        print(f"ACCEPTED: Ballot {ballot['ballot_id']} -> Merkle Root {merkle_root[:10]}...")
-        
-        return block_index
+        return self.submit(ballot, voter_id).result(timeout)
+
+    def submit(self, ballot, voter_id=None):
+        """Same as publish() but returns a Future resolving to the block index."""
+        future = Future()
+        # Already "running": a caller giving up (timeout, cancelled request)
+        # cannot cancel it under the ingest thread
+        future.set_running_or_notify_cancel()
+        if self._queue is None:
+            self._commit_batch([(ballot, voter_id, future)])
+        else:
+            self._queue.put((ballot, voter_id, future))
+        return future
+
+    def _ingest_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._commit_batch(batch)
+            except Exception as e:
+                # A failed batch only fails its own callers; the thread keeps ingesting
+                print(f"[BB] Batch of {len(batch)} ballots failed: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit_batch(self, items):
+        """Verifies, appends and commits a batch; resolves each caller's future."""
+        # 1. Verify ZKP (Zero Knowledge Proof), batched across the group
+        verified = []
+        for (ballot, voter_id, future), ok in zip(items, self.verify_proofs([item[0] for item in items])):
+            if ok:
+                verified.append((ballot, voter_id, future))
+            else:
+                future.set_exception(ValueError("ZKP Verification Failed: Invalid Vote Proof"))
+        if not verified:
+            return
+
+        committed = []
+        with self._lock:
+            checkpoint = self.merkle_tree.checkpoint()
+            chain_head = self.chain_head
+            tally_product = self.tally_product
+            tally_checkpoint_size = self._tally_checkpoint_size
+            try:
+                with ledger_transaction() as conn:
+                    records = []
+                    merkle_nodes = []
+                    batch_ciphertexts = set()
+                    for ballot, voter_id, future in verified:
+                        # Replays first, so a copied ballot never claims its voter
+                        try:
+                            check_new_ciphertext(conn, ballot['ciphertext'])
+                            if ballot['ciphertext'] in batch_ciphertexts:
+                                raise DuplicateBallotError("Duplicate ballot: this ciphertext is already on the board")
+                        except ValueError as e:
+                            future.set_exception(e)
+                            continue
+                        batch_ciphertexts.add(ballot['ciphertext'])
+
+                        if voter_id is not None:
+                            try:
+                                claim_voter(conn, voter_id)
+                            except ValueError as e:
+                                future.set_exception(e)
+                                continue
+
+                        # 2. Add to Merkle Tree
+                        ballot_str = json.dumps(ballot, sort_keys=True)
+                        leaf_index, leaf_hash = self.merkle_tree.add_leaf(ballot_str)
+                        merkle_root = self.merkle_tree.get_root()
+                        merkle_nodes.extend(self.merkle_tree.last_nodes)
+
+                        # Get Previous Hash (Simulated Blockchain Link) from the cached chain head
+                        prev_hash = self.chain_head
+                        entry_hash = hash_ledger_entry(ledger_entry(leaf_index, prev_hash, merkle_root, ballot))
+                        self.chain_head = entry_hash
+
+                        records.append((leaf_index, ballot, prev_hash, merkle_root, entry_hash))
+                        committed.append((leaf_index, merkle_root, ballot, voter_id, future))
+
+                        # Running tally: homomorphic addition is a multiplication mod n^2
+                        self.tally_product = (self.tally_product * int(ballot['ciphertext'])) % self.public_key.nsquare
+
+                    # 3. Save to SQLite: one executemany, one commit for the whole batch
+                    insert_ballots(conn, records, merkle_nodes)
+                    size = self.merkle_tree.size
+                    if size - self._tally_checkpoint_size >= self.tally_checkpoint_every:
+                        save_tally_checkpoint(conn, self.public_key.n, size, self.tally_product)
+                        self._tally_checkpoint_size = size
+            except Exception as e:
+                # Nothing was committed: keep the tree, chain and tally in step with the ledger
+                self.merkle_tree.rollback(checkpoint)
+                self.chain_head = chain_head
+                self.tally_product = tally_product
+                self._tally_checkpoint_size = tally_checkpoint_size
+                for _, _, future in verified:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+        for block_index, merkle_root, ballot, voter_id, future in committed:
+            # Keep the in-memory eligibility index in step before the caller sees the result
+            if voter_id is not None:
+                record_vote(voter_id)
+            # Debug Log
+            print(f"ACCEPTED: Ballot {ballot['ballot_id']} -> Merkle Root {merkle_root[:10]}...")
+            future.set_result(block_index)
 
     def get_all_ballots(self):
         return get_all_ballots_from_db()
+    
+    def iter_ballots(self, chunk_size=1000, with_proofs=True):
+        return iter_ledger(chunk_size, with_proofs)
+    
+    def ballot_count(self):
+        with self._lock:
+            return self.merkle_tree.size
             
     def get_merkle_proof(self, index):
-        return self.merkle_tree.get_proof(index)
+        with self._lock:
+            return self.merkle_tree.get_proof(index)
 
     def verify_proof(self, ballot):
         """Delegates validation to the ZKP module."""
-        # The actual verification requires the PubKey.
-        pk = load_public_key()
-        verifier = ZKPVerifier(pk)
-        return verifier.verify(ballot['ciphertext'], ballot['proof'])
+        if self.encoding is not None:
+            return self.verifier.verify_one_of(ballot['ciphertext'], ballot['proof'], self.encoding.values())
+        return self.verifier.verify(ballot['ciphertext'], ballot['proof'])
+
+    def verify_proofs(self, ballots):
+        """Batch form of verify_proof(); one boolean per ballot."""
+        if len(ballots) == 1:
+            return [self.verify_proof(ballots[0])]
+        items = [(b.get('ciphertext'), b.get('proof')) for b in ballots]
+        if self.encoding is not None:
+            return self.verifier.verify_batch(items, self.encoding.values())
+        # Acceptance stays on the Python verifier: the Rust routines in
+        # src/native.py are for benchmarks until CI builds and parity-tests them
+        if self.verify_pool is not None:
+            try:
+                return self.verify_pool.map_chunks(verify_ballots, self.public_key, items, timeout=COMMIT_TIMEOUT)
+            except Exception as e:
+                # Broken, shut down or stuck pool: verify on this thread instead of failing the batch
+                print(f"[BB] Crypto pool unavailable ({e!r}); verifying {len(items)} ballots in-thread")
+        return self.verifier.verify_batch(items)
+
+_board = None
+_board_lock = threading.Lock()
+
+def get_bulletin_board(verify_pool=None):
+    """
+    Process-wide board, created on first use and shared by all requests.
+    verify_pool only applies to the call that creates it.
+    """
+    global _board
+    with _board_lock:
+        if _board is None:
+            _board = BulletinBoard(group_commit=True, verify_pool=verify_pool)
+    return _board
 
 if __name__ == "__main__":
     bb = BulletinBoard()
@@ -1,18 +1,81 @@
 import sqlite3
 import json
+import hashlib
 import os
+import queue
+import threading
+from contextlib import contextmanager
 
 # Resolve DB path relative to backend root (where app.py lives)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'secure_voting.db')
 
+# Connection tuning
+POOL_SIZE = 16
+BUSY_TIMEOUT = 10 # seconds a writer waits for the lock instead of failing
+# WAL + FULL: one WAL fsync per commit, readers never block the writer.
+# NORMAL would defer fsyncs to checkpoints and can lose the last ballots on power loss.
+SYNCHRONOUS = "FULL"
+CACHE_SIZE_KB = 65536
+
+class AlreadyVotedError(ValueError):
+    """The voter's has_voted flag was already set when the ballot was committed."""
+
+class DuplicateBallotError(ValueError):
+    """The ciphertext is already on the ledger (a replayed ballot)."""
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+    """Opens a new tuned connection. The caller owns it and must close it."""
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT, cached_statements=256,
+                           check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
     return conn
 
+_pools = {}
+_pools_lock = threading.Lock()
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrows a connection for DB_PATH from the pool and hands it back afterwards.
+    Connections, and their prepared-statement caches, are reused across requests.
+    """
+    with _pools_lock:
+        pool = _pools.setdefault(DB_PATH, queue.LifoQueue(maxsize=POOL_SIZE))
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = get_db_connection()
+    
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def close_db_connections():
+    """Closes every pooled connection (e.g. after DB_PATH is switched in tests)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while not pool.empty():
+            pool.get_nowait().close()
+
 def init_db():
-    conn = get_db_connection()
+    with pooled_connection() as conn:
+        _init_schema(conn)
+    print("[DB] Database initialized successfully.")
+
+def _init_schema(conn):
     c = conn.cursor()
     
     # 1. Voters Table
@@ -25,6 +88,17 @@ def init_db():
         )
     ''')
     
+    # Rolls written before IDs were canonicalised ("123456789012", "1234 5678 9012"):
+    # store them as "1234-5678-9012", the form login looks them up by. A row whose
+    # canonical form is already taken is left alone (UPDATE OR IGNORE)
+    digits = "replace(replace(aadhaar, '-', ''), ' ', '')"
+    d4 = "[0-9]" * 4
+    c.execute(f'''
+        UPDATE OR IGNORE voters
+        SET aadhaar = substr({digits}, 1, 4) || '-' || substr({digits}, 5, 4) || '-' || substr({digits}, 9, 4)
+        WHERE aadhaar NOT GLOB '{d4}-{d4}-{d4}' AND {digits} GLOB '{d4 * 3}'
+    ''')
+
     # 2. Ballots Table (Ledger)
     # Storing JSON proof as TEXT for simplicity in this reference impl
     c.execute('''
@@ -36,7 +110,40 @@ def init_db():
             prev_hash TEXT NOT NULL,
             merkle_root TEXT NOT NULL,
             timestamp REAL NOT NULL,
-            kiosk_id TEXT
+            kiosk_id TEXT,
+            entry_hash TEXT
+        )
+    ''')
+    
+    # Ledgers created before entry_hash existed: add the column and backfill once
+    columns = [col['name'] for col in c.execute('PRAGMA table_info(ballots)')]
+    if 'entry_hash' not in columns:
+        c.execute('ALTER TABLE ballots ADD COLUMN entry_hash TEXT')
+        _backfill_entry_hashes(conn)
+    
+    # One ledger entry per ciphertext: a copied (ciphertext, proof) pair from
+    # the public board verifies fine, so replays are refused by value
+    c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_ballots_ciphertext ON ballots(ciphertext)')
+    
+    # 3. Merkle Nodes (complete subtrees of the ballot log)
+    # Lets the Bulletin Board reopen its tree in O(log N) instead of replaying the ledger
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS merkle_nodes (
+            level INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (level, idx)
+        ) WITHOUT ROWID
+    ''')
+    
+    # 4. Running encrypted tally: product of the first ballot_count ciphertexts mod n^2
+    # Checkpointed periodically by the Bulletin Board; later ballots are rolled forward on open
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tally_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            n TEXT NOT NULL,
+            ballot_count INTEGER NOT NULL,
+            product TEXT NOT NULL
         )
     ''')
     
@@ -54,28 +161,130 @@ def init_db():
         print("[DB] 5 Fresh Mock voters seeded.")
         
     conn.commit()
-    conn.close()
-    print("[DB] Database initialized successfully.")
 
 def get_voter(aadhaar):
-    conn = get_db_connection()
-    voter = conn.execute('SELECT * FROM voters WHERE aadhaar = ?', (aadhaar,)).fetchone()
-    conn.close()
-    return voter
+    with pooled_connection() as conn:
+        return conn.execute('SELECT * FROM voters WHERE aadhaar = ?', (aadhaar,)).fetchone()
+
+def iter_voter_flags(chunk_size=100000):
+    """Yields (aadhaar, has_voted) for every voter in primary-key order, chunk by chunk."""
+    with pooled_connection() as conn:
+        cur = conn.execute('SELECT aadhaar, has_voted FROM voters ORDER BY aadhaar')
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0], row[1]
 
 def mark_voter_as_voted(aadhaar):
-    conn = get_db_connection()
-    conn.execute('UPDATE voters SET has_voted = 1 WHERE aadhaar = ?', (aadhaar,))
-    conn.commit()
-    conn.close()
+    with pooled_connection() as conn, conn:
+        conn.execute('UPDATE voters SET has_voted = 1 WHERE aadhaar = ?', (aadhaar,))
 
-def add_ballot_to_db(ballot_data, prev_hash, merkle_root):
-    conn = get_db_connection()
+def _backfill_entry_hashes(conn):
+    rows = conn.execute('SELECT * FROM ballots ORDER BY id ASC')
+    updates = [(hash_ledger_entry(row_to_entry(i, row)), row['id']) for i, row in enumerate(rows)]
+    conn.executemany('UPDATE ballots SET entry_hash = ? WHERE id = ?', updates)
+    if updates:
+        print(f"[DB] Backfilled entry hashes for {len(updates)} ballots.")
+
+def ledger_entry(index, prev_hash, merkle_root, ballot_data):
+    """Builds a ledger entry exactly as it is read back from the ballots table."""
+    return {
+        "index": index,
+        "prev_hash": prev_hash,
+        "merkle_root": merkle_root,
+        "ballot": {
+            "ballot_id": ballot_data['ballot_id'],
+            "timestamp": ballot_data['timestamp'],
+            "kiosk_id": ballot_data['kiosk_id'],
+            "ciphertext": ballot_data['ciphertext'],
+            "exponent": 0, # Default per protocol
+            "proof": ballot_data['proof']
+        }
+    }
+
+def hash_ledger_entry(entry):
+    """Chain link hash: the next block stores this as its prev_hash."""
+    return hashlib.sha256(json.dumps(entry, sort_keys=True).encode()).hexdigest()
+
+def row_to_entry(index, row):
+    return ledger_entry(index, row['prev_hash'], row['merkle_root'], {
+        "ballot_id": row['ballot_id'],
+        "timestamp": row['timestamp'],
+        "kiosk_id": row['kiosk_id'],
+        "ciphertext": row['ciphertext'],
+        "proof": json.loads(row['proof'])
+    })
+
+def add_ballot_to_db(ballot_data, prev_hash, merkle_root, merkle_nodes=(), entry_hash=None, voter_id=None):
+    """
+    Appends a ballot (and its Merkle nodes) in one transaction.
+    With voter_id, the voter's has_voted flag is claimed in that same
+    transaction: one commit per vote and no way to record two ballots.
+    """
+    with ledger_transaction() as conn:
+        if voter_id is not None:
+            claim_voter(conn, voter_id)
+        return _insert_ballot(conn, ballot_data, prev_hash, merkle_root, merkle_nodes, entry_hash)
+
+@contextmanager
+def ledger_transaction():
+    """One pooled connection, one transaction: commits on success, rolls back on error."""
+    with pooled_connection() as conn, conn:
+        yield conn
+
+def claim_voter(conn, aadhaar):
+    """
+    Flips has_voted inside the caller's transaction.
+    Raises AlreadyVotedError (or ValueError for unknown IDs) instead.
+    """
+    # Conditional UPDATE: only one concurrent transaction can flip the flag
+    cur = conn.execute('UPDATE voters SET has_voted = 1 WHERE aadhaar = ? AND has_voted = 0', (aadhaar,))
+    if cur.rowcount == 1:
+        return
+    if conn.execute('SELECT 1 FROM voters WHERE aadhaar = ?', (aadhaar,)).fetchone() is None:
+        raise ValueError("Unknown voter")
+    raise AlreadyVotedError("Vote already cast")
+
+def check_new_ciphertext(conn, ciphertext):
+    """
+    Raises DuplicateBallotError if `ciphertext` is already on the ledger
+    (inside the caller's transaction). Ciphertexts must be canonical decimal
+    strings, or the same value could be stored twice under different spellings.
+    """
+    if not isinstance(ciphertext, str) or ciphertext != str(int(ciphertext)):
+        raise ValueError("Ciphertext must be a canonical decimal string")
+    if conn.execute('SELECT 1 FROM ballots WHERE ciphertext = ?', (ciphertext,)).fetchone() is not None:
+        raise DuplicateBallotError("Duplicate ballot: this ciphertext is already on the board")
+
+def insert_ballots(conn, records, merkle_nodes=()):
+    """
+    Batch insert for group commit. records: (block_index, ballot_data, prev_hash,
+    merkle_root, entry_hash) tuples; the row id is pinned to block_index + 1.
+    """
+    conn.executemany('''
+        INSERT INTO ballots (id, ballot_id, ciphertext, proof, prev_hash, merkle_root, timestamp, kiosk_id, entry_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(
+        block_index + 1,
+        ballot_data['ballot_id'],
+        ballot_data['ciphertext'],
+        json.dumps(ballot_data['proof']),
+        prev_hash,
+        merkle_root,
+        ballot_data['timestamp'],
+        ballot_data['kiosk_id'],
+        entry_hash
+    ) for block_index, ballot_data, prev_hash, merkle_root, entry_hash in records])
+    conn.executemany('INSERT OR REPLACE INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)', merkle_nodes)
+
+def _insert_ballot(conn, ballot_data, prev_hash, merkle_root, merkle_nodes, entry_hash):
     c = conn.cursor()
     
     c.execute('''
-        INSERT INTO ballots (ballot_id, ciphertext, proof, prev_hash, merkle_root, timestamp, kiosk_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO ballots (ballot_id, ciphertext, proof, prev_hash, merkle_root, timestamp, kiosk_id, entry_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     ''', (
         ballot_data['ballot_id'],
         ballot_data['ciphertext'],
@@ -83,24 +292,59 @@ def add_ballot_to_db(ballot_data, prev_hash, merkle_root):
         prev_hash,
         merkle_root,
         ballot_data['timestamp'],
-        ballot_data['kiosk_id']
+        ballot_data['kiosk_id'],
+        entry_hash
     ))
     
     # Get the auto-incremented index (block height)
     block_index = c.lastrowid - 1 # 0-indexed for consistency with old list
-    conn.commit()
-    conn.close()
+    
+    # Persist new Merkle nodes in the same transaction as the ballot
+    c.executemany('INSERT OR REPLACE INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)', merkle_nodes)
     return block_index
 
-def get_all_ballots_from_db():
+def iter_ledger_rows(chunk_size=1000, columns='*', start_id=None, stop_id=None, kiosks=None):
+    """
+    Streams raw ballot rows in id order, `chunk_size` rows per fetch.
+    Optional [start_id, stop_id) bounds select a slice of the ledger, and
+    kiosks restricts it to those kiosk ids (filtered by SQLite).
+    Uses its own connection: under WAL a long read never blocks vote inserts.
+    """
+    query = f'SELECT {columns} FROM ballots WHERE id >= ? AND id < ?'
+    params = [start_id if start_id is not None else 0,
+              stop_id if stop_id is not None else 2**63 - 1]
+    if kiosks is not None:
+        kiosks = list(kiosks)
+        query += f' AND kiosk_id IN ({", ".join("?" * len(kiosks))})'
+        params.extend(kiosks)
+    query += ' ORDER BY id ASC'
+    
     conn = get_db_connection()
-    rows = conn.execute('SELECT * FROM ballots ORDER BY id ASC').fetchall()
-    conn.close()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def iter_ledger(chunk_size=1000, with_proofs=True):
+    """
+    Generator over ledger entries; memory use is bounded by chunk_size.
+    with_proofs=False skips loading and decoding proofs (ballots carry no 'proof').
+    """
+    if with_proofs:
+        rows = iter_ledger_rows(chunk_size)
+        for i, row in enumerate(rows):
+            yield row_to_entry(i, row)
+        return
     
-    ledger = []
-    for i, row in enumerate(rows):
-        entry = {
-            "index": i, # Reconstruct index dynamically
+    columns = 'prev_hash, merkle_root, ballot_id, timestamp, kiosk_id, ciphertext'
+    for i, row in enumerate(iter_ledger_rows(chunk_size, columns)):
+        yield {
+            "index": i,
             "prev_hash": row['prev_hash'],
             "merkle_root": row['merkle_root'],
             "ballot": {
@@ -108,9 +352,75 @@ def get_all_ballots_from_db():
                 "timestamp": row['timestamp'],
                 "kiosk_id": row['kiosk_id'],
                 "ciphertext": row['ciphertext'],
-                "exponent": 0, # Default per protocol
-                "proof": json.loads(row['proof'])
+                "exponent": 0
             }
         }
-        ledger.append(entry)
-    return ledger
+
+def iter_ciphertexts(chunk_size=1000, start_id=None, stop_id=None):
+    """Projection for tallying: yields only ciphertext strings."""
+    for row in iter_ledger_rows(chunk_size, 'ciphertext', start_id, stop_id):
+        yield row['ciphertext']
+
+def get_all_ballots_from_db():
+    return list(iter_ledger())
+
+def get_last_ballot_row():
+    """Returns (id, merkle_root, entry_hash) of the ledger tip, or None if empty."""
+    with pooled_connection() as conn:
+        return conn.execute('SELECT id, merkle_root, entry_hash FROM ballots ORDER BY id DESC LIMIT 1').fetchone()
+
+def get_max_ballot_id():
+    """Highest ballot id (0 for an empty ledger); works on pre-migration ledgers too."""
+    with pooled_connection() as conn:
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM ballots').fetchone()[0]
+
+def get_merkle_node(level, idx):
+    with pooled_connection() as conn:
+        row = conn.execute('SELECT hash FROM merkle_nodes WHERE level = ? AND idx = ?', (level, idx)).fetchone()
+    return row['hash'] if row else None
+
+def load_merkle_frontier():
+    """
+    Loads (size, frontier) of the persisted Merkle tree.
+    Only one indexed lookup per level: O(log N).
+    """
+    with pooled_connection() as conn:
+        row = conn.execute('SELECT MAX(idx) FROM merkle_nodes WHERE level = 0').fetchone()
+        size = 0 if row[0] is None else row[0] + 1
+        
+        frontier = []
+        for level in range(size.bit_length()):
+            if (size >> level) & 1:
+                node = conn.execute('SELECT hash FROM merkle_nodes WHERE level = ? AND idx = ?',
+                                    (level, (size >> level) - 1)).fetchone()
+                if node is None:
+                    return 0, [] # Incomplete state: caller has to rebuild
+                frontier.append(node['hash'])
+            else:
+                frontier.append(None)
+    return size, frontier
+
+def load_tally_checkpoint(n):
+    """
+    Returns (ballot_count, product) of the stored running tally for modulus n,
+    or (0, 1) if there is none (or it belongs to another key).
+    """
+    with pooled_connection() as conn:
+        try:
+            row = conn.execute('SELECT n, ballot_count, product FROM tally_state WHERE id = 1').fetchone()
+        except sqlite3.OperationalError:
+            row = None # Ledger from before tally_state (opened read-only, e.g. by an auditor)
+    if row is None or row['n'] != str(n):
+        return 0, 1
+    return row['ballot_count'], int(row['product'])
+
+def save_tally_checkpoint(conn, n, ballot_count, product):
+    """Stores the running tally inside the caller's transaction."""
+    conn.execute('INSERT OR REPLACE INTO tally_state (id, n, ballot_count, product) VALUES (1, ?, ?, ?)',
+                 (str(n), ballot_count, str(product)))
+
+def replace_merkle_nodes(merkle_nodes):
+    """Drops the persisted tree and stores a freshly rebuilt one."""
+    with pooled_connection() as conn, conn:
+        conn.execute('DELETE FROM merkle_nodes')
+        conn.executemany('INSERT INTO merkle_nodes (level, idx, hash) VALUES (?, ?, ?)', merkle_nodes)
@@ -0,0 +1,176 @@
+import bisect
+import math
+import threading
+from array import array
+import src.db as db
+
+MASK64 = (1 << 64) - 1
+
+def voter_key(aadhaar):
+    """Aadhaar ID ("1234-5678-9012", spaces / dashes optional) as an int; None if malformed."""
+    if not isinstance(aadhaar, str):
+        return None
+    digits = aadhaar.replace("-", "").replace(" ", "")
+    if len(digits) != 12 or not digits.isdigit():
+        return None
+    return int(digits)
+
+def format_voter_key(key):
+    """Canonical "1234-5678-9012" form of a voter_key(): sorts like the number."""
+    digits = f"{key:012d}"
+    return f"{digits[:4]}-{digits[4:8]}-{digits[8:]}"
+
+def canonical_voter_id(aadhaar):
+    """
+    The form the roll stores an ID in: "1234-5678-9012" for anything
+    voter_key() accepts, anything else unchanged. Applied where IDs enter
+    the app, so the index, the voters table and the session agree.
+    """
+    key = voter_key(aadhaar)
+    return aadhaar if key is None else format_voter_key(key)
+
+class BloomFilter:
+    """
+    Bit array with k probe positions per key (double hashing of two 64-bit
+    integer mixes), sized for `capacity` keys at `error_rate` false positives.
+    A miss means the key was never added.
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    @staticmethod
+    def _hashes(key):
+        h1 = (key * 0x9E3779B97F4A7C15) & MASK64
+        h2 = (((key ^ (key >> 31)) * 0xBF58476D1CE4E5B9) & MASK64) | 1
+        return h1, h2
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % self.num_bits
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        h1, h2 = self._hashes(key)
+        bits, m = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            pos = (h1 + i * h2) % m
+            # Most unknown keys stop at the first or second probe
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+class EligibilityIndex:
+    """
+    In-memory copy of the voter roll's eligibility and has_voted flags:
+
+      ids     sorted array('Q') of numeric Aadhaar IDs (8 bytes per voter)
+      voted   bitset parallel to ids (1 bit per voter)
+      bloom   in front of the binary search, so most unknown IDs are
+              rejected without touching the array
+
+    IDs are matched exactly as stored, like the voters table: pass them
+    through canonical_voter_id() first. Lookups never touch SQLite. The
+    database stays authoritative:
+    claim_voter() still flips has_voted atomically at commit time, and the
+    board reports each claim back through record_vote().
+    """
+    def __init__(self, rows=()):
+        # Streamed straight into compact arrays: no per-voter Python objects
+        self.ids = array('Q')
+        flags = bytearray()
+        self._other = {} # IDs not in canonical form: kept as-is
+        last = -1
+        for aadhaar, has_voted in rows:
+            key = voter_key(aadhaar)
+            if key is None or format_voter_key(key) != aadhaar:
+                self._other[aadhaar] = bool(has_voted)
+                continue
+            # Primary-key order is numeric order for canonical IDs
+            if key <= last:
+                raise ValueError("Voter rows must arrive in key order")
+            last = key
+            self.ids.append(key)
+            flags.append(1 if has_voted else 0)
+
+        self.voted = bytearray((len(self.ids) + 7) // 8)
+        i = flags.find(1)
+        while i != -1:
+            self.voted[i >> 3] |= 1 << (i & 7)
+            i = flags.find(1, i + 1)
+        self.bloom = BloomFilter(len(self.ids))
+        for key in self.ids:
+            self.bloom.add(key)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, chunk_size=100000):
+        """Streams (aadhaar, has_voted) from the voters table in key order."""
+        return cls(db.iter_voter_flags(chunk_size))
+
+    def _slot(self, aadhaar):
+        key = voter_key(aadhaar)
+        if key is None or key not in self.bloom or format_voter_key(key) != aadhaar:
+            return None
+        i = bisect.bisect_left(self.ids, key)
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def lookup(self, aadhaar):
+        """None for an unknown ID, otherwise whether the voter has voted."""
+        i = self._slot(aadhaar)
+        if i is None:
+            return self._other.get(aadhaar)
+        return bool(self.voted[i >> 3] >> (i & 7) & 1)
+
+    def is_eligible(self, aadhaar):
+        return self.lookup(aadhaar) is False
+
+    def mark_voted(self, aadhaar):
+        i = self._slot(aadhaar)
+        # Bit updates are read-modify-write on a shared byte
+        with self._lock:
+            if i is not None:
+                self.voted[i >> 3] |= 1 << (i & 7)
+            elif aadhaar in self._other:
+                self._other[aadhaar] = True
+
+    def __len__(self):
+        return len(self.ids) + len(self._other)
+
+    def stats(self):
+        return {
+            "voters": len(self),
+            "voted": sum(bin(b).count("1") for b in self.voted) + sum(self._other.values()),
+            "bytes": self.ids.itemsize * len(self.ids) + len(self.voted) + len(self.bloom.bits),
+            "bloom_bits": self.bloom.num_bits,
+            "bloom_hashes": self.bloom.num_hashes,
+        }
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_eligibility_index():
+    """Index for the current DB_PATH, loaded from the voters table on first use."""
+    with _indexes_lock:
+        index = _indexes.get(db.DB_PATH)
+        if index is None:
+            index = _indexes[db.DB_PATH] = EligibilityIndex.from_db()
+    return index
+
+def reload_eligibility_index():
+    """Rebuilds the index, e.g. after the voter roll was re-imported."""
+    index = EligibilityIndex.from_db()
+    with _indexes_lock:
+        _indexes[db.DB_PATH] = index
+    return index
+
+def record_vote(aadhaar):
+    """Keeps a loaded index in step with a committed has_voted flip (no-op if not loaded)."""
+    index = _indexes.get(db.DB_PATH)
+    if index is not None:
+        index.mark_voted(aadhaar)
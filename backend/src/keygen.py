@@ -1,6 +1,9 @@
 import json
 import os
 import shutil
+import hashlib
+import threading
+import functools
 from phe import paillier
 from src.hybrid_sss import encrypt_and_split
 
@@ -58,13 +61,64 @@ def generate_keypair(key_size=2048, t=3, n_shares=5):
             
     print(f"Done! Public Key + Encrypted Blob + {n_shares} Shares saved to '{KEY_DIR}/'")
 
-# Helper to load pub key remains same
-def load_public_key():
+class PublicKeyContext:
+    """
+    A parsed public key plus the derived constants that every encryption
+    and proof needs, computed once per key instead of once per ballot.
+    """
+    def __init__(self, public_key):
+        self.public_key = public_key
+        self.n = public_key.n
+        self.ns = public_key.nsquare
+        self.g = public_key.g
+        self.g_inv = pow(self.g, -1, self.ns)
+        # Every Fiat-Shamir transcript starts with str(n) + str(g)
+        self._hash_prefix = hashlib.sha256((str(self.n) + str(self.g)).encode())
+
+    def challenge(self, *nums):
+        """Same value as ZKPUtils.hash_nums([n, g, *nums]), reusing the hashed prefix."""
+        h = self._hash_prefix.copy()
+        h.update("".join(str(x) for x in nums).encode())
+        return int(h.hexdigest(), 16)
+
+    def g_pow(self, m):
+        """
+        g^m mod n^2. With g = n+1 this is 1 + m*n (binomial expansion),
+        so no exponentiation or fixed-base table is needed.
+        """
+        return (1 + (m % self.n) * self.n) % self.ns
+
+@functools.lru_cache(maxsize=8)
+def _context_for_modulus(n):
+    return PublicKeyContext(paillier.PaillierPublicKey(n=n))
+
+def key_context_for(public_key):
+    """Shared context for any public key (keyed by n)."""
+    return _context_for_modulus(public_key.n)
+
+_loaded_key = {"stamp": None, "n": None}
+_loaded_key_lock = threading.Lock()
+
+def load_key_context():
+    """
+    Context for keys/public_key.json. The file is parsed again only when
+    its mtime (or inode/size) changes, e.g. after a new key ceremony.
+    """
     path = os.path.join(KEY_DIR, "public_key.json")
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
         raise FileNotFoundError("Public key not found. Run keygen first.")
+    stamp = (st.st_mtime_ns, st.st_ino, st.st_size)
     
-    with open(path, "r") as f:
-        data = json.load(f)
-    return paillier.PaillierPublicKey(n=int(data["n"]))
+    with _loaded_key_lock:
+        if _loaded_key["stamp"] != stamp:
+            with open(path, "r") as f:
+                data = json.load(f)
+            _loaded_key["n"] = int(data["n"])
+            _loaded_key["stamp"] = stamp
+        n = _loaded_key["n"]
+    return _context_for_modulus(n)
 
+def load_public_key():
+    return load_key_context().public_key
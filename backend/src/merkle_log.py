@@ -1,58 +1,221 @@
 import hashlib
 import json
 
+
+def _hash_pair(left, right):
+    """Combine hash: H(left + right)"""
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
 class MerkleTree:
     """
     Implements a binary Merkle Tree for Blockchain-like verification.
+
+    The tree is append-only and updated incrementally: every append touches at
+    most one node per level, so adding a leaf costs O(log N) hashes instead of
+    a full rebuild. Odd nodes are paired with themselves, exactly as the
+    original full-rebuild implementation did, so roots are unchanged.
+
+    store_levels=True keeps every level in memory (proofs for any leaf).
+    store_levels=False keeps only the right-edge "frontier" (one pending node
+    per level), which is enough to maintain the root in O(log N) memory.
+    Proofs are then served through node_loader(level, index), which must
+    return complete nodes previously reported in `last_nodes`.
     """
-    def __init__(self):
+    def __init__(self, store_levels=True, node_loader=None):
+        self.store_levels = store_levels
+        self.node_loader = node_loader
+        self.size = 0
+        # frontier[d] = complete level-d subtree still waiting for a right sibling
+        self.frontier = []
         self.leaves = []
         self.levels = []
+        # Complete (immutable) nodes created by the last append: (level, index, hash)
+        self.last_nodes = []
+        self._root = None
+
+    @classmethod
+    def from_frontier(cls, size, frontier, node_loader=None):
+        """Reopens a frontier-mode tree from persisted state in O(log N)."""
+        tree = cls(store_levels=False, node_loader=node_loader)
+        tree.size = size
+        tree.frontier = list(frontier)
+        tree._root = tree._right_edge(None)
+        return tree
 
     def add_leaf(self, data_string):
         """Adds a new entry (vote) to the log."""
         # Hash the data to create a leaf
         leaf_hash = hashlib.sha256(data_string.encode()).hexdigest()
-        self.leaves.append(leaf_hash)
-        self._recalculate_tree()
-        return len(self.leaves) - 1, leaf_hash
+        return self.append_hash(leaf_hash), leaf_hash
+
+    def append_hash(self, leaf_hash):
+        """Appends an already hashed leaf. Returns its index."""
+        index = self.size
+        self.last_nodes = self._push_frontier(leaf_hash)
+        self.size += 1
+
+        if self.store_levels:
+            self._update_levels(leaf_hash)
+            self._root = self.levels[-1][0]
+        else:
+            self._root = self._right_edge(None)
+        return index
 
     def get_root(self):
-        if not self.levels:
-            return None
-        return self.levels[-1][0]
+        return self._root
+
+    def checkpoint(self):
+        """Captures the append state in O(log N) so a failed append can be undone."""
+        return (self.size, list(self.frontier), self._root)
+
+    def rollback(self, checkpoint):
+        """Restores a state captured by checkpoint() (drops later appends)."""
+        size, frontier, root = checkpoint
+        self.size = size
+        self.frontier = list(frontier)
+        self._root = root
+        self.last_nodes = []
+        if self.store_levels:
+            self._truncate_levels(size)
+
+    def _truncate_levels(self, size):
+        del self.leaves[size:]
+        if size == 0:
+            self.levels = []
+            return
+
+        level_count = (size - 1).bit_length() + 1
+        del self.levels[level_count:]
+        level_size = size
+        for depth in range(1, level_count):
+            below = self.levels[depth - 1]
+            level_size = (level_size + 1) // 2
+            level = self.levels[depth]
+            del level[level_size:]
+            # The right-edge node may have absorbed the dropped leaves
+            last = level_size - 1
+            left = below[last * 2]
+            right = below[last * 2 + 1] if last * 2 + 1 < len(below) else left
+            level[last] = _hash_pair(left, right)
 
     def get_proof(self, index):
         """
         Generates Merkle Proof for a specific index.
         Returns list of (hash, direction) tuples needed to reconstruct root.
         """
-        if index >= len(self.leaves) or index < 0:
+        if index >= self.size or index < 0:
             return None
-            
+        if not self.store_levels and self.node_loader is None:
+            raise ValueError("Proofs require store_levels=True or a node_loader")
+
         proof = []
         current_index = index
-        
-        for level in self.levels[:-1]: # Don't need root in proof
+        level_size = self.size
+        depth = 0
+
+        while level_size > 1: # Don't need root in proof
             is_right_node = current_index % 2 == 1
             sibling_index = current_index - 1 if is_right_node else current_index + 1
-            
-            if sibling_index < len(level):
-                sibling_hash = level[sibling_index]
-                proof.append({
-                    "hash": sibling_hash,
-                    "direction": "left" if is_right_node else "right"
-                })
-            else:
-                # Odd number of nodes, no sibling
-                # In this simple implementation, we might simulate duplication or just carry up
-                # For simplicity here, we assume the node pairs with itself or ignore
-                pass
-                
+
+            if sibling_index >= level_size:
+                # Odd number of nodes: the last node is paired with itself
+                sibling_index = current_index
+
+            sibling_hash = self._get_node(depth, sibling_index)
+            proof.append({
+                "hash": sibling_hash,
+                "direction": "left" if is_right_node else "right"
+            })
+
             current_index = current_index // 2
-            
+            level_size = (level_size + 1) // 2
+            depth += 1
+
         return proof
 
+    def _get_node(self, depth, index):
+        if self.store_levels:
+            return self.levels[depth][index]
+        if index < (self.size >> depth):
+            return self.node_loader(depth, index)
+        # Partial right-edge node: never persisted, derived from the frontier
+        return self._right_edge(depth)
+
+    def _push_frontier(self, node):
+        """
+        Binary-counter carry: merge complete subtrees of equal height.
+        Returns the complete nodes created, as (level, index, hash).
+        """
+        index = self.size
+        depth = 0
+        created = [(0, index, node)]
+        while depth < len(self.frontier) and self.frontier[depth] is not None:
+            node = _hash_pair(self.frontier[depth], node)
+            self.frontier[depth] = None
+            depth += 1
+            created.append((depth, index >> depth, node))
+        if depth == len(self.frontier):
+            self.frontier.append(node)
+        else:
+            self.frontier[depth] = node
+        return created
+
+    def _right_edge(self, stop_level):
+        """
+        Folds the frontier into the rightmost node of `stop_level`
+        (or the root when stop_level is None). O(log N).
+        """
+        n = self.size
+        if n == 0:
+            return None
+
+        # Lowest set bit of n: the rightmost node there is a complete subtree.
+        depth = (n & -n).bit_length() - 1
+        node = self.frontier[depth]
+        if depth == stop_level or (n >> depth) == 1:
+            return node
+
+        # Odd count at this level -> pair with itself
+        node = _hash_pair(node, node)
+        depth += 1
+        while (n >> depth) != 0 and depth != stop_level:
+            if (n >> depth) & 1:
+                node = _hash_pair(self.frontier[depth], node)
+            else:
+                node = _hash_pair(node, node)
+            depth += 1
+        return node
+
+    def _update_levels(self, leaf_hash):
+        """Recomputes only the right-edge node of each level."""
+        if not self.levels:
+            self.levels = [self.leaves]
+        self.leaves.append(leaf_hash)
+
+        depth = 0
+        current_index = len(self.leaves) - 1
+        while len(self.levels[depth]) > 1:
+            level = self.levels[depth]
+            parent_index = current_index // 2
+            left = level[parent_index * 2]
+            if parent_index * 2 + 1 < len(level):
+                right = level[parent_index * 2 + 1]
+            else:
+                right = left # Duplicate last node if odd number
+
+            if depth + 1 == len(self.levels):
+                self.levels.append([])
+            next_level = self.levels[depth + 1]
+            combined = _hash_pair(left, right)
+            if parent_index < len(next_level):
+                next_level[parent_index] = combined
+            else:
+                next_level.append(combined)
+
+            current_index = parent_index
+            depth += 1
+
     def _recalculate_tree(self):
         """Rebuilds the tree from leaves up to root."""
         if not self.leaves:
@@ -61,7 +224,7 @@ class MerkleTree:
 
         current_level = self.leaves[:]
         self.levels = [current_level]
-        
+
         while len(current_level) > 1:
             next_level = []
             for i in range(0, len(current_level), 2):
@@ -70,11 +233,10 @@ class MerkleTree:
                     right = current_level[i + 1]
                 else:
                     right = left # Duplicate last node if odd number
-                
+
                 # Combine hash: H(left + right)
-                combined = hashlib.sha256((left + right).encode()).hexdigest()
-                next_level.append(combined)
-            
+                next_level.append(_hash_pair(left, right))
+
             self.levels.append(next_level)
             current_level = next_level
 
@@ -83,18 +245,18 @@ class MerkleTree:
         Verifies that data_string belongs to the tree with root hash.
         """
         current_hash = hashlib.sha256(data_string.encode()).hexdigest()
-        
+
         for step in proof:
             sibling = step["hash"]
             direction = step["direction"]
-            
+
             if direction == "right":
                 # Sibling is on the right: H(current + sibling)
-                current_hash = hashlib.sha256((current_hash + sibling).encode()).hexdigest()
+                current_hash = _hash_pair(current_hash, sibling)
             else:
                 # Sibling is on the left: H(sibling + current)
-                current_hash = hashlib.sha256((sibling + current_hash).encode()).hexdigest()
-                
+                current_hash = _hash_pair(sibling, current_hash)
+
         return current_hash == root
 
 if __name__ == "__main__":
@@ -102,13 +264,13 @@ if __name__ == "__main__":
     mt.add_leaf("Vote A")
     mt.add_leaf("Vote B")
     mt.add_leaf("Vote C")
-    
+
     root = mt.get_root()
     print(f"Merkle Root: {root}")
-    
+
     # Prove Vote B (Index 1)
     proof = mt.get_proof(1)
     print("Proof for Vote B:", proof)
-    
+
     is_valid = mt.verify_proof("Vote B", proof, root)
     print(f"Verification Result: {is_valid}")
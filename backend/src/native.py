@@ -0,0 +1,89 @@
+"""
+Optional Rust acceleration (backend/secure-voting-core, built with maturin).
+
+Each function takes a whole batch per call; the extension releases the GIL
+and spreads the batch over all cores. When the extension is not installed
+the same results come from the pure-Python code, so callers never need to
+check HAVE_NATIVE themselves.
+
+Ballot acceptance (BulletinBoard.verify_proofs) does not go through this
+module: the board uses ZKPVerifier directly until the native job in CI
+(.github/workflows/ci.yml) builds the extension and runs the parity tests
+against it.
+"""
+from src.tally import multiply_ciphertexts
+from src.voting import encrypt_vote
+from src.zkp import ZKPProver, ZKPVerifier
+
+try:
+    import secure_voting_core as _core
+except ImportError:
+    _core = None
+
+# An old build of the crate only exports generate_keypair
+HAVE_NATIVE = _core is not None and all(
+    hasattr(_core, name)
+    for name in ("encrypt_votes", "prove_votes", "verify_votes", "batch_verify_votes", "ciphertext_product")
+)
+
+def _proof_dict(a, e, z):
+    return {"a": [str(x) for x in a], "e": [str(x) for x in e], "z": [str(x) for x in z]}
+
+def _native_items(ballots):
+    """
+    (ciphertext, proof) pairs as ints for the extension, or None if the
+    extension is missing or any field is malformed. Negative values cannot
+    cross into BigUint either; the Python verifier rejects those ballots.
+    """
+    if not HAVE_NATIVE:
+        return None
+    try:
+        items = [
+            (int(c), [int(x) for x in p["a"]], [int(x) for x in p["e"]], [int(x) for x in p["z"]])
+            for c, p in ballots
+        ]
+    except Exception:
+        return None
+    if any(x < 0 for c, a, _, z in items for x in (c, *a, *z)):
+        return None
+    return items
+
+def encrypt_votes(public_key, votes, rs=None):
+    """Encrypts many 0/1 votes; returns (ciphertext, r) per vote."""
+    if HAVE_NATIVE:
+        return _core.encrypt_votes(public_key.n, list(votes), None if rs is None else list(rs))
+    if rs is None:
+        rs = [None] * len(votes)
+    results = []
+    for vote, r in zip(votes, rs):
+        enc = encrypt_vote(public_key, vote, r)
+        results.append((enc.ciphertext, enc.r))
+    return results
+
+def prove_votes(public_key, items):
+    """OR-proofs (same dict format as ZKPProver.prove_vote) for (ciphertext, vote, r) triples."""
+    if HAVE_NATIVE:
+        return [_proof_dict(*p) for p in _core.prove_votes(public_key.n, [tuple(item) for item in items])]
+    prover = ZKPProver(public_key)
+    return [prover.prove_vote(c, vote, r) for c, vote, r in items]
+
+def verify_votes(public_key, ballots):
+    """[ZKPVerifier.verify(c, p) for c, p in ballots], each proof checked on its own."""
+    items = _native_items(ballots)
+    if items is not None:
+        return _core.verify_votes(public_key.n, items)
+    verifier = ZKPVerifier(public_key)
+    return [verifier.verify(c, p) for c, p in ballots]
+
+def verify_batch(public_key, ballots):
+    """Same results as ZKPVerifier.verify_batch for referendum (0/1) ballots."""
+    items = _native_items(ballots)
+    if items is not None:
+        return _core.batch_verify_votes(public_key.n, items)
+    return ZKPVerifier(public_key).verify_batch(ballots)
+
+def ciphertext_product(ciphertexts, nsquare):
+    """Homomorphic sum of raw ciphertexts, as tally.multiply_ciphertexts."""
+    if HAVE_NATIVE:
+        return _core.ciphertext_product(nsquare, [int(c) for c in ciphertexts])
+    return multiply_ciphertexts(ciphertexts, nsquare)
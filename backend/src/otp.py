@@ -0,0 +1,236 @@
+import collections
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OTP_TTL = int(os.environ.get("OTP_TTL_SECONDS", 300))
+OTP_DIGITS = 6
+OTP_MAX_ATTEMPTS = 5
+# Token buckets: burst size and refill rate (tokens per second)
+OTP_ID_BURST = int(os.environ.get("OTP_ID_BURST", 3))
+OTP_ID_RATE = float(os.environ.get("OTP_ID_RATE", 1 / 60))
+OTP_IP_BURST = int(os.environ.get("OTP_IP_BURST", 60))
+OTP_IP_RATE = float(os.environ.get("OTP_IP_RATE", 2))
+# "queue" (in memory: the hand-off point for an SMS gateway) or "file"
+# (JSONL outbox on disk, codes in clear: only for simulations and demos)
+OTP_DELIVERY = os.environ.get("OTP_DELIVERY", "queue")
+OTP_OUTBOX = os.environ.get("OTP_OUTBOX", os.path.join(BASE_DIR, "otp_outbox.jsonl"))
+
+class RateLimited(Exception):
+    """A token bucket is empty; retry after `retry_after` seconds."""
+    def __init__(self, retry_after):
+        super().__init__(f"Too many requests, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (voter ID, client IP, ...), refilled lazily on
+    access. Keys are kept in LRU order and at most max_keys are tracked;
+    an evicted key starts again with a full bucket.
+    """
+    def __init__(self, burst, rate, max_keys=1_000_000):
+        self.burst = burst
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict() # key -> [tokens, last refill]
+
+    def take(self, key, now):
+        """Consumes one token for `key`, or raises RateLimited."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            raise RateLimited(max(1, int((1 - bucket[0]) / self.rate + 0.999)))
+        bucket[0] -= 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+class LatestCodes:
+    """Latest code per voter ID, for at most max_keys IDs (oldest sends evicted first)."""
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._codes = collections.OrderedDict()
+
+    def record(self, aadhaar, code):
+        self._codes[aadhaar] = code
+        self._codes.move_to_end(aadhaar)
+        if len(self._codes) > self.max_keys:
+            self._codes.popitem(last=False)
+
+    def get(self, aadhaar):
+        return self._codes.get(aadhaar)
+
+    def clear(self):
+        self._codes.clear()
+
+class FileOutbox:
+    """
+    Simulation stand-in for SMS delivery (OTP_DELIVERY=file): appends one
+    JSON line per code, so a script outside the server can read them.
+    latest() only reads what was appended since its last call.
+    """
+    def __init__(self, path=OTP_OUTBOX, max_keys=100_000):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._latest = LatestCodes(max_keys)
+
+    def send(self, aadhaar, destination, code):
+        line = json.dumps({"aadhaar": aadhaar, "to": destination, "code": code, "ts": time.time()})
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def latest(self, aadhaar):
+        """Most recent code sent to `aadhaar` (for simulations and tests)."""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() < self._offset: # truncated or replaced: start over
+                        self._offset = 0
+                        self._latest.clear()
+                    f.seek(self._offset)
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break # still being written
+                        self._offset += len(line)
+                        msg = json.loads(line)
+                        self._latest.record(msg["aadhaar"], msg["code"])
+            except FileNotFoundError:
+                return None
+            return self._latest.get(aadhaar)
+
+class QueueOutbox:
+    """
+    In-memory delivery (the default): a bounded queue of messages for a
+    gateway worker to drain, plus the latest code per ID, bounded the same way.
+    """
+    def __init__(self, maxlen=100_000):
+        self.messages = collections.deque(maxlen=maxlen)
+        self._latest = LatestCodes(maxlen)
+
+    def send(self, aadhaar, destination, code):
+        self.messages.append((aadhaar, destination, code))
+        self._latest.record(aadhaar, code)
+
+    def latest(self, aadhaar):
+        return self._latest.get(aadhaar)
+
+class OTPStore:
+    """
+    One-time codes kept in the server process instead of the cookie
+    session: the client only carries an opaque challenge token.
+
+    Entries live in an OrderedDict keyed by challenge (O(1) lookup). Every
+    entry has the same TTL, so insertion order is expiry order and expired
+    codes are evicted from the front on each call. A new code for the same
+    voter replaces the previous one. Codes come from `secrets`, are compared
+    in constant time and die after OTP_MAX_ATTEMPTS wrong guesses.
+
+    issue() is rate limited per voter ID and check_ip() per client IP, both
+    with token buckets; empty buckets raise RateLimited.
+    """
+    def __init__(self, delivery=None, ttl=OTP_TTL, max_attempts=OTP_MAX_ATTEMPTS,
+                 id_limiter=None, ip_limiter=None, clock=time.monotonic):
+        # Not `or`: an empty limiter is falsy (__len__)
+        self.delivery = QueueOutbox() if delivery is None else delivery
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.id_limiter = TokenBucketLimiter(OTP_ID_BURST, OTP_ID_RATE) if id_limiter is None else id_limiter
+        self.ip_limiter = TokenBucketLimiter(OTP_IP_BURST, OTP_IP_RATE) if ip_limiter is None else ip_limiter
+        self.clock = clock
+        self._entries = collections.OrderedDict() # challenge -> [aadhaar, code, expires, attempts]
+        self._by_voter = {} # aadhaar -> challenge
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._entries:
+            challenge, entry = next(iter(self._entries.items()))
+            if entry[2] > now:
+                break
+            self._remove(challenge)
+
+    def _remove(self, challenge):
+        entry = self._entries.pop(challenge, None)
+        if entry is not None and self._by_voter.get(entry[0]) == challenge:
+            del self._by_voter[entry[0]]
+
+    def check_ip(self, ip):
+        """Counts one login / verification attempt from `ip`."""
+        with self._lock:
+            self.ip_limiter.take(ip, self.clock())
+
+    def issue(self, aadhaar, destination):
+        """Creates and delivers a code for `aadhaar`; returns the challenge token for the session."""
+        code = f"{secrets.randbelow(10 ** OTP_DIGITS):0{OTP_DIGITS}d}"
+        challenge = secrets.token_urlsafe(16)
+        with self._lock:
+            now = self.clock()
+            self.id_limiter.take(aadhaar, now)
+            self._evict_expired(now)
+            previous = self._by_voter.get(aadhaar)
+            if previous is not None:
+                self._remove(previous)
+            self._entries[challenge] = [aadhaar, code, now + self.ttl, 0]
+            self._by_voter[aadhaar] = challenge
+        self.delivery.send(aadhaar, destination, code)
+        return challenge
+
+    def verify(self, challenge, code):
+        """Returns the voter's ID if `code` is right (the challenge is then used up), else None."""
+        with self._lock:
+            self._evict_expired(self.clock())
+            entry = self._entries.get(challenge)
+            if entry is None:
+                return None
+            entry[3] += 1
+            if hmac.compare_digest(entry[1], str(code or "")):
+                self._remove(challenge)
+                return entry[0]
+            if entry[3] >= self.max_attempts:
+                self._remove(challenge)
+            return None
+
+    def is_pending(self, challenge):
+        """True while the challenge can still be verified (not expired, used up or replaced)."""
+        with self._lock:
+            self._evict_expired(self.clock())
+            return challenge in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._entries),
+                "tracked_ids": len(self.id_limiter),
+                "tracked_ips": len(self.ip_limiter),
+            }
+
+def make_delivery(kind=OTP_DELIVERY):
+    if kind == "file":
+        return FileOutbox()
+    if kind == "queue":
+        return QueueOutbox()
+    raise ValueError(f"Unknown OTP delivery backend: {kind}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_otp_store():
+    """Process-wide OTP store with the delivery backend from OTP_DELIVERY."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OTPStore(make_delivery())
+    return _store
@@ -0,0 +1,135 @@
+import os
+import queue
+import random
+import threading
+from collections import namedtuple
+from src.keygen import key_context_for, load_public_key
+from src.voting import random_unit
+from src.zkp import CHALLENGE_MODULUS
+
+POOL_SIZE = int(os.environ.get("RANDOMNESS_POOL_SIZE", 64))
+REFILL_THREADS = int(os.environ.get("RANDOMNESS_POOL_THREADS", 1))
+
+# Everything a ballot needs that does not depend on the vote:
+#   r, r_n        encryption randomness and r^n mod n^2
+#   w, a_real     real-branch commitment w^n mod n^2
+#   e_fake,
+#   z_fake        simulated branch challenge / response
+#   fake_term     z_fake^n * r_n^(-e_fake) mod n^2
+# The simulated commitment is then fake_term * g^(e_fake * (fake - vote)),
+# and with g = n+1 that last factor is a multiplication.
+Nonce = namedtuple("Nonce", ["n", "r", "r_n", "w", "a_real", "e_fake", "z_fake", "fake_term"])
+
+def precompute_nonce(public_key):
+    """Draws fresh randomness and does every vote-independent exponentiation."""
+    ctx = key_context_for(public_key)
+    n, ns = ctx.n, ctx.ns
+    rng = random.SystemRandom()
+
+    # Same ranges as the on-line prover
+    r = random_unit(n)
+    w = rng.randint(1, n // 2)
+    e_fake = rng.randrange(CHALLENGE_MODULUS)
+    z_fake = rng.randint(1, n)
+
+    r_n = pow(r, n, ns)
+    a_real = pow(w, n, ns)
+    fake_term = (pow(z_fake, n, ns) * pow(r_n, -e_fake, ns)) % ns
+    return Nonce(n, r, r_n, w, a_real, e_fake, z_fake, fake_term)
+
+class RandomnessPool:
+    """
+    Bounded pool of precomputed nonces, filled by background threads while
+    the kiosk is idle. Each nonce is handed out exactly once (queue.get
+    removes it); when the pool is empty take() computes one inline and
+    counts a miss.
+    """
+    def __init__(self, public_key=None, size=POOL_SIZE, refill_threads=REFILL_THREADS):
+        self.public_key = public_key or load_public_key()
+        self.n = self.public_key.n
+        self.size = size
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._threads = [
+            threading.Thread(target=self._refill_loop, name=f"randomness-pool-{i}", daemon=True)
+            for i in range(refill_threads)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _refill_loop(self):
+        while not self._stop.is_set():
+            nonce = precompute_nonce(self.public_key)
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(nonce, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def take(self):
+        """Removes and returns one nonce; never blocks on the refill threads."""
+        try:
+            nonce = self._queue.get_nowait()
+            hit = True
+        except queue.Empty:
+            nonce = precompute_nonce(self.public_key)
+            hit = False
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return nonce
+
+    def try_take(self):
+        """Like take() but returns None on a miss instead of computing inline."""
+        try:
+            nonce = self._queue.get_nowait()
+        except queue.Empty:
+            nonce = None
+        with self._stats_lock:
+            if nonce is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return nonce
+
+    def available(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "size": self.size,
+            "available": self.available(),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_randomness_pool():
+    """Process-wide pool for the current public key, started on first use."""
+    global _pool
+    public_key = load_public_key()
+    with _pool_lock:
+        if _pool is None or _pool.n != public_key.n:
+            if _pool is not None:
+                # Key ceremony produced a new key: old nonces are useless
+                _pool.stop()
+            _pool = RandomnessPool(public_key)
+    return _pool
@@ -0,0 +1,198 @@
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import src.db as db
+from src.eligibility import voter_key, format_voter_key
+
+BATCH_SIZE = 50000
+# Each 12-digit ID space slice goes to its own staging shard
+ID_SPACE = 10 ** 12
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def iter_roll(path, fmt=None):
+    """
+    Streams (aadhaar, name, phone) records from a CSV (header with at least
+    an `aadhaar` column) or JSONL roll, optionally gzipped. IDs are not
+    validated here. Memory use does not depend on the size of the roll.
+    """
+    base = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or ("jsonl" if base.endswith((".jsonl", ".ndjson")) else "csv")
+    with _open_text(path) as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield row.get("aadhaar"), row.get("name") or "", row.get("phone") or ""
+        elif fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield str(row.get("aadhaar", "")), row.get("name") or "", row.get("phone") or ""
+        else:
+            raise ValueError(f"Unknown roll format: {fmt}")
+
+def _bulk_connection(path):
+    """
+    Connection for a staging file: no journal, no fsyncs. Staging files are
+    scratch (a failed import deletes them and is simply re-run); the ledger
+    itself is only written through db.get_db_connection().
+    """
+    conn = sqlite3.connect(path, timeout=db.BUSY_TIMEOUT)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute(f'PRAGMA cache_size=-{db.CACHE_SIZE_KB * 4}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+def _create_staging(conn, name="voters_staging"):
+    # No primary key or index while loading: plain appends
+    conn.execute(f'DROP TABLE IF EXISTS {name}')
+    conn.execute(f'CREATE TABLE {name} (aadhaar TEXT NOT NULL, name TEXT NOT NULL, phone TEXT NOT NULL)')
+
+def _sort_shard(path):
+    """Worker: copies one staging shard into a table in key order."""
+    conn = _bulk_connection(path)
+    try:
+        conn.execute('CREATE TABLE voters_sorted AS SELECT * FROM voters_staging ORDER BY aadhaar')
+        conn.execute('DROP TABLE voters_staging')
+    finally:
+        conn.close()
+    return path
+
+def _merge_shards(paths):
+    """Appends the sorted shards to the first one, in prefix order: the result stays sorted."""
+    conn = _bulk_connection(paths[0])
+    try:
+        for shard_path in paths[1:]:
+            conn.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+            with conn:
+                conn.execute('INSERT INTO voters_sorted SELECT * FROM shard.voters_sorted')
+            conn.execute('DETACH DATABASE shard')
+    finally:
+        conn.close()
+    return paths[0]
+
+def _has_votes(conn=None):
+    if conn is None:
+        with db.pooled_connection() as conn:
+            return _has_votes(conn)
+    return conn.execute('SELECT 1 FROM voters WHERE has_voted = 1 LIMIT 1').fetchone() is not None
+
+def import_roll(path, fmt=None, shards=1, workers=None, batch_size=BATCH_SIZE,
+                replace=False, on_progress=None):
+    """
+    Loads a voter roll into the voters table in bounded memory.
+
+    Rows are validated (12-digit Aadhaar IDs, stored in the canonical
+    "1234-5678-9012" form) and appended in transactions of `batch_size`
+    rows to unindexed staging tables in scratch SQLite files next to the
+    database, split by ID prefix into `shards` files. `workers` processes
+    sort the shards in parallel and they are concatenated in prefix order.
+
+    The ledger database is then written once, in a single durable
+    transaction: the voters primary-key index is filled in key order with
+    INSERT ... SELECT from the attached staging file. IDs already on the
+    roll keep their row (and has_voted flag). voters itself stays in the
+    ledger database: claim_voter flips has_voted in the same transaction as
+    the ballot insert.
+
+    replace=True clears the roll in that same transaction (refused once
+    anyone has voted), so a failed import leaves the old roll in place.
+    Returns a report with row counts and rows/s.
+    """
+    start = time.perf_counter()
+    shards = max(shards, 1)
+    report = {"rows": 0, "invalid": 0, "inserted": 0, "duplicates": 0, "shards": shards}
+    db.init_db()
+    if replace and _has_votes():
+        raise ValueError("Votes have been cast: refusing to replace the roll")
+    shard_paths = [f"{db.DB_PATH}.roll-shard-{k}" for k in range(shards)]
+    shard_conns = []
+    conn = None
+    try:
+        # 1. Stream the roll into the staging shards, batch by batch
+        for shard_path in shard_paths:
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+            shard_conn = _bulk_connection(shard_path)
+            _create_staging(shard_conn)
+            shard_conns.append(shard_conn)
+        batches = [[] for _ in range(shards)]
+
+        def flush(k):
+            with shard_conns[k]:
+                shard_conns[k].executemany('INSERT INTO voters_staging VALUES (?, ?, ?)', batches[k])
+            batches[k].clear()
+
+        for aadhaar, name, phone in iter_roll(path, fmt):
+            report["rows"] += 1
+            key = voter_key(aadhaar)
+            if key is None:
+                report["invalid"] += 1
+                continue
+            k = key * shards // ID_SPACE
+            batches[k].append((format_voter_key(key), name, phone))
+            if len(batches[k]) >= batch_size:
+                flush(k)
+            if on_progress and report["rows"] % batch_size == 0:
+                on_progress(report["rows"], time.perf_counter() - start)
+        for k in range(shards):
+            if batches[k]:
+                flush(k)
+        for shard_conn in shard_conns:
+            shard_conn.close()
+        shard_conns = []
+
+        # 2. Sort the shards and concatenate them into one staging file
+        if shards > 1:
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, shards),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                sorted_paths = list(pool.map(_sort_shard, shard_paths))
+            staging_path = _merge_shards(sorted_paths)
+        else:
+            staging_path = _sort_shard(shard_paths[0])
+
+        # 3. One transaction on the ledger (synchronous=FULL): clear if
+        # replacing, then fill voters (and its index) once, in key order
+        conn = db.get_db_connection()
+        conn.execute('ATTACH DATABASE ? AS staging', (staging_path,))
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if replace:
+                # Checked again under the write lock: a vote may have landed since
+                if _has_votes(conn):
+                    raise ValueError("Votes have been cast: refusing to replace the roll")
+                conn.execute('DELETE FROM voters')
+            before = conn.execute('SELECT count(*) FROM voters').fetchone()[0]
+            conn.execute('INSERT OR IGNORE INTO voters (aadhaar, name, phone, has_voted) '
+                         'SELECT aadhaar, name, phone, 0 FROM staging.voters_sorted')
+            report["inserted"] = conn.execute('SELECT count(*) FROM voters').fetchone()[0] - before
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.execute('DETACH DATABASE staging')
+        # Fold the import out of the WAL without blocking the server's readers
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+        report["duplicates"] = report["rows"] - report["invalid"] - report["inserted"]
+    finally:
+        for shard_conn in shard_conns:
+            shard_conn.close()
+        if conn is not None:
+            conn.close()
+        for shard_path in shard_paths:
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+
+    report["elapsed"] = time.perf_counter() - start
+    report["rows_per_s"] = report["rows"] / report["elapsed"] if report["elapsed"] else 0.0
+    return report
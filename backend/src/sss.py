@@ -4,47 +4,103 @@ import functools
 # We need a prime larger than the secret.
 # Paillier keys (up to 2048 bits) require a very large field.
 # Mersenne Prime M2203 = 2^2203 - 1 is approx 2203 bits, enough for 2048-bit secrets.
-PRIME = 2**2203 - 1
+PRIME_BITS = 2203
+PRIME = 2**PRIME_BITS - 1
+
+def _reduce(x):
+    """
+    x mod (2^k - 1) for x >= 0 without a division:
+    2^k = 1 (mod p), so the high bits fold onto the low bits.
+    """
+    while x >> PRIME_BITS:
+        x = (x & PRIME) + (x >> PRIME_BITS)
+    return 0 if x == PRIME else x
 
 def _eval_poly(poly, x):
-    """Evaluates polynomial at x."""
+    """
+    Evaluates polynomial at x (Horner). Share IDs are small, so the
+    accumulator only grows by bit_length(x) per step: reduce once at the end.
+    """
     result = 0
     for coeff in reversed(poly):
-        result = (result * x + coeff) % PRIME
-    return result
+        result = result * x + coeff
+    return _reduce(result)
 
-def split_secret(secret_int, t, n):
+def _random_coeffs(count):
+    rng = random.SystemRandom()
+    return [rng.randint(0, PRIME - 1) for _ in range(count)]
+
+def split_secrets(secret_ints, t, n):
     """
-    Splits an integer secret into n shares, requiring t to reconstruct.
-    Returns list of tuples (x, y).
+    Splits many integer secrets at once, each into n shares with threshold t.
+    Returns one list of (x, y) shares per secret, in input order.
     """
     if t > n:
         raise ValueError("Threshold t cannot be greater than n")
-        
+    if t < 1:
+        raise ValueError("Threshold t must be at least 1")
+
     # Valid polynomial: secret + a1*x + ... + a(t-1)*x^(t-1)
-    coeffs = [secret_int] + [random.SystemRandom().randint(0, PRIME - 1) for _ in range(t - 1)]
-    
-    shares = []
-    for i in range(1, n + 1):
-        x = i
-        y = _eval_poly(coeffs, x)
-        shares.append((x, y))
-        
-    return shares
-
-def _extended_gcd(a, b):
-    x0, x1, y0, y1 = 0, 1, 1, 0
-    while a != 0:
-        q, b, a = b // a, a, b % a
-        y0, y1 = y1, y0 - q * y1
-        x0, x1 = x1, x0 - q * x1
-    return b, x0, y0
-
-def _mod_inverse(k, p):
-    g, x, y = _extended_gcd(k, p)
-    if g != 1:
-        raise Exception('Modular inverse does not exist')
-    return (x % p + p) % p
+    polys = []
+    for secret_int in secret_ints:
+        if not 0 <= secret_int < PRIME:
+            raise ValueError("Secret does not fit in the field")
+        polys.append([secret_int] + _random_coeffs(t - 1))
+    return [[(x, _eval_poly(coeffs, x)) for x in range(1, n + 1)] for coeffs in polys]
+
+def split_secret(secret_int, t, n):
+    """
+    Splits an integer secret into n shares, requiring t to reconstruct.
+    Returns list of tuples (x, y).
+    """
+    return split_secrets([secret_int], t, n)[0]
+
+def _batch_inverse(values):
+    """
+    Inverts every value mod PRIME with a single modular inverse
+    (Montgomery's trick: invert the product, then peel off prefixes).
+    """
+    prefix = [1]
+    for v in values:
+        prefix.append(prefix[-1] * v % PRIME)
+    if prefix[-1] == 0:
+        raise ValueError('Modular inverse does not exist')
+
+    inv = pow(prefix[-1], -1, PRIME)
+    inverses = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        inverses[i] = inv * prefix[i] % PRIME
+        inv = inv * values[i] % PRIME
+    return inverses
+
+@functools.lru_cache(maxsize=256)
+def lagrange_coefficients(xs):
+    """
+    Lagrange basis at x=0 for the share IDs `xs` (a sorted tuple):
+    L_j(0) = Prod (0 - xm) / (xj - xm) for m != j.
+    Cached per share-ID subset, so repeat recoveries skip this O(t^2) step.
+    """
+    if len(set(xs)) != len(xs):
+        raise ValueError("Duplicate share IDs")
+    if 0 in xs:
+        raise ValueError("Share ID 0 would be the secret itself")
+
+    # Share IDs are small, so these products stay far below PRIME:
+    # work with exact integers and reduce once
+    sign = -1 if len(xs) % 2 == 0 else 1
+    all_xs = 1
+    for x in xs:
+        all_xs *= x
+    numerators = [sign * (all_xs // xj) % PRIME for xj in xs]
+    denominators = []
+    for j, xj in enumerate(xs):
+        denominator = 1
+        for m, xm in enumerate(xs):
+            if m != j:
+                denominator *= xj - xm
+        denominators.append(denominator % PRIME)
+
+    return tuple(num * inv % PRIME for num, inv in zip(numerators, _batch_inverse(denominators)))
 
 def recover_secret(shares):
     """
@@ -52,30 +108,13 @@ def recover_secret(shares):
     """
     if len(shares) < 1:
         raise ValueError("No shares provided")
-        
+
+    shares = sorted(shares)
+    coeffs = lagrange_coefficients(tuple(x for x, _ in shares))
     sum_val = 0
-    xs = [s[0] for s in shares]
-    ys = [s[1] for s in shares]
-    
-    for j in range(len(shares)):
-        # Lagrange basis polynomial L_j(0)
-        # Prod (0 - xm) / (xj - xm) for m != j
-        
-        numerator = 1
-        denominator = 1
-        
-        for m in range(len(shares)):
-            if m == j:
-                continue
-            
-            numerator = (numerator * (0 - xs[m])) % PRIME
-            denominator = (denominator * (xs[j] - xs[m])) % PRIME
-            
-        lagrange_coeff = (numerator * _mod_inverse(denominator, PRIME)) % PRIME
-        term = (ys[j] * lagrange_coeff) % PRIME
-        sum_val = (sum_val + term) % PRIME
-        
-    return sum_val
+    for (_, y), coeff in zip(shares, coeffs):
+        sum_val += y * coeff
+    return _reduce(sum_val)
 
 def int_to_hex(val):
     return hex(val)[2:]
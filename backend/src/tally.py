@@ -1,9 +1,14 @@
 import json
+import multiprocessing
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from phe import paillier
+import src.db as db
 from src.keygen import load_public_key, KEY_DIR
-from src.bulletin_board import BulletinBoard
 from src.hybrid_sss import recover_and_decrypt
+from src.hsm import VirtualHSM
 
 def reconstruct_private_key(shares_data, public_key):
     """
@@ -34,30 +39,160 @@ def reconstruct_private_key(shares_data, public_key):
         print(f"Key Reconstruction Failed: {e}")
         return None
 
-def compute_tally(public_key):
-    # Same as before, logic separate
-    bb = BulletinBoard()
-    ledger = bb.get_all_ballots()
-    if not ledger:
+def multiply_ciphertexts(ciphertexts, nsquare):
+    """
+    Homomorphic sum of a stream of raw ciphertexts: their product mod n^2.
+    Returns 1 (an encryption of 0 with r = 1) for an empty stream.
+    """
+    product = 1
+    for c in ciphertexts:
+        product = (product * int(c)) % nsquare
+    return product
+
+def _init_tally_worker(db_path):
+    db.DB_PATH = db_path
+
+def _tally_range(start_id, stop_id, nsquare, chunk_size):
+    """Worker: partial product of one [start_id, stop_id) slice of the ledger."""
+    return multiply_ciphertexts(db.iter_ciphertexts(chunk_size, start_id, stop_id), nsquare)
+
+def compute_tally(public_key, chunk_size=1000, workers=None, range_size=50000, ballot_count=None):
+    """
+    Streams ciphertexts from the ledger and accumulates the homomorphic sum.
+    Memory stays constant regardless of the number of ballots.
+
+    Ciphertexts are multiplied as plain integers mod n^2 (all votes use
+    exponent 0, so no EncryptedNumber bookkeeping is needed). Ledgers
+    larger than `range_size` ballots are split into id ranges reduced by
+    `workers` processes (default: all cores); the partial products are
+    then multiplied together.
+    ballot_count limits the tally to the first ballot_count ballots.
+    Returns None for an empty ledger.
+    """
+    max_id = db.get_max_ballot_id()
+    if ballot_count is not None:
+        max_id = min(max_id, ballot_count)
+    if max_id == 0:
         return None
-        
-    encrypted_ballots = []
-    for entry in ledger:
-        ballot = entry['ballot']
-        c_int = int(ballot['ciphertext'])
-        exp = int(ballot['exponent'])
-        enc_vote = paillier.EncryptedNumber(public_key, c_int, exp)
-        encrypted_ballots.append(enc_vote)
-    
-    return sum(encrypted_ballots)
 
-def reveal_result_with_shares(share_indices=[1, 2, 3]):
+    nsquare = public_key.nsquare
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or max_id <= range_size:
+        product = _tally_range(None, max_id + 1, nsquare, chunk_size)
+    else:
+        bounds = [(lo, min(lo + range_size, max_id + 1)) for lo in range(1, max_id + 1, range_size)]
+        # spawn, as in CryptoPool: the caller may be the threaded web server
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_tally_worker, initargs=(db.DB_PATH,)) as pool:
+            partials = pool.map(_tally_range, *zip(*bounds),
+                                [nsquare] * len(bounds), [chunk_size] * len(bounds))
+            product = multiply_ciphertexts(partials, nsquare)
+
+    return paillier.EncryptedNumber(public_key, product, 0) # exponent is 0 per protocol
+
+class EncryptedSubtotals:
     """
-    Load specific shares for the demo.
+    Encrypted vote subtotals keyed by kiosk (or region, ...): key -> [product, count].
+    Each entry is updated independently with add(); tables built on different
+    nodes are combined with merge() and rolled up a level with roll_up(), so
+    kiosk -> region -> national totals form a tree of ciphertext products.
     """
-    public_key = load_public_key()
-    
-    # Load requested shares
+    def __init__(self, nsquare, entries=None):
+        self.nsquare = nsquare
+        self.entries = entries if entries is not None else {}
+
+    def add(self, key, ciphertext, count=1):
+        entry = self.entries.setdefault(key, [1, 0])
+        entry[0] = (entry[0] * int(ciphertext)) % self.nsquare
+        entry[1] += count
+
+    def merge(self, other):
+        """Folds another table (e.g. from another worker or node) into this one."""
+        for key, (product, count) in other.entries.items():
+            self.add(key, product, count)
+        return self
+
+    def roll_up(self, parent_of):
+        """
+        Aggregates one level up. parent_of maps a key to its parent (a dict
+        or a callable); keys without a parent go to "unassigned".
+        """
+        lookup = parent_of.get if isinstance(parent_of, dict) else parent_of
+        parents = EncryptedSubtotals(self.nsquare)
+        for key, (product, count) in self.entries.items():
+            parents.add(lookup(key) or "unassigned", product, count)
+        return parents
+
+    def total(self):
+        """(product, count) over every key."""
+        product, count = 1, 0
+        for entry_product, entry_count in self.entries.values():
+            product = (product * entry_product) % self.nsquare
+            count += entry_count
+        return product, count
+
+    def encrypted(self, public_key, key):
+        return paillier.EncryptedNumber(public_key, self.entries[key][0], 0)
+
+    def to_dict(self):
+        """JSON-safe form, for shipping subtotals between tally nodes."""
+        return {key: {"product": str(product), "count": count}
+                for key, (product, count) in self.entries.items()}
+
+    @classmethod
+    def from_dict(cls, nsquare, data):
+        return cls(nsquare, {key: [int(v["product"]), v["count"]] for key, v in data.items()})
+
+def _subtotal_range(start_id, stop_id, nsquare, chunk_size, kiosks):
+    """Worker: per-kiosk subtotals of one [start_id, stop_id) slice of the ledger."""
+    subtotals = EncryptedSubtotals(nsquare)
+    for row in db.iter_ledger_rows(chunk_size, 'kiosk_id, ciphertext', start_id, stop_id, kiosks):
+        subtotals.add(row['kiosk_id'], row['ciphertext'])
+    return subtotals
+
+def compute_subtotals(public_key, kiosks=None, chunk_size=1000, workers=None, range_size=50000):
+    """
+    Per-kiosk encrypted subtotals, streamed and split over workers like
+    compute_tally(). kiosks restricts the scan to a set of kiosk ids, so a
+    regional node only tallies its own kiosks.
+    """
+    max_id = db.get_max_ballot_id()
+    nsquare = public_key.nsquare
+    kiosks = set(kiosks) if kiosks is not None else None
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or max_id <= range_size:
+        return _subtotal_range(None, max_id + 1, nsquare, chunk_size, kiosks)
+
+    bounds = [(lo, min(lo + range_size, max_id + 1)) for lo in range(1, max_id + 1, range_size)]
+    subtotals = EncryptedSubtotals(nsquare)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_tally_worker, initargs=(db.DB_PATH,)) as pool:
+        for partial in pool.map(_subtotal_range, *zip(*bounds), [nsquare] * len(bounds),
+                                [chunk_size] * len(bounds), [kiosks] * len(bounds)):
+            subtotals.merge(partial)
+    return subtotals
+
+def aggregate_hierarchy(kiosk_subtotals, region_of):
+    """
+    kiosk -> region -> national roll-up. Returns (region_subtotals, (product, count)).
+    region_of: dict or callable mapping kiosk_id to a region name.
+    """
+    regions = kiosk_subtotals.roll_up(region_of)
+    return regions, regions.total()
+
+def decrypt_subtotals(private_key, subtotals):
+    """{key: (yes_votes, ballots)} for every entry."""
+    return {key: (private_key.raw_decrypt(product), count)
+            for key, (product, count) in subtotals.entries.items()}
+
+def decode_packed_tally(private_key, encrypted_tally, encoding):
+    """Decrypts a packed multi-candidate tally into per-candidate counts."""
+    if encrypted_tally is None:
+        return [0] * encoding.num_candidates
+    return encoding.decode(private_key.raw_decrypt(encrypted_tally.ciphertext(be_secure=False)))
+
+def load_shares(share_indices):
+    """Reads the trustees' share files; returns None if any is missing."""
     shares_data = []
     for idx in share_indices:
         path = os.path.join(KEY_DIR, f"private_key_share_{idx}.json")
@@ -66,7 +201,21 @@ def reveal_result_with_shares(share_indices=[1, 2, 3]):
                 shares_data.append(json.load(f))
         else:
             print(f"Share {idx} missing!")
-            return
+            return None
+    return shares_data
+
+def reveal_result_with_shares(share_indices=[1, 2, 3], encrypted_tally=None):
+    """
+    Load specific shares for the demo.
+    encrypted_tally: the Bulletin Board's running tally, if available;
+    otherwise the ledger is rescanned with compute_tally().
+    """
+    public_key = load_public_key()
+    
+    # Load requested shares
+    shares_data = load_shares(share_indices)
+    if shares_data is None:
+        return
             
     # Reconstruct
     private_key = reconstruct_private_key(shares_data, public_key)
@@ -75,7 +224,8 @@ def reveal_result_with_shares(share_indices=[1, 2, 3]):
         return
         
     # Tally
-    encrypted_tally = compute_tally(public_key)
+    if encrypted_tally is None:
+        encrypted_tally = compute_tally(public_key)
     if encrypted_tally:
         try:
             # Check for potential overflow by peeking at raw value if possible, 
@@ -94,6 +244,91 @@ def reveal_result_with_shares(share_indices=[1, 2, 3]):
             return -1
     return 0
 
+class TallyResultService:
+    """
+    Serves the published election result.
+
+    The private key is reconstructed from the shares once and kept for the
+    lifetime of the service; decryption uses phe's raw_decrypt, which works
+    mod p^2 and q^2 separately and recombines with CRT. Each result is
+    signed by the service's VirtualHSM and cached under the ledger tip hash
+    (chain head), so repeated page loads for an unchanged ledger are a
+    dictionary lookup. A new ballot changes the chain head and therefore
+    the cache key.
+    """
+    CACHE_SIZE = 8
+
+    def __init__(self, share_indices=(1, 2, 3), hsm=None):
+        self.share_indices = list(share_indices)
+        self._hsm = hsm
+        self._private_key = None
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hsm(self):
+        # Created on first use: generating the signing key is not free
+        if self._hsm is None:
+            self._hsm = VirtualHSM(key_label="TALLY_RESULT_KEY")
+        return self._hsm
+
+    def private_key(self, public_key):
+        if self._private_key is None or self._private_key.public_key.n != public_key.n:
+            shares_data = load_shares(self.share_indices)
+            if shares_data is None:
+                raise ValueError("Trustee shares missing")
+            private_key = reconstruct_private_key(shares_data, public_key)
+            if not private_key:
+                raise ValueError("Failed to reconstruct private key. Wrong shares?")
+            self._private_key = private_key
+        return self._private_key
+
+    def get_result(self, bb):
+        """Signed result for the board's current ledger state."""
+        key, total_votes, encrypted_tally = bb.tally_snapshot()
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+
+            if encrypted_tally is None:
+                yes_votes = 0
+                tally_ciphertext = None
+            else:
+                tally_ciphertext = encrypted_tally.ciphertext(be_secure=False)
+                yes_votes = self.private_key(bb.public_key).raw_decrypt(tally_ciphertext)
+                if yes_votes > total_votes:
+                    raise ValueError("Decrypted tally exceeds ballot count: wrong key or corrupted tally")
+
+            result = {
+                "chain_head": key,
+                "total_votes": total_votes,
+                "yes_votes": yes_votes,
+                "no_votes": total_votes - yes_votes,
+                "encrypted_tally": str(tally_ciphertext) if tally_ciphertext is not None else None
+            }
+            payload = json.dumps(result, sort_keys=True).encode()
+            result = dict(result,
+                          signature=self.hsm.sign_data(payload).hex(),
+                          signer_public_key=self.hsm.get_public_key_pem())
+
+            self._results[key] = result
+            if len(self._results) > self.CACHE_SIZE:
+                self._results.popitem(last=False)
+            return result
+
+_result_service = None
+_result_service_lock = threading.Lock()
+
+def get_tally_result_service():
+    """Process-wide result service, created on first use."""
+    global _result_service
+    with _result_service_lock:
+        if _result_service is None:
+            _result_service = TallyResultService()
+    return _result_service
+
 if __name__ == "__main__":
     # Default demo: Use shares 1, 2, 3 (threshold is 3 usually)
     reveal_result_with_shares([1, 2, 3])
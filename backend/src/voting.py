@@ -1,53 +1,177 @@
 import json
 import uuid
 import time
+import math
 import random
-from phe import paillier
-from src.keygen import load_public_key
+from collections import namedtuple
+from src.keygen import load_public_key, key_context_for
 from src.zkp import ZKPProver
 
-def create_ballot(vote_int, kiosk_id="kiosk-demo"):
+# ciphertext = (1 + m*n) * r^n mod n^2; r and r^n are kept for the prover / precompute
+EncryptedVote = namedtuple("EncryptedVote", ["ciphertext", "r", "r_n"])
+
+def random_unit(n):
+    """
+    Random r in Z_n* (coprime to n).
+    Since p,q are large primes, almost any random int < n is coprime.
+    """
+    r = random.SystemRandom().randint(1, n)
+    while math.gcd(r, n) != 1:
+        # Simple GCD check to be pedantic, though prob of failure is negligible
+        r = random.SystemRandom().randint(1, n)
+    return r
+
+class PackedEncoding:
+    """
+    Multi-candidate plaintext layout: candidate j owns bits
+    [j*slot_bits, (j+1)*slot_bits) of one Paillier plaintext, i.e. a vote for
+    j encrypts B^j with B = 2^slot_bits. Summing ballots adds the slots
+    independently as long as no count reaches B, so slot_bits must exceed
+    the bit length of the electorate.
+    """
+    def __init__(self, num_candidates, slot_bits=32):
+        if num_candidates < 2:
+            raise ValueError("Need at least two candidates")
+        self.num_candidates = num_candidates
+        self.slot_bits = slot_bits
+        self.base = 1 << slot_bits
+
+    def check_key(self, public_key):
+        # The packed sum must stay below n, or it wraps around on decryption
+        if self.num_candidates * self.slot_bits >= public_key.n.bit_length() - 1:
+            raise ValueError(f"{self.num_candidates} slots of {self.slot_bits} bits do not fit in the key")
+
+    def values(self):
+        """Plaintext of a vote for each candidate, in candidate order."""
+        return [self.base ** j for j in range(self.num_candidates)]
+
+    def decode(self, plaintext_sum):
+        """Splits a decrypted sum back into per-candidate counts."""
+        counts = []
+        for _ in range(self.num_candidates):
+            counts.append(plaintext_sum % self.base)
+            plaintext_sum //= self.base
+        if plaintext_sum:
+            raise ValueError("Tally does not fit the packed layout")
+        return counts
+
+def encrypt_vote(public_key, vote_int, r=None, r_n=None):
+    """
+    Paillier encryption specialised for m in {0, 1} and g = n+1:
+    g^m mod n^2 is just 1 + m*n, so the only exponentiation is r^n mod n^2
+    (skipped when a precomputed r_n is supplied).
+    Produces exactly the ciphertext phe's public_key.encrypt(m, r_value=r) does.
+    """
+    if vote_int not in [0, 1]:
+        raise ValueError("Vote must be 0 or 1")
+    return _encrypt_plaintext(public_key, vote_int, r, r_n)
+
+def encrypt_packed(public_key, encoding, candidate, r=None, r_n=None):
+    """Encrypts a vote for `candidate` under a PackedEncoding: one ciphertext for all slots."""
+    if not 0 <= candidate < encoding.num_candidates:
+        raise ValueError("Unknown candidate")
+    encoding.check_key(public_key)
+    return _encrypt_plaintext(public_key, encoding.values()[candidate], r, r_n)
+
+def _encrypt_plaintext(public_key, m, r, r_n):
+    ctx = key_context_for(public_key)
+    if r is None:
+        r = random_unit(ctx.n)
+    if r_n is None:
+        r_n = pow(r, ctx.n, ctx.ns)
+    return EncryptedVote((ctx.g_pow(m) * r_n) % ctx.ns, r, r_n)
+
+def create_ballot(vote_int, kiosk_id="kiosk-demo", pool=None, nonce=None):
     """
     Encrypts a vote (0 or 1) and creates a ballot object.
+    pool: optional precompute.RandomnessPool; with a precomputed nonce
+    only multiplications and one exponentiation mod n remain.
+    nonce: a precompute.Nonce already taken from a pool (e.g. by the
+    process handing this ballot to a worker); used instead of `pool`.
     """
     if vote_int not in [0, 1]:
         raise ValueError("Vote must be 0 or 1")
-        
+
     public_key = load_public_key()
+
+    # Nonces are single use and bound to the key they were computed for
+    if nonce is None and pool is not None and pool.n == public_key.n:
+        nonce = pool.take()
+    elif nonce is not None and nonce.n != public_key.n:
+        nonce = None
+
+    # 1. Encrypt with explicit randomness r (needed by the prover)
+    if nonce is not None:
+        encrypted_vote = encrypt_vote(public_key, vote_int, nonce.r, nonce.r_n)
+    else:
+        encrypted_vote = encrypt_vote(public_key, vote_int)
+    ciphertext_int = encrypted_vote.ciphertext
     
-    # 1. Generate explicit randomness r
-    # r must be in Z_n* (coprime to n). 
-    # Since p,q are large primes, almost any random int < n is coprime.
-    r = random.SystemRandom().randint(1, public_key.n)
-    while True:
-        # Simple GCD check to be pedantic, though prob of failure is negligible
-        import math
-        if math.gcd(r, public_key.n) == 1:
-            break
-        r = random.SystemRandom().randint(1, public_key.n)
-
-    # 2. Encrypt using this r
-    # phe allows passing r_value. Note: phe expects r to be < n.
-    encrypted_vote = public_key.encrypt(vote_int, r_value=r)
-    
-    # Serialize ciphertext
-    ciphertext_int = encrypted_vote.ciphertext(be_secure=False)
-    
-    # 3. Generate Real ZKP
+    # 2. Generate Real ZKP
     prover = ZKPProver(public_key)
-    zkp_proof = prover.prove_vote(ciphertext_int, vote_int, r)
+    zkp_proof = prover.prove_vote(ciphertext_int, vote_int, encrypted_vote.r, nonce=nonce)
     
     ballot = {
         "ballot_id": str(uuid.uuid4()),
         "timestamp": time.time(),
         "kiosk_id": kiosk_id,
         "ciphertext": str(ciphertext_int), 
-        "exponent": encrypted_vote.exponent,
+        "exponent": 0, # Integer votes are encoded with exponent 0
         "proof": zkp_proof
     }
     
     return ballot
 
+def create_packed_ballot(candidate, encoding, kiosk_id="kiosk-demo"):
+    """
+    Multi-candidate ballot: one ciphertext of B^candidate plus a one-of-K
+    proof. Same ballot fields as create_ballot, so it is stored and chained
+    the same way.
+    """
+    public_key = load_public_key()
+    encrypted_vote = encrypt_packed(public_key, encoding, candidate)
+    
+    prover = ZKPProver(public_key)
+    zkp_proof = prover.prove_one_of(encrypted_vote.ciphertext, encoding.values(), candidate, encrypted_vote.r)
+    
+    return {
+        "ballot_id": str(uuid.uuid4()),
+        "timestamp": time.time(),
+        "kiosk_id": kiosk_id,
+        "ciphertext": str(encrypted_vote.ciphertext),
+        "exponent": 0,
+        "proof": zkp_proof
+    }
+
+def ballot_from_client(ciphertext, proof, kiosk_id="mobile-app", public_key=None):
+    """
+    Ballot for a ciphertext + OR-proof produced by the client
+    (static/js/crypto.js). Only the shape is checked here; the proof itself
+    is verified by the bulletin board like any other ballot.
+    Raises ValueError for malformed input.
+    """
+    public_key = public_key or load_public_key()
+    try:
+        ciphertext_int = int(ciphertext)
+        fields = {key: [str(int(x)) for x in proof[key]] for key in ("a", "e", "z")}
+    except (TypeError, ValueError, KeyError):
+        raise ValueError("Malformed ciphertext or proof")
+    if not 0 < ciphertext_int < public_key.nsquare or math.gcd(ciphertext_int, public_key.n) != 1:
+        raise ValueError("Ciphertext is not a valid encryption under the election key")
+    if any(len(values) != 2 for values in fields.values()):
+        raise ValueError("Proof must have exactly two branches")
+    if not isinstance(kiosk_id, str) or not 0 < len(kiosk_id) <= 64:
+        raise ValueError("Invalid kiosk ID")
+
+    return {
+        "ballot_id": str(uuid.uuid4()),
+        "timestamp": time.time(),
+        "kiosk_id": kiosk_id,
+        "ciphertext": str(ciphertext_int),
+        "exponent": 0,
+        "proof": fields
+    }
+
 if __name__ == "__main__":
     b = create_ballot(1)
     print(json.dumps(b, indent=2))
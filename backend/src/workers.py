@@ -0,0 +1,154 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.voting import create_ballot
+from src.zkp import ZKPVerifier
+
+CRYPTO_WORKERS = int(os.environ.get("CRYPTO_WORKERS", 0)) or os.cpu_count() or 1
+# Jobs admitted per worker (running + queued) before requests are turned away
+CRYPTO_QUEUE_DEPTH = int(os.environ.get("CRYPTO_QUEUE_DEPTH", 4))
+
+class PoolSaturated(Exception):
+    """Every slot of the crypto pool is taken; retry after `retry_after` seconds."""
+    def __init__(self, retry_after):
+        super().__init__(f"Crypto pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class CryptoPool:
+    """
+    Process pool for the modular exponentiations (ballot creation and proof
+    verification), so request threads and the event loop only wait on
+    futures instead of holding the GIL.
+
+    Admission is bounded: at most max_pending jobs are running or queued.
+    submit() never blocks; when every slot is taken it raises PoolSaturated
+    with a Retry-After estimate from the recent job durations, which the
+    views turn into HTTP 503. Work that has already been admitted (such as
+    the board verifying a committed batch) goes through map_chunks(),
+    which is not bounded.
+
+    If a worker dies (e.g. OOM-killed) the executor is broken for good;
+    the next submission starts a fresh set of worker processes.
+    """
+    def __init__(self, workers=CRYPTO_WORKERS, max_pending=None):
+        self.workers = workers
+        self.max_pending = max_pending or workers * CRYPTO_QUEUE_DEPTH
+        self._executor = self._new_executor()
+        self._restart_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.avg_seconds = 0.0
+
+    def _new_executor(self):
+        # spawn, not fork: the parent already runs the pool refill and group commit threads
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, fn, *args):
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            with self._restart_lock:
+                if self._executor is executor:
+                    print("[POOL] Crypto worker died; restarting the pool")
+                    self._executor = self._new_executor()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    with self._stats_lock:
+                        self.restarts += 1
+            return self._executor.submit(fn, *args)
+
+    def submit(self, fn, *args):
+        """Schedules fn(*args) in a worker; returns a concurrent Future."""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise PoolSaturated(self.retry_after())
+        started = time.monotonic()
+        try:
+            future = self._submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._stats_lock:
+            self.pending += 1
+        future.add_done_callback(lambda _: self._job_done(started))
+        return future
+
+    async def run(self, fn, *args):
+        """submit() for coroutines: awaits the result without blocking the loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _job_done(self, started):
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            self.pending -= 1
+            self.completed += 1
+            # Moving average of queue wait + run time per job
+            self.avg_seconds = elapsed if self.completed == 1 else 0.9 * self.avg_seconds + 0.1 * elapsed
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: the backlog drained over all workers."""
+        with self._stats_lock:
+            backlog = self.pending * self.avg_seconds / self.workers
+        return max(1, math.ceil(backlog))
+
+    def map_chunks(self, fn, first_arg, items, timeout=None):
+        """
+        fn(first_arg, chunk) over one chunk of `items` per worker, concatenated
+        in order. Not subject to admission control. Raises whatever a chunk
+        raised (BrokenProcessPool, ...) or TimeoutError after `timeout` seconds.
+        """
+        if not items:
+            return []
+        size = math.ceil(len(items) / self.workers)
+        futures = [self._submit(fn, first_arg, items[i:i + size]) for i in range(0, len(items), size)]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for future in futures:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            results.extend(future.result(remaining))
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "avg_seconds": self.avg_seconds,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+def verify_ballots(public_key, ballots):
+    """Worker side of the board's batch verification (pure Python, see src/native.py)."""
+    return ZKPVerifier(public_key).verify_batch(ballots)
+
+async def build_ballot(pool, vote_val, kiosk_id, nonce=None):
+    """voting.create_ballot in a worker; `nonce` is one already taken from a RandomnessPool."""
+    return await pool.run(create_ballot, vote_val, kiosk_id, None, nonce)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_crypto_pool():
+    """Process-wide crypto pool; worker processes start on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CryptoPool()
+    return _pool
@@ -1,6 +1,12 @@
 import hashlib
+import math
 import random
-from src.keygen import load_public_key
+from src.keygen import key_context_for
+
+# Fiat-Shamir challenges are sha256 values: branch challenges live in
+# [0, 2^CHALLENGE_BITS) and add up to the hash mod CHALLENGE_MODULUS
+CHALLENGE_BITS = 256
+CHALLENGE_MODULUS = 1 << CHALLENGE_BITS
 
 class ZKPUtils:
     @staticmethod
@@ -9,18 +15,77 @@ class ZKPUtils:
         s = "".join(str(n) for n in nums)
         return int(hashlib.sha256(s.encode()).hexdigest(), 16)
 
+    @staticmethod
+    def multi_pow(pairs, mod, window=4):
+        """
+        prod(base^exp) mod `mod` for non-negative exponents (Straus' method).
+        All bases share one run of squarings, so k exponentiations cost
+        about one squaring chain plus k * bits / window multiplications.
+        """
+        pairs = [(b % mod, e) for b, e in pairs if e]
+        if not pairs:
+            return 1 % mod
+        mask = (1 << window) - 1
+        tables = []
+        for b, _ in pairs:
+            table = [1, b]
+            for _ in range(2, 1 << window):
+                table.append(table[-1] * b % mod)
+            tables.append(table)
+
+        max_bits = max(e.bit_length() for _, e in pairs)
+        acc = 1
+        for shift in range(((max_bits - 1) // window) * window, -1, -window):
+            if acc != 1:
+                for _ in range(window):
+                    acc = acc * acc % mod
+            for table, (_, e) in zip(tables, pairs):
+                digit = (e >> shift) & mask
+                if digit:
+                    acc = acc * table[digit] % mod
+        return acc
+
+    @staticmethod
+    def challenge_matches(total, e):
+        """
+        Checks the branch challenges `e` against the Fiat-Shamir hash `total`.
+        Current proofs keep every e_j in [0, 2^CHALLENGE_BITS) and sum to the
+        hash mod 2^CHALLENGE_BITS, so simulated and real challenges look
+        alike. Proofs from before that (simulated e_j in [1, n], the real one
+        the signed remainder) sum to the hash exactly and still verify, so
+        existing ledgers pass the audit. The range check matters: without it
+        a prover could add multiples of 2^CHALLENGE_BITS to a challenge and
+        make it divisible by n, which proves nothing.
+        """
+        if all(0 <= x < CHALLENGE_MODULUS for x in e):
+            return sum(e) % CHALLENGE_MODULUS == total
+        return sum(e) == total
+
+    @staticmethod
+    def equal_up_to_sign(x, y, mod):
+        """
+        x == +-y mod `mod`. Branch equations are checked this way: n is odd,
+        so -1 = (-1)^n is itself an n-th power and z^n = -(a * u^e) says the
+        same as (-z)^n = a * u^e. Either sign proves the same statement.
+        """
+        return x == y or x == (-y) % mod
+
 class ZKPProver:
     def __init__(self, public_key):
         self.pub = public_key
-        self.n = public_key.n
-        self.ns = self.n * self.n
-        self.g = self.n + 1 # phe default
+        # n, n^2, g and the hash prefix come precomputed from the shared key context
+        self.ctx = key_context_for(public_key)
+        self.n = self.ctx.n
+        self.ns = self.ctx.ns
+        self.g = self.ctx.g # phe default: n + 1
 
-    def prove_vote(self, ciphertext_int, vote_val, r):
+    def prove_vote(self, ciphertext_int, vote_val, r, nonce=None):
         """
         Generates a proof that ciphertext_int is an encryption of 0 OR 1.
         vote_val: 0 or 1 (the actual vote)
         r: the randomness used in encryption (must be known by prover)
+        nonce: optional precompute.Nonce for this r; the expensive
+               exponentiations are then already done
         """
         if vote_val not in [0, 1]:
             raise ValueError("Can only prove votes 0 or 1")
@@ -35,9 +100,6 @@ class ZKPProver:
         # Case 0: u = r^n mod n^2 (since g^0 = 1)
         # Case 1: u = g * r^n mod n^2
         
-        # Random inputs for the proof
-        w = random.SystemRandom().randint(1, n // 2)
-        
         # We need to simulate the 'other' branch
         # If vote is 0: Prove statement 0 (real), Simulate statement 1 (fake)
         # If vote is 1: Simulate statement 0 (fake), Prove statement 1 (real)
@@ -50,46 +112,54 @@ class ZKPProver:
         e = [0, 0]
         a = [0, 0]
 
-        # 1. PREPARE FAKE BRANCH (Simulation)
-        # Pick random challenge e_fake and random response z_fake
-        # Compute commitment a_fake backwards
-        e[fake_branch] = random.SystemRandom().randint(1, n)
-        z[fake_branch] = random.SystemRandom().randint(1, n)
-        
-        # Reconstruct a_fake
-        # If fake=0: a0 = z0^n / u^e0
-        # If fake=1: a1 = z1^n / (u/g)^e1
-        
-        inv_u = pow(u, -1, ns)
-        if fake_branch == 0:
-            # Statement: u = r^n
-            # a = z^n * u^-e
-            term_u = pow(inv_u, e[fake_branch], ns)
-            a[fake_branch] = (pow(z[fake_branch], n, ns) * term_u) % ns
+        if nonce is not None:
+            if nonce.n != n or nonce.r != r:
+                raise ValueError("Nonce does not match this key / randomness")
+            w = nonce.w
+            e[fake_branch] = nonce.e_fake
+            z[fake_branch] = nonce.z_fake
+            # u / g^fake = g^(vote - fake) * r^n, so
+            # a_fake = z^n * r_n^-e * g^(e * (fake - vote))
+            a[fake_branch] = (nonce.fake_term * self.ctx.g_pow(nonce.e_fake * (fake_branch - vote_val))) % ns
+            a[real_branch] = nonce.a_real
         else:
-            # Statement: u = g * r^n => u/g = r^n
-            # a = z^n * (u/g)^-e = z^n * (u^-1 * g)^e
-            val = (inv_u * g) % ns
-            term_val = pow(val, e[fake_branch], ns)
-            a[fake_branch] = (pow(z[fake_branch], n, ns) * term_val) % ns
+            # Random inputs for the proof
+            w = random.SystemRandom().randint(1, n // 2)
+
+            # 1. PREPARE FAKE BRANCH (Simulation)
+            # Pick random challenge e_fake and random response z_fake
+            # Compute commitment a_fake backwards
+            e[fake_branch] = random.SystemRandom().randrange(CHALLENGE_MODULUS)
+            z[fake_branch] = random.SystemRandom().randint(1, n)
+            
+            # Reconstruct a_fake
+            # If fake=0: a0 = z0^n / u^e0
+            # If fake=1: a1 = z1^n / (u/g)^e1
+            
+            inv_u = pow(u, -1, ns)
+            if fake_branch == 0:
+                # Statement: u = r^n
+                # a = z^n * u^-e
+                term_u = pow(inv_u, e[fake_branch], ns)
+                a[fake_branch] = (pow(z[fake_branch], n, ns) * term_u) % ns
+            else:
+                # Statement: u = g * r^n => u/g = r^n
+                # a = z^n * (u/g)^-e = z^n * (u^-1 * g)^e
+                val = (inv_u * g) % ns
+                term_val = pow(val, e[fake_branch], ns)
+                a[fake_branch] = (pow(z[fake_branch], n, ns) * term_val) % ns
 
-        # 2. PREPARE REAL BRANCH (Commitment)
-        # a_real = w^n mod n^2
-        a[real_branch] = pow(w, n, ns)
+            # 2. PREPARE REAL BRANCH (Commitment)
+            # a_real = w^n mod n^2
+            a[real_branch] = pow(w, n, ns)
 
         # 3. GENERATE CHALLENGE (Fiat-Shamir)
         # Hash everything public to get total challenge E
         # E = H(n, g, u, a0, a1)
-        total_e_int = ZKPUtils.hash_nums([n, g, u, a[0], a[1]])
-        # e_real = E - e_fake
-        # Note: We work mod q? No, typically challenge range is large but order of group involved. 
-        # For Paillier ZKPs, challenges can be up to 256 bits.
-        
-        # We set our challenge space roughly size of n (or smaller 256 bits).
-        # Let's simple check: e_real = total - e_fake.
-        # But we need e_real + e_fake = total_e (mod order?).
-        # Standard CDS: e_real = total_e - e_fake
-        e[real_branch] = (total_e_int - e[fake_branch])
+        total_e_int = self.ctx.challenge(u, a[0], a[1])
+        # e_real = E - e_fake mod 2^256: both challenges are then uniform in
+        # [0, 2^256), so neither one (e.g. its sign) tells which branch is real
+        e[real_branch] = (total_e_int - e[fake_branch]) % CHALLENGE_MODULUS
 
         # 4. COMPUTE RESPONSE (Real)
         # z = w * r^e (mod n) ?? No, this is Paillier group.
@@ -107,33 +177,99 @@ class ZKPProver:
             "z": [str(z[0]), str(z[1])]
         }
 
+    def prove_one_of(self, ciphertext_int, values, index, r):
+        """
+        CDS OR-proof over K statements: ciphertext_int encrypts values[index]
+        with randomness r, and is shown to encrypt one of `values` without
+        revealing which. With values = [0, 1] this is the same proof (and
+        the same transcript hash) as prove_vote.
+        """
+        if not 0 <= index < len(values):
+            raise ValueError("Index outside the allowed values")
+
+        n = self.n
+        ns = self.ns
+        u = ciphertext_int
+        rng = random.SystemRandom()
+        k = len(values)
+
+        z = [0] * k
+        e = [0] * k
+        a = [0] * k
+
+        # Simulated branches: pick e_j, z_j and solve for a_j
+        # a_j = z_j^n * (u / g^m_j)^-e_j = z_j^n * u^-e_j * g^(m_j * e_j)
+        inv_u = pow(u, -1, ns)
+        for j, m in enumerate(values):
+            if j == index:
+                continue
+            e[j] = rng.randrange(CHALLENGE_MODULUS)
+            z[j] = rng.randint(1, n)
+            a[j] = (pow(z[j], n, ns) * pow(inv_u, e[j], ns) * self.ctx.g_pow(m * e[j])) % ns
+
+        # Real branch: commitment w^n, challenge whatever is left of E
+        w = rng.randint(1, n // 2)
+        a[index] = pow(w, n, ns)
+        total_e_int = self.ctx.challenge(u, *a)
+        e[index] = (total_e_int - sum(e)) % CHALLENGE_MODULUS
+        z[index] = (w * pow(r, e[index], n)) % n
+
+        return {
+            "a": [str(x) for x in a],
+            "e": [str(x) for x in e],
+            "z": [str(x) for x in z]
+        }
+
 class ZKPVerifier:
+    # Size of the random weights in verify_batch: a batch containing an invalid
+    # proof passes with probability about 2^-BATCH_BITS
+    BATCH_BITS = 64
+    # Below this many candidates a failed batch is checked ballot by ballot
+    BATCH_LEAF = 4
+
     def __init__(self, public_key):
         self.pub = public_key
-        self.n = public_key.n
-        self.ns = self.n * self.n
-        self.g = self.n + 1
+        self.ctx = key_context_for(public_key)
+        self.n = self.ctx.n
+        self.ns = self.ctx.ns
+        self.g = self.ctx.g
+        self.inv_g = self.ctx.g_inv
+
+    def well_formed(self, u, a, z):
+        """
+        u and every commitment a_j must be units of Z_{n^2}, every response
+        z_j a unit of Z_n. Without this a = z = 0 satisfies every branch
+        equation (0 = 0 * ...) for any u, e.g. an encryption of 500.
+        """
+        n, ns = self.n, self.ns
+        return (0 < u < ns and math.gcd(u, n) == 1
+                and all(0 < x < ns and math.gcd(x, n) == 1 for x in a)
+                and all(0 < x < n and math.gcd(x, n) == 1 for x in z))
 
     def verify(self, ciphertext_int, proof):
         """
         Verifies the proof for ciphertext_int.
         proof: dictionary with lists a, e, z (strings)
+        Branch equations hold up to sign (ZKPUtils.equal_up_to_sign), the
+        relation verify_batch() can check exactly.
         """
         try:
             u = int(ciphertext_int)
             n = self.n
             ns = self.ns
-            g = self.g
             
             a = [int(x) for x in proof["a"]]
             e = [int(x) for x in proof["e"]]
             z = [int(x) for x in proof["z"]]
 
+            if not self.well_formed(u, a[:2], z[:2]):
+                print("ZKP Verification Failed: Values Out of Range")
+                return False
+
             # 1. Recompute Total Challenge E
-            expected_total_e = ZKPUtils.hash_nums([n, g, u, a[0], a[1]])
-            actual_total_e = e[0] + e[1]
+            expected_total_e = self.ctx.challenge(u, a[0], a[1])
             
-            if expected_total_e != actual_total_e:
+            if not ZKPUtils.challenge_matches(expected_total_e, e[:2]):
                 print("ZKP Verification Failed: Challenge Mismatch")
                 return False
 
@@ -141,7 +277,7 @@ class ZKPVerifier:
             # Check: z0^n = a0 * u^e0
             lhs0 = pow(z[0], n, ns)
             rhs0 = (a[0] * pow(u, e[0], ns)) % ns
-            if lhs0 != rhs0:
+            if not ZKPUtils.equal_up_to_sign(lhs0, rhs0, ns):
                 print("ZKP Verification Failed: Branch 0 Invalid")
                 # print(f"LHS: {lhs0}\nRHS: {rhs0}")
                 return False
@@ -149,12 +285,11 @@ class ZKPVerifier:
             # 3. Verify Branch 1: u is enc(1) => u = g * r^n => u/g = r^n
             # Check: z1^n = a1 * (u/g)^e1
             # => z1^n = a1 * (u * g^-1)^e1
-            inv_g = pow(g, -1, ns)
-            val = (u * inv_g) % ns
+            val = (u * self.inv_g) % ns
             
             lhs1 = pow(z[1], n, ns)
             rhs1 = (a[1] * pow(val, e[1], ns)) % ns
-            if lhs1 != rhs1:
+            if not ZKPUtils.equal_up_to_sign(lhs1, rhs1, ns):
                 print("ZKP Verification Failed: Branch 1 Invalid")
                 return False
 
@@ -163,3 +298,144 @@ class ZKPVerifier:
         except Exception as ex:
             print(f"ZKP Verification Error: {ex}")
             return False
+
+    def verify_one_of(self, ciphertext_int, proof, values):
+        """
+        Verifies a one-of-K proof from ZKPProver.prove_one_of: u encrypts one
+        of `values`. Branch j checks z_j^n = +-a_j * (u / g^m_j)^e_j, and the
+        e_j must add up to H(n, g, u, a_0, ..., a_{K-1}) (challenge_matches).
+        """
+        try:
+            u = int(ciphertext_int)
+            n = self.n
+            ns = self.ns
+            k = len(values)
+
+            a = [int(x) for x in proof["a"]]
+            e = [int(x) for x in proof["e"]]
+            z = [int(x) for x in proof["z"]]
+            if not (len(a) == len(e) == len(z) == k):
+                print("ZKP Verification Failed: Wrong Number of Branches")
+                return False
+            if not self.well_formed(u, a, z):
+                print("ZKP Verification Failed: Values Out of Range")
+                return False
+
+            if not ZKPUtils.challenge_matches(self.ctx.challenge(u, *a), e):
+                print("ZKP Verification Failed: Challenge Mismatch")
+                return False
+
+            for j, m in enumerate(values):
+                # (u / g^m)^e = u^e * g^(-m*e), the g factor in closed form
+                rhs = (a[j] * pow(u, e[j], ns) * self.ctx.g_pow(-m * e[j])) % ns
+                if not ZKPUtils.equal_up_to_sign(pow(z[j], n, ns), rhs, ns):
+                    print(f"ZKP Verification Failed: Branch {j} Invalid")
+                    return False
+
+            return True
+
+        except Exception as ex:
+            print(f"ZKP Verification Error: {ex}")
+            return False
+
+    def verify_batch(self, ballots, values=None):
+        """
+        Verifies many (ciphertext_int, proof) pairs at once; returns a list of
+        booleans in the same order, equal to [verify(c, p) for c, p in ballots]
+        (or verify_one_of(c, p, values) when `values` is given).
+
+        The Fiat-Shamir challenges and value ranges (well_formed) are checked
+        one by one (hashes and gcds are cheap).
+        The K * k branch equations z^n = a * (u / g^m)^e are then combined with
+        random BATCH_BITS-bit weights d into one check:
+
+            (prod z^d)^n == prod a^d * prod u^(sum_j d_j*e_j) * g^(-sum d_j*m_j*e_j)
+
+        evaluated with two multi-exponentiations, one pow(., n) and the g = n+1
+        closed form. Negative exponents are moved to the other side instead of
+        inverting. Per ballot this is one full exponentiation whatever K is.
+        If the combined check fails the batch is split in halves until the bad
+        proofs are isolated and checked individually.
+
+        A small-exponent batch test cannot see factors of small order: with
+        one equation off by -1 the combination is off by (-1)^d, which
+        vanishes for even d. So the combined check accepts +-1, and verify()
+        accepts each equation up to sign too (equal_up_to_sign); the two then
+        agree. Other small-order elements of Z_{n^2}* cannot be found without
+        factoring n.
+        """
+        branch_values = (0, 1) if values is None else tuple(values)
+        k = len(branch_values)
+        results = [False] * len(ballots)
+        candidates = []
+        for i, (ciphertext_int, proof) in enumerate(ballots):
+            try:
+                u = int(ciphertext_int)
+                a = [int(x) for x in proof["a"]]
+                e = [int(x) for x in proof["e"]]
+                z = [int(x) for x in proof["z"]]
+                if values is not None and not (len(a) == len(e) == len(z) == k):
+                    print("ZKP Verification Failed: Wrong Number of Branches")
+                    continue
+                if not self.well_formed(u, a[:k], z[:k]):
+                    print("ZKP Verification Failed: Values Out of Range")
+                    continue
+                if values is None:
+                    # verify() reads exactly two branches
+                    challenge_ok = ZKPUtils.challenge_matches(self.ctx.challenge(u, a[0], a[1]), e[:2])
+                else:
+                    challenge_ok = ZKPUtils.challenge_matches(self.ctx.challenge(u, *a), e)
+                if not challenge_ok:
+                    print("ZKP Verification Failed: Challenge Mismatch")
+                    continue
+                # Indexing raises for short proofs, as in verify()
+                candidates.append((i, u, a[:k], e[:k], [z[j] for j in range(k)]))
+            except Exception as ex:
+                print(f"ZKP Verification Error: {ex}")
+
+        self._verify_candidates(candidates, ballots, results, values)
+        return results
+
+    def _verify_candidates(self, candidates, ballots, results, values):
+        if not candidates:
+            return
+        if len(candidates) <= self.BATCH_LEAF:
+            for i, _, _, _, _ in candidates:
+                if values is None:
+                    results[i] = self.verify(*ballots[i])
+                else:
+                    results[i] = self.verify_one_of(*ballots[i], values)
+            return
+        if self._combined_check(candidates, (0, 1) if values is None else values):
+            for i, _, _, _, _ in candidates:
+                results[i] = True
+            return
+        mid = len(candidates) // 2
+        self._verify_candidates(candidates[:mid], ballots, results, values)
+        self._verify_candidates(candidates[mid:], ballots, results, values)
+
+    def _combined_check(self, candidates, values):
+        n, ns = self.n, self.ns
+        rng = random.SystemRandom()
+        z_terms = []
+        lhs_terms = []
+        rhs_terms = []
+        g_exp = 0
+        for _, u, a, e, z in candidates:
+            u_exp = 0
+            for j, m in enumerate(values):
+                d = rng.randint(1, (1 << self.BATCH_BITS) - 1)
+                z_terms.append((z[j], d))
+                rhs_terms.append((a[j], d))
+                # (u / g^m)^e = u^e * g^(-m*e)
+                u_exp += d * e[j]
+                g_exp -= d * m * e[j]
+            if u_exp >= 0:
+                rhs_terms.append((u, u_exp))
+            else:
+                lhs_terms.append((u, -u_exp))
+
+        lhs = pow(ZKPUtils.multi_pow(z_terms, ns), n, ns)
+        lhs = lhs * ZKPUtils.multi_pow(lhs_terms, ns) % ns
+        rhs = ZKPUtils.multi_pow(rhs_terms, ns) * self.ctx.g_pow(g_exp) % ns
+        return ZKPUtils.equal_up_to_sign(lhs, rhs, ns)
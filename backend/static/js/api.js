@@ -43,4 +43,32 @@ class VotingAPI {
             return { error: e.message };
         }
     }
+
+    static async publicKey() {
+        // Election key, fetched once per page
+        if (!VotingAPI._publicKey) {
+            const res = await fetch(`${API_BASE}/public_key`);
+            if (!res.ok) throw new Error('Could not load election key');
+            VotingAPI._publicKey = await res.json();
+        }
+        return VotingAPI._publicKey;
+    }
+
+    // Encrypts and proves the vote in the browser (crypto.js); only the
+    // ciphertext and proof are sent
+    static async castEncrypted(voteVal) {
+        try {
+            const ballot = await VoteCrypto.encryptAndProve(await VotingAPI.publicKey(), voteVal);
+            const res = await fetch(`${API_BASE}/cast_encrypted`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(ballot)
+            });
+            if (!res.ok) throw new Error((await res.json()).error || 'Vote Failed');
+            return await res.json();
+        } catch (e) {
+            console.error(e);
+            return { error: e.message };
+        }
+    }
 }
@@ -0,0 +1,106 @@
+// Client-side ballot encryption for /api/cast_encrypted.
+// Paillier with g = n + 1 and the CDS OR-proof that the ciphertext encrypts
+// 0 or 1: the same construction, value ranges and Fiat-Shamir hash
+// (sha256 of the decimal strings n, g, u, a0, a1) as ZKPProver.prove_vote
+// in src/zkp.py, so the server verifies it like a server-made ballot.
+// Both branch challenges are uniform in [0, 2^256) and add up to the hash
+// mod 2^256, so the proof does not show which branch was simulated.
+
+const CHALLENGE_MODULUS = 1n << 256n;
+
+class VoteCrypto {
+    static modPow(base, exp, mod) {
+        if (exp < 0n) {
+            return VoteCrypto.modPow(VoteCrypto.modInv(base, mod), -exp, mod);
+        }
+        let result = 1n;
+        base = ((base % mod) + mod) % mod;
+        while (exp > 0n) {
+            if (exp & 1n) result = (result * base) % mod;
+            base = (base * base) % mod;
+            exp >>= 1n;
+        }
+        return result;
+    }
+
+    static modInv(a, mod) {
+        // Extended Euclid
+        let [oldR, r] = [((a % mod) + mod) % mod, mod];
+        let [oldS, s] = [1n, 0n];
+        while (r !== 0n) {
+            const q = oldR / r;
+            [oldR, r] = [r, oldR - q * r];
+            [oldS, s] = [s, oldS - q * s];
+        }
+        if (oldR !== 1n) throw new Error('Value not invertible');
+        return ((oldS % mod) + mod) % mod;
+    }
+
+    static gcd(a, b) {
+        while (b !== 0n) [a, b] = [b, a % b];
+        return a;
+    }
+
+    // Uniform in [lo, hi] from crypto.getRandomValues (rejection sampling)
+    static randomRange(lo, hi) {
+        const span = hi - lo + 1n;
+        const bits = span.toString(2).length;
+        const bytes = new Uint8Array(Math.ceil(bits / 8));
+        const mask = (1n << BigInt(bits)) - 1n;
+        while (true) {
+            crypto.getRandomValues(bytes);
+            let x = 0n;
+            for (const b of bytes) x = (x << 8n) | BigInt(b);
+            x &= mask;
+            if (x < span) return lo + x;
+        }
+    }
+
+    static async hashNums(nums) {
+        const data = new TextEncoder().encode(nums.map(String).join(''));
+        const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', data));
+        return BigInt('0x' + Array.from(digest, b => b.toString(16).padStart(2, '0')).join(''));
+    }
+
+    // publicKey: {n, g} as decimal strings (GET /api/public_key)
+    static async encryptAndProve(publicKey, vote) {
+        if (vote !== 0 && vote !== 1) throw new Error('Vote must be 0 or 1');
+        const n = BigInt(publicKey.n);
+        const g = n + 1n;
+        const ns = n * n;
+
+        // c = (1 + m*n) * r^n mod n^2, r in Z_n*
+        let r = VoteCrypto.randomRange(1n, n);
+        while (VoteCrypto.gcd(r, n) !== 1n) r = VoteCrypto.randomRange(1n, n);
+        const u = ((1n + BigInt(vote) * n) * VoteCrypto.modPow(r, n, ns)) % ns;
+
+        const real = vote;
+        const fake = 1 - vote;
+        const a = [0n, 0n], e = [0n, 0n], z = [0n, 0n];
+
+        // Simulated branch: a = z^n * (u / g^fake)^-e
+        e[fake] = VoteCrypto.randomRange(0n, CHALLENGE_MODULUS - 1n);
+        z[fake] = VoteCrypto.randomRange(1n, n);
+        const invU = VoteCrypto.modInv(u, ns);
+        const base = fake === 0 ? invU : (invU * g) % ns;
+        a[fake] = (VoteCrypto.modPow(z[fake], n, ns) * VoteCrypto.modPow(base, e[fake], ns)) % ns;
+
+        // Real branch: commitment w^n, challenge whatever is left of E
+        const w = VoteCrypto.randomRange(1n, n / 2n);
+        a[real] = VoteCrypto.modPow(w, n, ns);
+        const total = await VoteCrypto.hashNums([n, g, u, a[0], a[1]]);
+        e[real] = (total - e[fake] + CHALLENGE_MODULUS) % CHALLENGE_MODULUS;
+        z[real] = (w * VoteCrypto.modPow(r, e[real], n)) % n;
+
+        return {
+            ciphertext: u.toString(),
+            proof: {
+                a: a.map(String),
+                e: e.map(String),
+                z: z.map(String)
+            }
+        };
+    }
+}
+
+if (typeof module !== 'undefined') module.exports = { VoteCrypto };
@@ -7,6 +7,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
 
 import shutil
 from app import app
+from src.otp import get_otp_store
 from src.bulletin_board import BulletinBoard
 
 class SecureVotingWebTest(unittest.TestCase):
@@ -50,9 +51,10 @@ class SecureVotingWebTest(unittest.TestCase):
          print(f"[x] ID Verified. OTP Sent.")
          
          # 3. Complete Login (Step 2: OTP Check)
-         # Extract Mock OTP from session (since we can't see server logs in test)
+         # Read the OTP from the delivery outbox (the SMS stand-in); the session only holds a challenge
+         otp = get_otp_store().delivery.latest(voter_id)
          with self.client.session_transaction() as sess:
-             otp = sess['otp']
+             self.assertNotIn('otp', sess)
              
          resp = self.client.post('/verify_otp', json={'otp': otp})
          data = json.loads(resp.data)
@@ -0,0 +1,371 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+import threading
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.voting import create_ballot, create_packed_ballot, PackedEncoding, ballot_from_client
+from src.bulletin_board import BulletinBoard
+from src.audit import verify_chain, audit_ledger, audit_running_tally
+from src.tally import compute_tally, compute_subtotals, aggregate_hierarchy, EncryptedSubtotals, TallyResultService
+import src.tally as tally
+from phe import paillier
+
+class BulletinBoardTest(unittest.TestCase):
+
+    def setUp(self):
+        # Isolated ledger per test (never touch the committed DB)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.orig_db_path = db.DB_PATH
+        db.DB_PATH = os.path.join(self.tmp_dir.name, 'secure_voting.db')
+
+    def tearDown(self):
+        db.close_db_connections()
+        db.DB_PATH = self.orig_db_path
+        self.tmp_dir.cleanup()
+
+    def _publish_votes(self, bb, votes):
+        ballots = []
+        for i, v in enumerate(votes):
+            ballot = create_ballot(v, kiosk_id=f"kiosk-{i}")
+            bb.publish(ballot)
+            ballots.append(ballot)
+        return ballots
+
+    def test_reopen_uses_persisted_merkle_state(self):
+        bb = BulletinBoard()
+        ballots = self._publish_votes(bb, [1, 0, 1, 1, 0])
+        root = bb.merkle_tree.get_root()
+
+        reopened = BulletinBoard()
+        self.assertEqual(reopened.merkle_tree.size, 5)
+        self.assertEqual(reopened.merkle_tree.get_root(), root)
+
+        # Proofs for old leaves come from the stored nodes
+        for i, ballot in enumerate(ballots):
+            proof = reopened.get_merkle_proof(i)
+            leaf = json.dumps(ballot, sort_keys=True)
+            self.assertTrue(reopened.merkle_tree.verify_proof(leaf, proof, root))
+
+    def test_legacy_ledger_is_rebuilt_once(self):
+        bb = BulletinBoard()
+        self._publish_votes(bb, [1, 0, 1])
+        root = bb.merkle_tree.get_root()
+
+        # Simulate a ledger written before merkle_nodes existed
+        conn = db.get_db_connection()
+        conn.execute('DELETE FROM merkle_nodes')
+        conn.commit()
+        conn.close()
+
+        rebuilt = BulletinBoard()
+        self.assertEqual(rebuilt.merkle_tree.get_root(), root)
+        self.assertEqual(db.load_merkle_frontier()[0], 3)
+
+    def test_streaming_ledger_matches_full_list(self):
+        bb = BulletinBoard()
+        self._publish_votes(bb, [1, 0, 1, 0, 1])
+
+        full = db.get_all_ballots_from_db()
+        self.assertEqual(list(db.iter_ledger(chunk_size=2)), full)
+
+        projected = list(db.iter_ledger(chunk_size=2, with_proofs=False))
+        self.assertEqual(len(projected), 5)
+        self.assertNotIn('proof', projected[0]['ballot'])
+        self.assertEqual([e['ballot']['ciphertext'] for e in projected],
+                         list(db.iter_ciphertexts(chunk_size=3)))
+        self.assertEqual(len(list(db.iter_ciphertexts(start_id=2, stop_id=4))), 2)
+
+    def test_vote_and_voter_flag_commit_atomically(self):
+        bb = BulletinBoard()
+        bb.publish(create_ballot(1), voter_id="1000-0000-0001")
+        root = bb.merkle_tree.get_root()
+        head = bb.chain_head
+
+        with self.assertRaises(db.AlreadyVotedError):
+            bb.publish(create_ballot(0), voter_id="1000-0000-0001")
+        # Rejected ballot leaves no trace in the tree, chain or ledger
+        self.assertEqual(bb.merkle_tree.get_root(), root)
+        self.assertEqual(bb.chain_head, head)
+        self.assertEqual(len(db.get_all_ballots_from_db()), 1)
+
+        bb.publish(create_ballot(0), voter_id="2000-0000-0002")
+        self.assertEqual(BulletinBoard().merkle_tree.get_root(), bb.merkle_tree.get_root())
+        self.assertTrue(db.get_voter("2000-0000-0002")['has_voted'])
+
+    def test_client_encrypted_ballots_are_verified_by_the_board(self):
+        bb = BulletinBoard()
+        made = create_ballot(1)
+        ballot = ballot_from_client(made['ciphertext'], made['proof'], kiosk_id="kiosk-7")
+        self.assertEqual(ballot['kiosk_id'], "kiosk-7")
+        bb.publish(ballot, voter_id="1000-0000-0001")
+
+        # Replaying someone else's public ballot under a new ballot_id
+        replay = ballot_from_client(made['ciphertext'], made['proof'])
+        self.assertNotEqual(replay['ballot_id'], ballot['ballot_id'])
+        with self.assertRaises(db.DuplicateBallotError):
+            bb.publish(replay, voter_id="3000-0000-0003")
+        self.assertFalse(db.get_voter("3000-0000-0003")['has_voted'])
+
+        # Well-formed but unproven: reaches the board and is rejected there
+        other = create_ballot(0)
+        forged = ballot_from_client(other['ciphertext'], made['proof'])
+        with self.assertRaises(ValueError):
+            bb.publish(forged, voter_id="2000-0000-0002")
+        self.assertFalse(db.get_voter("2000-0000-0002")['has_voted'])
+
+        nsquare = bb.public_key.nsquare
+        for ciphertext, proof in [("abc", made['proof']), (0, made['proof']), (nsquare, made['proof']),
+                                  (made['ciphertext'], {"a": ["1"], "e": ["1"], "z": ["1"]}),
+                                  (made['ciphertext'], None)]:
+            with self.assertRaises(ValueError):
+                ballot_from_client(ciphertext, proof)
+        self.assertEqual(len(db.get_all_ballots_from_db()), 1)
+
+    def test_cast_encrypted_refuses_out_of_range_proofs(self):
+        # a = z = 0 satisfies every branch equation: without the range
+        # checks this one ballot would add 500 to the tally
+        import app as appmod
+        from unittest import mock
+        from src.otp import get_otp_store
+        from src.keygen import key_context_for
+        db.init_db()
+        bb = BulletinBoard(group_commit=True)
+        appmod.app.config['TESTING'] = True
+        client = appmod.app.test_client()
+        client.post('/login', json={'aadhaar': "2000-0000-0002"})
+        code = get_otp_store().delivery.latest("2000-0000-0002")
+        self.assertEqual(client.post('/verify_otp', json={'otp': code}).get_json()['status'], "success")
+
+        u = bb.public_key.encrypt(500).ciphertext(be_secure=False)
+        challenge = key_context_for(bb.public_key).challenge(u, 0, 0)
+        forged = {"ciphertext": str(u), "proof": {"a": ["0", "0"], "e": [str(challenge), "0"], "z": ["0", "0"]}}
+        with mock.patch.object(appmod, "board", lambda: bb):
+            r = client.post('/api/cast_encrypted', json=forged)
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(db.get_voter("2000-0000-0002")['has_voted'])
+        self.assertEqual(bb.ballot_count(), 0)
+
+    def test_concurrent_double_submit_records_one_ballot(self):
+        bb = BulletinBoard()
+        ballots = [create_ballot(1) for _ in range(4)]
+        results = []
+
+        def submit(ballot):
+            try:
+                results.append(bb.publish(ballot, voter_id="3000-0000-0003"))
+            except db.AlreadyVotedError:
+                results.append("rejected")
+
+        threads = [threading.Thread(target=submit, args=(b,)) for b in ballots]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results.count("rejected"), 3)
+        self.assertEqual(len(db.get_all_ballots_from_db()), 1)
+
+    def test_group_commit_batches_and_isolates_failures(self):
+        bb = BulletinBoard(group_commit=True, batch_window=0.05)
+        good = [create_ballot(v) for v in (1, 0, 1)]
+        tampered = create_ballot(1)
+        tampered['proof']['z'][0] = str(int(tampered['proof']['z'][0]) + 1)
+
+        futures = [bb.submit(good[0], voter_id="1000-0000-0001"),
+                   bb.submit(tampered, voter_id="2000-0000-0002"),
+                   bb.submit(good[1], voter_id="3000-0000-0003"),
+                   bb.submit(good[2], voter_id="1000-0000-0001"),
+                   bb.submit(dict(good[1], ballot_id="copy"), voter_id="4000-0000-0004")]
+
+        self.assertEqual(futures[0].result(timeout=10), 0)
+        self.assertIsInstance(futures[1].exception(timeout=10), ValueError)
+        self.assertEqual(futures[2].result(timeout=10), 1)
+        self.assertIsInstance(futures[3].exception(timeout=10), db.AlreadyVotedError)
+        self.assertIsInstance(futures[4].exception(timeout=10), db.DuplicateBallotError)
+
+        self.assertFalse(db.get_voter("2000-0000-0002")['has_voted'])
+        self.assertFalse(db.get_voter("4000-0000-0004")['has_voted'])
+        self.assertEqual(BulletinBoard().merkle_tree.get_root(), bb.merkle_tree.get_root())
+        self.assertTrue(verify_chain(self._chain_rows())['valid'])
+
+    def test_ingest_thread_survives_a_failing_batch(self):
+        bb = BulletinBoard(group_commit=True, batch_window=0.01)
+        verify_proofs = bb.verify_proofs
+
+        def broken(ballots):
+            bb.verify_proofs = verify_proofs
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        bb.verify_proofs = broken
+        failed = bb.submit(create_ballot(1), voter_id="1000-0000-0001")
+        self.assertIsInstance(failed.exception(timeout=10), RuntimeError)
+        self.assertFalse(db.get_voter("1000-0000-0001")['has_voted'])
+
+        # Later ballots are still ingested
+        self.assertEqual(bb.publish(create_ballot(0), voter_id="1000-0000-0001", timeout=10), 0)
+
+    def _chain_rows(self):
+        return [(db.row_to_entry(i, row), row['entry_hash']) for i, row in enumerate(db.iter_ledger_rows())]
+
+    def test_prev_hash_chain_uses_cached_head(self):
+        bb = BulletinBoard()
+        self._publish_votes(bb, [1, 0])
+        reopened = BulletinBoard()
+        self._publish_votes(reopened, [1])
+
+        report = verify_chain(self._chain_rows())
+        self.assertTrue(report['valid'])
+        self.assertEqual(report['blocks'], 3)
+        self.assertEqual(report['head'], reopened.chain_head)
+
+        # Tampering with a stored ballot breaks the chain
+        conn = db.get_db_connection()
+        conn.execute("UPDATE ballots SET kiosk_id = 'evil' WHERE id = 2")
+        conn.commit()
+        conn.close()
+        report = verify_chain(self._chain_rows())
+        self.assertFalse(report['valid'])
+        self.assertEqual(report['errors'][0]['block'], 1)
+
+    def test_parallel_audit_finds_bad_proofs_and_roots(self):
+        bb = BulletinBoard()
+        self._publish_votes(bb, [1, 0, 1, 0, 1])
+
+        report = audit_ledger(bb.public_key, workers=2, chunk_size=2, batch_size=2)
+        self.assertTrue(report['valid'])
+        self.assertEqual(report['proofs_checked'], 5)
+        self.assertEqual(report['merkle_root'], bb.merkle_tree.get_root())
+        self.assertEqual(report['head'], bb.chain_head)
+
+        conn = db.get_db_connection()
+        proof = json.loads(conn.execute('SELECT proof FROM ballots WHERE id = 4').fetchone()[0])
+        proof['z'][0] = str(int(proof['z'][0]) + 1)
+        conn.execute('UPDATE ballots SET proof = ? WHERE id = 4', (json.dumps(proof),))
+        conn.execute("UPDATE ballots SET merkle_root = ? WHERE id = 2", ("0"*64,))
+        conn.commit()
+        conn.close()
+
+        report = audit_ledger(bb.public_key, workers=2, chunk_size=2, batch_size=2)
+        self.assertFalse(report['valid'])
+        self.assertEqual(report['invalid_proofs'], [3])
+        errors = {(e['block'], e['error'].split()[0]) for e in report['chain_errors']}
+        self.assertIn((1, 'merkle_root'), errors)
+
+    def test_parallel_tally_matches_phe_sum(self):
+        bb = BulletinBoard()
+        self.assertIsNone(compute_tally(bb.public_key))
+        ballots = self._publish_votes(bb, [1, 0, 1, 1, 0])
+
+        expected = sum(paillier.EncryptedNumber(bb.public_key, int(b['ciphertext']), 0) for b in ballots)
+        expected = expected.ciphertext(be_secure=False)
+        for workers, range_size in ((1, 50000), (2, 2), (3, 1)):
+            tally = compute_tally(bb.public_key, chunk_size=2, workers=workers, range_size=range_size)
+            self.assertEqual(tally.ciphertext(be_secure=False), expected)
+            self.assertEqual(tally.exponent, 0)
+
+    def test_running_tally_checkpoints_and_rolls_forward(self):
+        bb = BulletinBoard(tally_checkpoint_every=2)
+        self.assertIsNone(bb.encrypted_tally())
+        self._publish_votes(bb, [1, 0, 1])
+        expected = compute_tally(bb.public_key, workers=1).ciphertext(be_secure=False)
+        self.assertEqual(bb.encrypted_tally().ciphertext(be_secure=False), expected)
+        # Checkpoint written at 2 ballots, third one is only in memory
+        self.assertEqual(db.load_tally_checkpoint(bb.public_key.n)[0], 2)
+        self.assertTrue(audit_running_tally(bb.public_key, workers=1)['match'])
+
+        reopened = BulletinBoard(tally_checkpoint_every=2)
+        self.assertEqual(reopened.encrypted_tally().ciphertext(be_secure=False), expected)
+        self.assertEqual(db.load_tally_checkpoint(bb.public_key.n)[0], 3)
+
+        # A stored product that disagrees with the ledger is caught by the auditor
+        conn = db.get_db_connection()
+        conn.execute("UPDATE tally_state SET product = '12345'")
+        conn.commit()
+        conn.close()
+        self.assertFalse(audit_running_tally(bb.public_key, workers=1)['match'])
+
+    def test_kiosk_subtotals_roll_up_to_regions_and_total(self):
+        bb = BulletinBoard()
+        ns = bb.public_key.nsquare
+        ballots = []
+        for i, vote in enumerate([1, 0, 1, 1, 0, 1]):
+            ballot = create_ballot(vote, kiosk_id=f"kiosk-{i % 3}")
+            bb.publish(ballot)
+            ballots.append(ballot)
+
+        def product_of(kiosk_ids):
+            product = 1
+            for b in ballots:
+                if b['kiosk_id'] in kiosk_ids:
+                    product = product * int(b['ciphertext']) % ns
+            return product
+
+        kiosks = compute_subtotals(bb.public_key, workers=2, range_size=2)
+        self.assertEqual(kiosks.entries, {k: [product_of({k}), 2] for k in ("kiosk-0", "kiosk-1", "kiosk-2")})
+
+        region_of = {"kiosk-0": "north", "kiosk-1": "north"}
+        regions, (total, count) = aggregate_hierarchy(kiosks, region_of)
+        self.assertEqual(regions.entries["north"], [product_of({"kiosk-0", "kiosk-1"}), 4])
+        self.assertEqual(regions.entries["unassigned"], [product_of({"kiosk-2"}), 2])
+        self.assertEqual((total, count), (compute_tally(bb.public_key, workers=1).ciphertext(be_secure=False), 6))
+
+        # Regional nodes tally their own kiosks; the centre merges their exported tables
+        north = compute_subtotals(bb.public_key, kiosks={"kiosk-0", "kiosk-1"}, workers=1).roll_up(region_of)
+        rest = compute_subtotals(bb.public_key, kiosks={"kiosk-2"}, workers=1).roll_up(region_of)
+        merged = EncryptedSubtotals(ns)
+        for node in (north, rest):
+            merged.merge(EncryptedSubtotals.from_dict(ns, json.loads(json.dumps(node.to_dict()))))
+        self.assertEqual(merged.entries, regions.entries)
+        self.assertEqual(compute_subtotals(bb.public_key, kiosks={"kiosk-2"}, workers=2, range_size=2).entries,
+                         {"kiosk-2": [product_of({"kiosk-2"}), 2]})
+        self.assertEqual(compute_subtotals(bb.public_key, kiosks=set(), workers=1).entries, {})
+
+    def test_packed_ballots_on_multi_candidate_board(self):
+        encoding = PackedEncoding(3)
+        bb = BulletinBoard(group_commit=True, batch_window=0.05, encoding=encoding)
+        futures = [bb.submit(create_packed_ballot(c, encoding, kiosk_id="kiosk-1")) for c in (0, 2, 2, 1, 2)]
+        # A referendum ballot does not prove one-of-3
+        futures.append(bb.submit(create_ballot(1)))
+        self.assertEqual(sorted(f.result() for f in futures[:5]), [0, 1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            futures[5].result()
+
+        # Running product over the packed ciphertexts equals the rescan
+        self.assertEqual(bb.encrypted_tally().ciphertext(be_secure=False),
+                         compute_tally(bb.public_key, workers=1).ciphertext(be_secure=False))
+
+    def test_result_service_decrypts_once_and_caches_by_chain_head(self):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+
+        bb = BulletinBoard()
+        self._publish_votes(bb, [1, 0, 1])
+        service = TallyResultService()
+        loads = []
+        orig_load_shares = tally.load_shares
+        tally.load_shares = lambda indices: loads.append(indices) or orig_load_shares(indices)
+        try:
+            result = service.get_result(bb)
+            self.assertEqual((result['yes_votes'], result['no_votes'], result['total_votes']), (2, 1, 3))
+            self.assertEqual(result['chain_head'], bb.chain_head)
+            self.assertIs(service.get_result(bb), result)
+
+            payload = {k: result[k] for k in ("chain_head", "total_votes", "yes_votes", "no_votes", "encrypted_tally")}
+            service.hsm.public_key.verify(
+                bytes.fromhex(result['signature']), json.dumps(payload, sort_keys=True).encode(),
+                padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH),
+                hashes.SHA256())
+
+            # A new ballot moves the chain head; the key is not reconstructed again
+            self._publish_votes(bb, [1])
+            self.assertEqual(service.get_result(bb)['yes_votes'], 3)
+            self.assertEqual(len(loads), 1)
+        finally:
+            tally.load_shares = orig_load_shares
+
+if __name__ == '__main__':
+    unittest.main()
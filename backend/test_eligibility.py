@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+import tempfile
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.eligibility import EligibilityIndex, BloomFilter, voter_key, canonical_voter_id, get_eligibility_index, reload_eligibility_index
+from src.bulletin_board import BulletinBoard
+from src.voting import create_ballot
+
+class EligibilityIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.orig_db_path = db.DB_PATH
+        db.DB_PATH = os.path.join(self.tmp_dir.name, 'secure_voting.db')
+
+    def tearDown(self):
+        db.close_db_connections()
+        db.DB_PATH = self.orig_db_path
+        self.tmp_dir.cleanup()
+
+    def test_lookup_matches_roll(self):
+        roll = [(f"{i:04d}-0000-{i:04d}", i % 3 == 0) for i in range(1001, 2001)]
+        roll[500:500] = [("legacy-id", False), ("150000001499", True)]
+        index = EligibilityIndex(roll)
+        self.assertEqual(len(index), 1002)
+        self.assertEqual(len(index.ids), 1000)
+
+        for aadhaar, voted in roll:
+            self.assertEqual(index.lookup(aadhaar), voted)
+        # Matched as stored, like the voters table; callers canonicalise first
+        self.assertIsNone(index.lookup("150100001501"))
+        self.assertEqual(canonical_voter_id("1501 0000 1501"), "1501-0000-1501")
+        self.assertEqual(index.lookup(canonical_voter_id("150100001501")), False)
+        self.assertIsNone(index.lookup("1500-0000-1499"))
+        self.assertEqual(canonical_voter_id("legacy-id"), "legacy-id")
+        for unknown in ("9999-9999-9999", "1500-0000-1501", "abc", None, "1500-0000-15000"):
+            self.assertIsNone(index.lookup(unknown))
+        with self.assertRaises(ValueError):
+            EligibilityIndex(reversed(roll))
+
+        index.mark_voted("1501-0000-1501")
+        index.mark_voted("legacy-id")
+        self.assertTrue(index.lookup("1501-0000-1501"))
+        self.assertTrue(index.lookup("legacy-id"))
+        self.assertFalse(index.is_eligible("legacy-id"))
+        self.assertEqual(index.stats()["voted"], sum(v for _, v in roll) + 2)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(5000)
+        keys = [voter_key(f"{i:04d}-1234-{i:04d}") for i in range(5000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(voter_key(f"{i:04d}-4321-{i:04d}") in bloom for i in range(5000))
+        self.assertLess(false_positives, 150) # sized for 1%
+
+    def test_index_follows_board_commits(self):
+        db.init_db()
+        index = get_eligibility_index()
+        self.assertIs(index.lookup("1000-0000-0001"), False)
+
+        BulletinBoard().publish(create_ballot(1), voter_id="1000-0000-0001")
+        self.assertTrue(index.lookup("1000-0000-0001"))
+        self.assertTrue(db.get_voter("1000-0000-0001")['has_voted'])
+        self.assertIs(index.lookup("2000-0000-0002"), False)
+        self.assertIsNone(index.lookup("1111-2222-3333"))
+
+    def test_login_canonicalises_the_id(self):
+        db.init_db()
+        import app as appmod
+        appmod.app.config['TESTING'] = True
+        client = appmod.app.test_client()
+        r = client.post('/login', json={'aadhaar': '1000 0000 0001'})
+        self.assertEqual(r.get_json()['status'], "otp_sent")
+        code = appmod.get_otp_store().delivery.latest("1000-0000-0001")
+        self.assertEqual(client.post('/verify_otp', json={'otp': code}).get_json()['status'], "success")
+        with client.session_transaction() as sess:
+            self.assertEqual(sess['user'], "1000-0000-0001")
+
+    def test_legacy_undashed_rows_can_log_in(self):
+        db.init_db()
+        with db.pooled_connection() as conn, conn:
+            conn.execute("INSERT INTO voters VALUES ('600000000006', 'Legacy Voter', '9000000006', 0)")
+        # Next start-up stores the row in canonical form
+        db.init_db()
+        self.assertIsNotNone(db.get_voter("6000-0000-0006"))
+        self.assertIs(reload_eligibility_index().lookup("6000-0000-0006"), False)
+
+        import app as appmod
+        appmod.app.config['TESTING'] = True
+        client = appmod.app.test_client()
+        r = client.post('/login', json={'aadhaar': '600000000006'})
+        self.assertEqual(r.get_json()['status'], "otp_sent")
+        code = appmod.get_otp_store().delivery.latest("6000-0000-0006")
+        self.assertEqual(client.post('/verify_otp', json={'otp': code}).get_json()['status'], "success")
+
+if __name__ == '__main__':
+    unittest.main()
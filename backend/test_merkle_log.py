@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.merkle_log import MerkleTree
+
+class MerkleTreeTest(unittest.TestCase):
+
+    def _full_rebuild_root(self, items):
+        mt = MerkleTree()
+        for item in items:
+            mt.add_leaf(item)
+        mt._recalculate_tree()
+        return mt.levels[-1][0], mt.levels
+
+    def test_incremental_matches_full_rebuild(self):
+        items = [f"Vote {i}" for i in range(70)]
+        levels_tree = MerkleTree()
+        frontier_tree = MerkleTree(store_levels=False)
+
+        for i, item in enumerate(items):
+            levels_tree.add_leaf(item)
+            frontier_tree.add_leaf(item)
+
+            expected_root, expected_levels = self._full_rebuild_root(items[:i + 1])
+            self.assertEqual(levels_tree.get_root(), expected_root)
+            self.assertEqual(frontier_tree.get_root(), expected_root)
+            self.assertEqual(levels_tree.levels, expected_levels)
+
+    def test_proofs_for_old_leaves(self):
+        # Odd sizes exercise the self-paired right edge
+        for size in (1, 2, 5, 13, 16):
+            mt = MerkleTree()
+            for i in range(size):
+                mt.add_leaf(f"Vote {i}")
+            root = mt.get_root()
+
+            for i in range(size):
+                proof = mt.get_proof(i)
+                self.assertTrue(mt.verify_proof(f"Vote {i}", proof, root))
+            self.assertFalse(mt.verify_proof("Vote 99", mt.get_proof(0), root))
+
+    def test_rollback_restores_previous_root(self):
+        for store_levels in (True, False):
+            mt = MerkleTree(store_levels=store_levels)
+            for i in range(11):
+                mt.add_leaf(f"Vote {i}")
+            checkpoint = mt.checkpoint()
+            root = mt.get_root()
+            for i in range(6):
+                mt.add_leaf(f"Rejected {i}")
+            mt.rollback(checkpoint)
+            self.assertEqual(mt.get_root(), root)
+
+            mt.add_leaf("Vote 11")
+            self.assertEqual(mt.get_root(), self._full_rebuild_root(
+                [f"Vote {i}" for i in range(12)])[0])
+
+    def test_frontier_mode_is_logarithmic(self):
+        mt = MerkleTree(store_levels=False)
+        for i in range(1000):
+            mt.add_leaf(f"Vote {i}")
+        self.assertEqual(mt.levels, [])
+        self.assertLessEqual(len(mt.frontier), 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import os
+import sys
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.otp import OTPStore, QueueOutbox, FileOutbox, TokenBucketLimiter, RateLimited
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class OTPStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.outbox = QueueOutbox()
+        self.store = OTPStore(self.outbox, ttl=300, max_attempts=3,
+                              id_limiter=TokenBucketLimiter(3, 1 / 60),
+                              ip_limiter=TokenBucketLimiter(5, 1),
+                              clock=self.clock)
+
+    def test_issue_and_verify(self):
+        challenge = self.store.issue("1000-0000-0001", "9876543210")
+        code = self.outbox.latest("1000-0000-0001")
+        self.assertEqual(len(code), 6)
+        self.assertEqual(self.outbox.messages[-1], ("1000-0000-0001", "9876543210", code))
+        self.assertNotIn(code, challenge)
+
+        self.assertTrue(self.store.is_pending(challenge))
+        self.assertEqual(self.store.verify(challenge, code), "1000-0000-0001")
+        # Single use
+        self.assertFalse(self.store.is_pending(challenge))
+        self.assertIsNone(self.store.verify(challenge, code))
+
+    def test_codes_expire(self):
+        challenge = self.store.issue("1000-0000-0001", "9876543210")
+        code = self.outbox.latest("1000-0000-0001")
+        self.clock.now += 300
+        self.assertIsNone(self.store.verify(challenge, code))
+        self.assertEqual(self.store.stats()["pending"], 0)
+
+    def test_wrong_guesses_burn_the_code(self):
+        challenge = self.store.issue("1000-0000-0001", "9876543210")
+        code = self.outbox.latest("1000-0000-0001")
+        wrong = f"{(int(code) + 1) % 10**6:06d}"
+        for guess in (wrong, None, "x" * 6):
+            self.assertIsNone(self.store.verify(challenge, guess))
+        self.assertFalse(self.store.is_pending(challenge))
+        self.assertIsNone(self.store.verify(challenge, code))
+
+    def test_new_code_replaces_previous(self):
+        first = self.store.issue("1000-0000-0001", "9876543210")
+        first_code = self.outbox.latest("1000-0000-0001")
+        second = self.store.issue("1000-0000-0001", "9876543210")
+        self.assertFalse(self.store.is_pending(first))
+        self.assertIsNone(self.store.verify(first, first_code))
+        self.assertEqual(self.store.verify(second, self.outbox.latest("1000-0000-0001")), "1000-0000-0001")
+
+    def test_rate_limits(self):
+        for _ in range(3):
+            self.store.issue("1000-0000-0001", "9876543210")
+        with self.assertRaises(RateLimited) as cm:
+            self.store.issue("1000-0000-0001", "9876543210")
+        self.assertEqual(cm.exception.retry_after, 60)
+        # Other voters are not affected; the bucket refills over time
+        self.store.issue("2000-0000-0002", "9876543211")
+        self.clock.now += 60
+        self.store.issue("1000-0000-0001", "9876543210")
+
+        for _ in range(5):
+            self.store.check_ip("10.0.0.1")
+        self.assertRaises(RateLimited, self.store.check_ip, "10.0.0.1")
+        self.store.check_ip("10.0.0.2")
+        self.assertEqual(self.store.stats()["tracked_ips"], 2)
+
+    def test_limiter_tracks_bounded_keys(self):
+        limiter = TokenBucketLimiter(1, 1, max_keys=100)
+        for i in range(1000):
+            limiter.take(i, 0.0)
+        self.assertEqual(len(limiter), 100)
+
+    def test_file_outbox(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = FileOutbox(os.path.join(tmp, "outbox.jsonl"))
+            self.assertIsNone(outbox.latest("1000-0000-0001"))
+            store = OTPStore(outbox, clock=self.clock)
+            store.issue("1000-0000-0001", "9876543210")
+            challenge = store.issue("1000-0000-0001", "9876543210")
+            self.assertEqual(store.verify(challenge, outbox.latest("1000-0000-0001")), "1000-0000-0001")
+
+            # Later sends are picked up from where the last read stopped
+            store.issue("2000-0000-0002", "9876543211")
+            outbox.send("1000-0000-0001", "9876543210", "123456")
+            self.assertEqual(outbox.latest("1000-0000-0001"), "123456")
+            self.assertIsNotNone(outbox.latest("2000-0000-0002"))
+            # A truncated outbox is read again from the start
+            open(outbox.path, "w").close()
+            outbox.send("3000-0000-0003", "9876543212", "654321")
+            self.assertIsNone(outbox.latest("1000-0000-0001"))
+            self.assertEqual(outbox.latest("3000-0000-0003"), "654321")
+
+    def test_queue_outbox_is_bounded(self):
+        outbox = QueueOutbox(maxlen=10)
+        for i in range(100):
+            outbox.send(f"{i:04d}-0000-0000", "9876543210", f"{i:06d}")
+        self.assertEqual(len(outbox.messages), 10)
+        self.assertIsNone(outbox.latest("0089-0000-0000"))
+        self.assertEqual(outbox.latest("0099-0000-0000"), "000099")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.roll_import import import_roll
+from src.eligibility import EligibilityIndex, canonical_voter_id
+
+class RollImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.orig_db_path = db.DB_PATH
+        db.DB_PATH = os.path.join(self.tmp_dir.name, 'secure_voting.db')
+
+    def tearDown(self):
+        db.close_db_connections()
+        db.DB_PATH = self.orig_db_path
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_csv_and_jsonl_rolls_load_sorted_and_deduplicated(self):
+        ids = [f"{(i * 7919) % 900000000000 + 100000000000}" for i in range(1, 301)]
+        csv_path = self._write('roll.csv', "aadhaar,name,phone\n" + "".join(
+            f"{aadhaar},Voter {i},900000{i:04d}\n" for i, aadhaar in enumerate(ids)) + "12-34,Bad,0\n")
+        report = import_roll(csv_path, shards=3, batch_size=64)
+        self.assertEqual((report['rows'], report['inserted'], report['invalid']), (301, 300, 1))
+
+        # Second file: overlapping IDs are skipped, and existing rows keep has_voted
+        db.mark_voter_as_voted(f"{ids[0][:4]}-{ids[0][4:8]}-{ids[0][8:]}")
+        jsonl_path = self._write('roll.jsonl', "".join(
+            json.dumps({"aadhaar": aadhaar, "name": "Dup"}) + "\n" for aadhaar in ids[:10] + ["999988887777"]))
+        report = import_roll(jsonl_path)
+        self.assertEqual((report['inserted'], report['duplicates']), (1, 10))
+
+        index = EligibilityIndex.from_db()
+        self.assertEqual(len(index), 306) # 5 seeded mock voters
+        self.assertTrue(index.lookup(canonical_voter_id(ids[0])))
+        self.assertIs(index.lookup("9999-8888-7777"), False)
+        self.assertEqual(db.get_voter(canonical_voter_id(ids[5]))['name'], "Voter 5")
+
+        with self.assertRaises(ValueError):
+            import_roll(jsonl_path, replace=True)
+
+    def test_replace_is_all_or_nothing(self):
+        db.init_db()
+        roll = "".join(json.dumps({"aadhaar": f"5555-0000-{i:04d}"}) + "\n" for i in range(50))
+        # A roll that fails part-way leaves the old roll in place
+        broken_path = self._write('broken.jsonl', roll + "{not json\n")
+        with self.assertRaises(ValueError):
+            import_roll(broken_path, shards=2, replace=True)
+        self.assertEqual(len(EligibilityIndex.from_db()), 5)
+
+        report = import_roll(self._write('roll.jsonl', roll), shards=2, replace=True)
+        self.assertEqual(report['inserted'], 50)
+        index = EligibilityIndex.from_db()
+        self.assertEqual(len(index), 50)
+        self.assertIsNone(index.lookup("1000-0000-0001"))
+        # Staging shards are scratch files, removed either way
+        self.assertEqual([name for name in os.listdir(self.tmp_dir.name) if 'roll-shard' in name], [])
+
+if __name__ == '__main__':
+    unittest.main()
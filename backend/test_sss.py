@@ -0,0 +1,50 @@
+import unittest
+import os
+import sys
+import random
+import itertools
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src import sss
+from src.sss import PRIME, split_secret, split_secrets, recover_secret, lagrange_coefficients
+
+class SSSTest(unittest.TestCase):
+
+    def test_mersenne_reduction_matches_mod(self):
+        rng = random.Random(3)
+        for bits in (1, 2203, 2204, 4406, 9000):
+            x = rng.getrandbits(bits)
+            self.assertEqual(sss._reduce(x), x % PRIME)
+        self.assertEqual(sss._reduce(PRIME), 0)
+        self.assertEqual(sss._reduce(2 * PRIME), 0)
+
+    def test_any_threshold_subset_recovers(self):
+        secret = random.SystemRandom().getrandbits(2048)
+        shares = split_secret(secret, 3, 5)
+        for subset in itertools.permutations(shares, 3):
+            self.assertEqual(recover_secret(list(subset)), secret)
+        self.assertNotEqual(recover_secret(shares[:2]), secret)
+
+    def test_vectorised_split_and_large_ceremony(self):
+        secrets = [random.SystemRandom().getrandbits(2048) for _ in range(4)]
+        share_sets = split_secrets(secrets, 40, 60)
+        for secret, shares in zip(secrets, share_sets):
+            self.assertEqual(recover_secret(random.sample(shares, 40)), secret)
+        self.assertEqual(split_secret(7, 1, 3), [(1, 7), (2, 7), (3, 7)])
+
+    def test_lagrange_coefficients_cached_and_checked(self):
+        lagrange_coefficients.cache_clear()
+        shares = split_secret(12345, 3, 5)
+        recover_secret([shares[4], shares[0], shares[2]])
+        recover_secret([shares[0], shares[2], shares[4]])
+        self.assertEqual(lagrange_coefficients.cache_info().hits, 1)
+        # Coefficients at 0 sum to 1 (they interpolate the constant polynomial)
+        self.assertEqual(sum(lagrange_coefficients((1, 3, 5))) % PRIME, 1)
+        with self.assertRaises(ValueError):
+            recover_secret([shares[0], shares[0]])
+        with self.assertRaises(ValueError):
+            split_secret(PRIME, 2, 3)
+
+if __name__ == '__main__':
+    unittest.main()
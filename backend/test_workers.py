@@ -0,0 +1,73 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.bulletin_board import BulletinBoard
+from src.keygen import load_public_key
+from src.precompute import precompute_nonce
+from src.voting import create_ballot
+from src.workers import CryptoPool, PoolSaturated, build_ballot
+
+class CryptoPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = CryptoPool(workers=1, max_pending=2)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.orig_db_path = db.DB_PATH
+        db.DB_PATH = os.path.join(self.tmp_dir.name, 'secure_voting.db')
+
+    def tearDown(self):
+        self.pool.shutdown()
+        db.close_db_connections()
+        db.DB_PATH = self.orig_db_path
+        self.tmp_dir.cleanup()
+
+    def test_saturated_pool_rejects_with_retry_after(self):
+        running = [self.pool.submit(time.sleep, 0.5) for _ in range(2)]
+        with self.assertRaises(PoolSaturated) as ctx:
+            self.pool.submit(time.sleep, 0)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(self.pool.stats()["rejected"], 1)
+
+        # Slots free up as jobs finish
+        for future in running:
+            future.result()
+        self.pool.submit(time.sleep, 0).result()
+        self.assertEqual(self.pool.stats()["completed"], 3)
+
+    def test_ballots_built_and_verified_in_workers(self):
+        nonce = precompute_nonce(load_public_key())
+        ballots = [asyncio.run(build_ballot(self.pool, v, "kiosk-w", n)) for v, n in [(1, nonce), (0, None)]]
+        self.assertEqual(int(ballots[0]["proof"]["e"][0]), nonce.e_fake)
+
+        bb = BulletinBoard(verify_pool=self.pool)
+        ballots.append(dict(ballots[1], proof=ballots[0]["proof"]))
+        self.assertEqual(bb.verify_proofs(ballots), [True, True, False])
+        for ballot in ballots[:2]:
+            bb.publish(ballot)
+        self.assertEqual(bb.merkle_tree.size, 2)
+
+    def test_board_keeps_verifying_when_the_pool_fails(self):
+        bb = BulletinBoard(group_commit=True, batch_window=0.05, verify_pool=self.pool)
+        ballots = [create_ballot(v) for v in (1, 0)]
+        self.pool.shutdown()
+        # Every pool call now raises: the batch is verified in-thread instead
+        futures = [bb.submit(ballot) for ballot in ballots]
+        self.assertEqual(sorted(f.result(timeout=30) for f in futures), [0, 1])
+        self.assertEqual(bb.publish(create_ballot(1), timeout=30), 2)
+
+    def test_pool_restarts_after_a_worker_dies(self):
+        with self.assertRaises(BrokenProcessPool):
+            self.pool.submit(os._exit, 1).result(timeout=30)
+        self.assertEqual(self.pool.submit(abs, -3).result(timeout=30), 3)
+        self.assertEqual(self.pool.stats()["restarts"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
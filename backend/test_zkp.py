@@ -0,0 +1,314 @@
+import unittest
+import os
+import sys
+import random
+import time
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from phe import paillier
+from src.keygen import key_context_for
+from src.zkp import ZKPUtils, ZKPProver, ZKPVerifier, CHALLENGE_MODULUS
+from src.voting import encrypt_vote, encrypt_packed, PackedEncoding
+from src.tally import decode_packed_tally, multiply_ciphertexts
+from src import native
+from src.precompute import RandomnessPool, precompute_nonce
+
+# Small key: fast tests, same arithmetic as production keys
+PUBLIC_KEY, PRIVATE_KEY = paillier.generate_paillier_keypair(n_length=512)
+
+def encrypt_with_r(public_key, vote):
+    n = public_key.n
+    r = random.SystemRandom().randint(1, n - 1)
+    return public_key.encrypt(vote, r_value=r).ciphertext(be_secure=False), r
+
+class ZKPTest(unittest.TestCase):
+
+    def setUp(self):
+        self.prover = ZKPProver(PUBLIC_KEY)
+        self.verifier = ZKPVerifier(PUBLIC_KEY)
+
+    def test_key_context_matches_plain_computation(self):
+        ctx = key_context_for(PUBLIC_KEY)
+        n, ns = PUBLIC_KEY.n, PUBLIC_KEY.n ** 2
+        self.assertIs(ctx, key_context_for(paillier.PaillierPublicKey(n)))
+        self.assertEqual(ctx.g_inv, pow(n + 1, -1, ns))
+        self.assertEqual(ctx.challenge(5, 6, 7), ZKPUtils.hash_nums([n, n + 1, 5, 6, 7]))
+        for m in (0, 1, 7, -3):
+            self.assertEqual(ctx.g_pow(m), pow(n + 1, m, ns))
+
+    def test_valid_votes_verify(self):
+        for vote in (0, 1):
+            c, r = encrypt_with_r(PUBLIC_KEY, vote)
+            proof = self.prover.prove_vote(c, vote, r)
+            self.assertTrue(self.verifier.verify(c, proof))
+
+    def test_encrypt_vote_matches_phe(self):
+        for vote in (0, 1):
+            enc = encrypt_vote(PUBLIC_KEY, vote)
+            expected = PUBLIC_KEY.encrypt(vote, r_value=enc.r).ciphertext(be_secure=False)
+            self.assertEqual(enc.ciphertext, expected)
+            self.assertEqual(enc.r_n, pow(enc.r, PUBLIC_KEY.n, PUBLIC_KEY.nsquare))
+            self.assertEqual(PRIVATE_KEY.decrypt(paillier.EncryptedNumber(PUBLIC_KEY, enc.ciphertext, 0)), vote)
+            self.assertTrue(self.verifier.verify(enc.ciphertext, self.prover.prove_vote(enc.ciphertext, vote, enc.r)))
+        with self.assertRaises(ValueError):
+            encrypt_vote(PUBLIC_KEY, 2)
+
+    def test_precomputed_nonce_proofs_verify(self):
+        for vote in (0, 1):
+            nonce = precompute_nonce(PUBLIC_KEY)
+            enc = encrypt_vote(PUBLIC_KEY, vote, nonce.r, nonce.r_n)
+            self.assertEqual(enc.ciphertext, encrypt_vote(PUBLIC_KEY, vote, nonce.r).ciphertext)
+            proof = self.prover.prove_vote(enc.ciphertext, vote, nonce.r, nonce=nonce)
+            self.assertTrue(self.verifier.verify(enc.ciphertext, proof))
+            self.assertEqual(int(proof["e"][1 - vote]), nonce.e_fake)
+        with self.assertRaises(ValueError):
+            self.prover.prove_vote(enc.ciphertext, 1, nonce.r + 1, nonce=nonce)
+
+    def test_randomness_pool_single_use_and_stats(self):
+        pool = RandomnessPool(PUBLIC_KEY, size=4, refill_threads=1)
+        try:
+            deadline = time.time() + 10
+            while pool.available() < 4 and time.time() < deadline:
+                time.sleep(0.01)
+            nonces = [pool.take() for _ in range(4)]
+            self.assertEqual(len({nonce.r for nonce in nonces}), 4)
+            self.assertEqual(pool.stats()["hits"], 4)
+        finally:
+            pool.stop()
+        # Drained and stopped: take() falls back to computing inline
+        while pool.available():
+            pool.take()
+        before = pool.stats()["misses"]
+        self.assertIsNotNone(pool.take())
+        self.assertEqual(pool.stats()["misses"], before + 1)
+
+    def test_tampered_and_invalid_votes_fail(self):
+        c, r = encrypt_with_r(PUBLIC_KEY, 1)
+        proof = self.prover.prove_vote(c, 1, r)
+        tampered = dict(proof, z=[proof["z"][0], str(int(proof["z"][1]) + 1)])
+        self.assertFalse(self.verifier.verify(c, tampered))
+
+        # A lying prover claiming an encryption of 2 is a 0
+        c2, r2 = encrypt_with_r(PUBLIC_KEY, 2)
+        self.assertFalse(self.verifier.verify(c2, self.prover.prove_vote(c2, 0, r2)))
+
+    def test_challenges_do_not_reveal_the_vote(self):
+        # Simulated and real challenges come from the same range, so the
+        # proof carries no sign or size that tells the branches apart
+        for vote in (0, 1):
+            for _ in range(20):
+                c, r = encrypt_with_r(PUBLIC_KEY, vote)
+                e = [int(x) for x in self.prover.prove_vote(c, vote, r)["e"]]
+                self.assertTrue(all(0 <= x < CHALLENGE_MODULUS for x in e))
+
+        # Proofs made before (e_fake in [1, n], e_real = E - e_fake) still verify
+        ctx = key_context_for(PUBLIC_KEY)
+        n, ns = ctx.n, ctx.ns
+        c, r = encrypt_with_r(PUBLIC_KEY, 1)
+        e0, z0, w = n - 5, 12345, 777
+        a = [pow(z0, n, ns) * pow(c, -e0, ns) % ns, pow(w, n, ns)]
+        e1 = ctx.challenge(c, *a) - e0
+        z1 = w * pow(r, e1, n) % n
+        legacy = {"a": [str(x) for x in a], "e": [str(e0), str(e1)], "z": [str(z0), str(z1)]}
+        self.assertLess(e1, 0)
+        self.assertTrue(self.verifier.verify(c, legacy))
+        self.assertEqual(self.verifier.verify_batch([(c, legacy)]), [True])
+
+    def test_out_of_range_challenges_are_rejected(self):
+        # For an encryption of 2, pick e_1 = (E - e_0) mod 2^256 lifted to a
+        # multiple of n: then z_1 = w * (u / g)^(e_1 / n) satisfies branch 1
+        # without the prover knowing anything. Only the range check stops it.
+        ctx = key_context_for(PUBLIC_KEY)
+        n, ns = ctx.n, ctx.ns
+        c, _ = encrypt_with_r(PUBLIC_KEY, 2)
+        e0, z0, w = 99, 12345, 777
+        a = [pow(z0, n, ns) * pow(c, -e0, ns) % ns, pow(w, n, ns)]
+        k = (ctx.challenge(c, *a) - e0) * pow(n, -1, CHALLENGE_MODULUS) % CHALLENGE_MODULUS
+        e1 = n * k
+        z1 = w * pow(c * ctx.g_inv, k, ns) % ns
+        self.assertEqual(pow(z1, n, ns), a[1] * pow(c * ctx.g_inv, e1, ns) % ns)
+        self.assertEqual((e0 + e1) % CHALLENGE_MODULUS, ctx.challenge(c, *a))
+        forged = {"a": [str(x) for x in a], "e": [str(e0), str(e1)], "z": [str(z0), str(z1)]}
+        self.assertFalse(self.verifier.verify(c, forged))
+        self.assertEqual(self.verifier.verify_batch([(c, forged)]), [False])
+
+    def test_malformed_commitments_and_responses_are_rejected(self):
+        # Each forgery satisfies the challenge and both branch equations;
+        # only the range and unit checks on u, a and z reject it
+        ctx = key_context_for(PUBLIC_KEY)
+        n, ns = ctx.n, ctx.ns
+        p, q = PRIVATE_KEY.p, PRIVATE_KEY.q
+        rng = random.SystemRandom()
+
+        def crt(x_p, x_q, mp, mq):
+            return (x_p + mp * ((x_q - x_p) * pow(mp, -1, mq) % mq)) % (mp * mq)
+
+        def branches_hold(u, proof):
+            a, e, z = ([int(x) for x in proof[key]] for key in ("a", "e", "z"))
+            return (ZKPUtils.challenge_matches(ctx.challenge(u, *a), e)
+                    and pow(z[0], n, ns) == a[0] * pow(u, e[0], ns) % ns
+                    and pow(z[1], n, ns) == a[1] * pow(u * ctx.g_inv, e[1], ns) % ns)
+
+        # a = z = 0 proves anything, e.g. that an encryption of 500 is a 0
+        c500, _ = encrypt_with_r(PUBLIC_KEY, 500)
+        zero = {"a": ["0", "0"], "e": [str(ctx.challenge(c500, 0, 0)), "0"], "z": ["0", "0"]}
+
+        # Non-units: u encrypts 500 mod p^2 but 0 mod q^2. Branch 0 is proven
+        # honestly mod q and is all zeros mod p (0 = 0 * u^e mod p^2)
+        r = rng.randrange(1, n)
+        u = crt(c500 % p ** 2, pow(r, n, q ** 2), p ** 2, q ** 2)
+        w = rng.randrange(1, q)
+        a0 = crt(0, pow(w, n, q ** 2), p ** 2, q ** 2)
+        e1, z1 = rng.randrange(CHALLENGE_MODULUS), rng.randrange(1, n)
+        a1 = pow(z1, n, ns) * pow(u * ctx.g_inv, -e1, ns) % ns
+        e0 = (ctx.challenge(u, a0, a1) - e1) % CHALLENGE_MODULUS
+        z0 = crt(0, w * pow(r, e0, q) % q, p, q)
+        non_unit = {"a": [str(a0), str(a1)], "e": [str(e0), str(e1)], "z": [str(z0), str(z1)]}
+
+        # z + n and a + n^2 satisfy the same equations as z and a (a is
+        # hashed, so that proof is made with the large commitment)
+        good_c, r = encrypt_with_r(PUBLIC_KEY, 1)
+        good = self.prover.prove_vote(good_c, 1, r)
+        z_high = dict(good, z=[str(int(good["z"][0]) + n), good["z"][1]])
+        e0, z0, w = rng.randrange(CHALLENGE_MODULUS), rng.randrange(1, n), rng.randrange(1, n)
+        a = [pow(z0, n, ns) * pow(good_c, -e0, ns) % ns, pow(w, n, ns) + ns]
+        e1 = (ctx.challenge(good_c, *a) - e0) % CHALLENGE_MODULUS
+        a_high = {"a": [str(x) for x in a], "e": [str(e0), str(e1)], "z": [str(z0), str(w * pow(r, e1, n) % n)]}
+        u_high = good_c + ns
+
+        forged = [(c500, zero), (u, non_unit), (good_c, z_high), (good_c, a_high)]
+        for c, proof in forged:
+            self.assertTrue(branches_hold(c, proof))
+            self.assertFalse(self.verifier.verify(c, proof))
+            self.assertFalse(self.verifier.verify_one_of(c, proof, [0, 1]))
+        self.assertFalse(self.verifier.verify(u_high, good))
+
+        items = [(good_c, good)] * 6 + forged + [(u_high, good)]
+        self.assertEqual(self.verifier.verify_batch(items), [True] * 6 + [False] * 5)
+        self.assertEqual(self.verifier.verify_batch(items, [0, 1]), [True] * 6 + [False] * 5)
+
+    def test_multi_pow_matches_pow(self):
+        rng = random.Random(7)
+        mod = PUBLIC_KEY.nsquare
+        pairs = [(rng.getrandbits(1000), rng.getrandbits(rng.choice([1, 64, 600]))) for _ in range(20)]
+        expected = 1
+        for base, exp in pairs:
+            expected = expected * pow(base, exp, mod) % mod
+        self.assertEqual(ZKPUtils.multi_pow(pairs, mod), expected)
+        self.assertEqual(ZKPUtils.multi_pow([], mod), 1)
+
+    def test_verify_batch_matches_individual(self):
+        items = []
+        for i in range(12):
+            vote = i % 2
+            c, r = encrypt_with_r(PUBLIC_KEY, vote)
+            items.append((c, self.prover.prove_vote(c, vote, r)))
+        self.assertEqual(self.verifier.verify_batch(items), [True] * 12)
+
+        c, r = encrypt_with_r(PUBLIC_KEY, 1)
+        proof = items[3][1]
+        items[3] = (items[3][0], dict(proof, z=[proof["z"][0], str(int(proof["z"][1]) + 1)]))
+        items[7] = (items[7][0], dict(items[7][1], a=list(reversed(items[7][1]["a"]))))
+        items[8] = (items[8][0], dict(items[8][1], e=[items[8][1]["e"][1], items[8][1]["e"][0]]))
+        items[10] = (c, items[10][1])
+        items.append((encrypt_with_r(PUBLIC_KEY, 2)[0], {"a": ["1"], "e": [], "z": []}))
+        c2, r2 = encrypt_with_r(PUBLIC_KEY, 2)
+        items.append((c2, self.prover.prove_vote(c2, 0, r2)))
+
+        expected = [self.verifier.verify(c, p) for c, p in items]
+        self.assertEqual(expected.count(False), 6)
+        self.assertEqual(self.verifier.verify_batch(items), expected)
+
+    def test_batch_and_verify_agree_on_negated_responses(self):
+        # n - z has (n - z)^n = -z^n mod n^2: a sign flip the random weights
+        # can hide, so both checks must treat it the same way
+        n = PUBLIC_KEY.n
+        items = []
+        for i in range(2 * ZKPVerifier.BATCH_LEAF):
+            c, r = encrypt_with_r(PUBLIC_KEY, i % 2)
+            items.append((c, self.prover.prove_vote(c, i % 2, r)))
+        proof = items[2][1]
+        items[2] = (items[2][0], dict(proof, z=[str(n - int(proof["z"][0])), proof["z"][1]]))
+        proof = items[5][1]
+        items[5] = (items[5][0], dict(proof, z=[proof["z"][0], str(n - int(proof["z"][1]))]))
+        proof = items[6][1]
+        items[6] = (items[6][0], dict(proof, z=[str(n - int(proof["z"][0])), str(int(proof["z"][1]) + 1)]))
+
+        expected = [self.verifier.verify(c, p) for c, p in items]
+        self.assertEqual(expected, [True] * 6 + [False, True])
+        for _ in range(20):
+            self.assertEqual(self.verifier.verify_batch(items), expected)
+
+    def test_native_batch_routines_match_python(self):
+        # The native CI job builds the extension and sets REQUIRE_NATIVE=1;
+        # elsewhere this compares the pure-Python fallback
+        if os.environ.get("REQUIRE_NATIVE"):
+            self.assertTrue(native.HAVE_NATIVE, "secure_voting_core is not installed")
+        votes = [0, 1, 1, 0, 1, 0]
+        encs = native.encrypt_votes(PUBLIC_KEY, votes)
+        for (c, r), vote in zip(encs, votes):
+            self.assertEqual(c, PUBLIC_KEY.encrypt(vote, r_value=r).ciphertext(be_secure=False))
+        proofs = native.prove_votes(PUBLIC_KEY, [(c, v, r) for (c, r), v in zip(encs, votes)])
+        ballots = [(c, p) for (c, _), p in zip(encs, proofs)]
+        self.assertTrue(all(self.verifier.verify(c, p) for c, p in ballots))
+
+        proof = ballots[2][1]
+        ballots[2] = (ballots[2][0], dict(proof, z=[proof["z"][0], str(int(proof["z"][1]) + 1)]))
+        ballots.append((ballots[0][0], {"a": ["1"], "e": [], "z": []}))
+        ballots.append((ballots[1][0], dict(ballots[1][1], z=["-1", "-1"])))
+        proof = ballots[4][1]
+        ballots[4] = (ballots[4][0], dict(proof, z=[str(PUBLIC_KEY.n - int(proof["z"][0])), proof["z"][1]]))
+        zero_challenge = key_context_for(PUBLIC_KEY).challenge(ballots[0][0], 0, 0)
+        ballots.append((ballots[0][0], {"a": ["0", "0"], "e": [str(zero_challenge), "0"], "z": ["0", "0"]}))
+        expected = [self.verifier.verify(c, p) for c, p in ballots]
+        self.assertEqual(expected.count(False), 4)
+        self.assertTrue(expected[4])
+        self.assertEqual(native.verify_votes(PUBLIC_KEY, ballots), expected)
+        self.assertEqual(native.verify_batch(PUBLIC_KEY, ballots), expected)
+
+        cs = [c for c, _ in encs]
+        self.assertEqual(native.ciphertext_product(cs, PUBLIC_KEY.nsquare),
+                         multiply_ciphertexts(cs, PUBLIC_KEY.nsquare))
+
+    def test_one_of_k_proofs(self):
+        encoding = PackedEncoding(4, slot_bits=16)
+        values = encoding.values()
+        items = []
+        for candidate in range(4):
+            enc = encrypt_packed(PUBLIC_KEY, encoding, candidate)
+            proof = self.prover.prove_one_of(enc.ciphertext, values, candidate, enc.r)
+            self.assertTrue(self.verifier.verify_one_of(enc.ciphertext, proof, values))
+            items.append((enc.ciphertext, proof))
+
+        # Two votes in one ballot, or a double vote in one slot, cannot be proven
+        for m in (values[0] + values[1], 2 * values[2]):
+            c, r = encrypt_with_r(PUBLIC_KEY, m)
+            self.assertFalse(self.verifier.verify_one_of(c, self.prover.prove_one_of(c, values, 0, r), values))
+        # Proof checked against the wrong candidate list
+        self.assertFalse(self.verifier.verify_one_of(items[0][0], items[0][1], values[:3]))
+
+        # With values [0, 1] the proof is accepted by the referendum verifier
+        c, r = encrypt_with_r(PUBLIC_KEY, 1)
+        self.assertTrue(self.verifier.verify(c, self.prover.prove_one_of(c, [0, 1], 1, r)))
+
+        # Batch verification, with one tampered proof
+        items = items * 2
+        proof = items[5][1]
+        items[5] = (items[5][0], dict(proof, z=proof["z"][:3] + [str(int(proof["z"][3]) + 1)]))
+        expected = [self.verifier.verify_one_of(c, p, values) for c, p in items]
+        self.assertEqual(expected.count(False), 1)
+        self.assertEqual(self.verifier.verify_batch(items, values), expected)
+
+    def test_packed_tally_decodes_per_candidate(self):
+        encoding = PackedEncoding(3, slot_bits=8)
+        votes = [0, 2, 2, 1, 2, 0, 2]
+        total = sum(paillier.EncryptedNumber(PUBLIC_KEY, encrypt_packed(PUBLIC_KEY, encoding, v).ciphertext, 0)
+                    for v in votes)
+        self.assertEqual(decode_packed_tally(PRIVATE_KEY, total, encoding), [2, 1, 4])
+        self.assertEqual(decode_packed_tally(PRIVATE_KEY, None, encoding), [0, 0, 0])
+        with self.assertRaises(ValueError):
+            PackedEncoding(40, slot_bits=16).check_key(PUBLIC_KEY)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.keygen import load_public_key
+from src.voting import create_ballot
+from src.zkp import ZKPVerifier
+
+BATCH_SIZES = (16, 64, 256)
+
+def benchmark():
+    print("--- BENCHMARK: ZKP verification, per ballot vs verify_batch ---")
+    public_key = load_public_key()
+    verifier = ZKPVerifier(public_key)
+    items = [(b['ciphertext'], b['proof']) for b in (create_ballot(i % 2) for i in range(max(BATCH_SIZES)))]
+    print(f"Key: {public_key.n.bit_length()}-bit n\n")
+
+    start = time.perf_counter()
+    assert all(verifier.verify(c, p) for c, p in items)
+    single = (time.perf_counter() - start) / len(items)
+    print(f"   per ballot          {single * 1000:8.2f} ms/ballot")
+
+    for size in BATCH_SIZES:
+        start = time.perf_counter()
+        assert all(verifier.verify_batch(items[:size]))
+        batched = (time.perf_counter() - start) / size
+        print(f"   batch of {size:<4}       {batched * 1000:8.2f} ms/ballot   {single / batched:5.1f}x")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,108 @@
+import time
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import uuid
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+
+KIOSKS = 16
+VOTES_PER_KIOSK = 50
+
+def legacy_vote(aadhaar, ballot):
+    """The pre-pool access pattern: a fresh rollback-journal connection per helper call."""
+    def connect():
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    conn = connect()
+    conn.execute('SELECT * FROM voters WHERE aadhaar = ?', (aadhaar,)).fetchone()
+    conn.close()
+
+    conn = connect()
+    conn.execute('''
+        INSERT INTO ballots (ballot_id, ciphertext, proof, prev_hash, merkle_root, timestamp, kiosk_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (ballot['ballot_id'], ballot['ciphertext'], json.dumps(ballot['proof']),
+          "0"*64, "0"*64, ballot['timestamp'], ballot['kiosk_id']))
+    conn.commit()
+    conn.close()
+
+    conn = connect()
+    conn.execute('UPDATE voters SET has_voted = 1 WHERE aadhaar = ?', (aadhaar,))
+    conn.commit()
+    conn.close()
+
+def pooled_vote(aadhaar, ballot):
+    db.get_voter(aadhaar)
+    db.add_ballot_to_db(ballot, "0"*64, "0"*64)
+    db.mark_voter_as_voted(aadhaar)
+
+def run_load(label, vote_fn, fresh_db):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def kiosk(k):
+        for i in range(VOTES_PER_KIOSK):
+            ballot = {
+                "ballot_id": str(uuid.uuid4()),
+                "timestamp": time.time(),
+                "kiosk_id": f"kiosk-{k}",
+                "ciphertext": str(10**600 + i),
+                "proof": {"a": ["1", "2"], "e": ["3", "4"], "z": ["5", "6"]}
+            }
+            start = time.perf_counter()
+            try:
+                vote_fn("1000-0000-0001", ballot)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    db.DB_PATH = fresh_db
+    if vote_fn is legacy_vote:
+        # Same schema, default rollback journal
+        conn = _plain_connection(fresh_db)
+        db._init_schema(conn)
+        conn.close()
+    else:
+        db.init_db()
+
+    threads = [threading.Thread(target=kiosk, args=(k,)) for k in range(KIOSKS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else float('nan')
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    locked = sum(1 for e in errors if 'locked' in e)
+    print(f"   {label:<8} {len(latencies) / wall:8.1f} votes/s   p50 {p50:7.2f} ms   "
+          f"p99 {p99:8.2f} ms   'database is locked': {locked}")
+
+def _plain_connection(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def benchmark():
+    print("--- BENCHMARK: Concurrent kiosk writes (SQLite) ---")
+    print(f"{KIOSKS} kiosks x {VOTES_PER_KIOSK} votes\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        run_load("legacy", legacy_vote, os.path.join(tmp, 'legacy.db'))
+        run_load("pooled", pooled_vote, os.path.join(tmp, 'pooled.db'))
+        db.close_db_connections()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,61 @@
+"""
+Eligibility checks: SQLite get_voter() vs the in-memory EligibilityIndex,
+on a synthetic roll of --voters IDs (a third already voted), for known
+IDs and for unknown IDs (rejected by the bloom filter).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.eligibility import EligibilityIndex
+
+def fmt_id(i):
+    s = f"{i:012d}"
+    return f"{s[:4]}-{s[4:8]}-{s[8:]}"
+
+def per_call_us(fn, ids):
+    start = time.perf_counter()
+    for aadhaar in ids:
+        fn(aadhaar)
+    return (time.perf_counter() - start) / len(ids) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--voters", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "roll.db")
+        db.init_db()
+        print(f"Writing a roll of {args.voters:,} voters...")
+        ids = sorted(rng.sample(range(10**11, 10**12, 7), args.voters))
+        with db.ledger_transaction() as conn:
+            conn.execute("DELETE FROM voters")
+            conn.executemany("INSERT INTO voters VALUES (?, '', '', ?)",
+                             ((fmt_id(i), int(k % 3 == 0)) for k, i in enumerate(ids)))
+
+        start = time.perf_counter()
+        index = EligibilityIndex.from_db()
+        load_s = time.perf_counter() - start
+        stats = index.stats()
+        print(f"Index loaded in {load_s:.1f}s: {stats['bytes'] / 2**20:.1f} MiB "
+              f"({stats['bytes'] / len(index):.1f} bytes/voter)")
+
+        known = [fmt_id(rng.choice(ids)) for _ in range(args.lookups)]
+        unknown = [fmt_id(rng.randrange(10**11, 10**12, 7) + 1) for _ in range(args.lookups)]
+        print(f"\n{'lookup':<16}{'sqlite (us)':>14}{'index (us)':>14}")
+        for label, sample in (("known IDs", known), ("unknown IDs", unknown)):
+            sql = per_call_us(db.get_voter, sample)
+            mem = per_call_us(index.lookup, sample)
+            print(f"{label:<16}{sql:>14.1f}{mem:>14.2f}")
+        db.close_db_connections()
+
+if __name__ == "__main__":
+    main()
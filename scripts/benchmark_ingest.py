@@ -0,0 +1,65 @@
+import time
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.voting import create_ballot
+from src.bulletin_board import BulletinBoard
+
+CLIENTS = 32
+BALLOTS = 256
+
+def run(label, ballots, verify=True, **board_args):
+    bb = BulletinBoard(**board_args)
+    if not verify:
+        # Isolate the storage stage: proofs were already checked when the ballots were built
+        bb.verify_proof = lambda ballot: True
+    latencies = []
+    lock = threading.Lock()
+    chunks = [ballots[i::CLIENTS] for i in range(CLIENTS)]
+
+    def client(chunk):
+        for ballot in chunk:
+            start = time.perf_counter()
+            bb.publish(ballot)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in chunks]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"   {label:<24} {len(latencies) / wall:8.1f} ballots/s   p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+
+def benchmark():
+    print("--- BENCHMARK: Ballot ingestion (per-ballot vs group commit) ---")
+    print(f"{CLIENTS} concurrent clients, {BALLOTS} ballots\n")
+
+    print("Pre-computing ballots (excluded from timing)...")
+    ballots = [create_ballot(i % 2, kiosk_id=f"kiosk-{i % 8}") for i in range(BALLOTS)]
+
+    modes = [("per-ballot commit", {}),
+             ("group commit 5ms/16", {"group_commit": True, "max_batch": 16}),
+             ("group commit 5ms/64", {"group_commit": True, "max_batch": 64}),
+             ("group commit 5ms/256", {"group_commit": True, "max_batch": 256})]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for verify in (False, True):
+            print("\nCommit stage only:" if not verify else "\nWith ZKP verification:")
+            for label, args in modes:
+                db.DB_PATH = os.path.join(tmp, f"{len(os.listdir(tmp))}.db")
+                run(label, ballots, verify=verify, **args)
+        db.close_db_connections()
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,37 @@
+import time
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.merkle_log import MerkleTree
+
+def benchmark(max_leaves=10_000_000, sample=10_000, store_levels=False):
+    print("--- BENCHMARK: Incremental Merkle Append ---")
+    mode = "levels" if store_levels else "frontier"
+    print(f"Mode: {mode}, up to {max_leaves:,} leaves\n")
+
+    mt = MerkleTree(store_levels=store_levels)
+    checkpoint = 1000
+    start = time.perf_counter()
+
+    while mt.size < max_leaves:
+        # Time a window of `sample` appends ending at each checkpoint
+        fill_to = max(checkpoint - sample, mt.size)
+        while mt.size < fill_to:
+            mt.append_hash(f"{mt.size:064x}")
+
+        t0 = time.perf_counter()
+        while mt.size < checkpoint:
+            mt.append_hash(f"{mt.size:064x}")
+        dt = time.perf_counter() - t0
+        window = checkpoint - fill_to
+
+        print(f"   {mt.size:>12,} leaves: {dt / window * 1e6:7.2f} us/append "
+              f"(root {mt.get_root()[:10]}...)")
+        checkpoint = min(checkpoint * 10, max_leaves)
+
+    print(f"\nTotal time: {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    leaves = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    benchmark(max_leaves=leaves, store_levels="--levels" in sys.argv)
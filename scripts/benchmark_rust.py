@@ -1,44 +1,102 @@
-import time
-import sys
+"""
+Head-to-head: pure Python vs the secure-voting-core Rust extension for the
+batch routines in src/native.py (encrypt, prove, verify, batch verify,
+ciphertext product). Without the extension only the Python column is run.
+
+Build the extension first with:
+    cd backend/secure-voting-core && maturin develop --release
+"""
+import argparse
 import os
+import sys
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
 
-from secure_voting_core import generate_keypair
-from src.keygen import generate_keypair as python_keygen
+from phe import paillier
+from src import native
+from src.tally import multiply_ciphertexts
+from src.voting import encrypt_vote
+from src.zkp import ZKPProver, ZKPVerifier
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def python_routines(public_key, votes):
+    prover = ZKPProver(public_key)
+    verifier = ZKPVerifier(public_key)
+    state = {}
+
+    def encrypt():
+        state["encs"] = [encrypt_vote(public_key, v) for v in votes]
+    def prove():
+        state["ballots"] = [(enc.ciphertext, prover.prove_vote(enc.ciphertext, v, enc.r))
+                            for enc, v in zip(state["encs"], votes)]
+    def verify():
+        return [verifier.verify(c, p) for c, p in state["ballots"]]
+    def batch_verify():
+        return verifier.verify_batch(state["ballots"])
+    def product():
+        return multiply_ciphertexts((c for c, _ in state["ballots"]), public_key.nsquare)
+
+    return [("encrypt", encrypt), ("prove", prove), ("verify", verify),
+            ("batch verify", batch_verify), ("product", product)]
+
+def rust_routines(public_key, votes):
+    core = native._core
+    n = public_key.n
+    state = {}
+
+    def encrypt():
+        state["encs"] = core.encrypt_votes(n, votes)
+    def prove():
+        items = [(c, v, r) for (c, r), v in zip(state["encs"], votes)]
+        proofs = core.prove_votes(n, items)
+        state["items"] = [(c, a, e, z) for (c, _), (a, e, z) in zip(state["encs"], proofs)]
+    def verify():
+        return core.verify_votes(n, state["items"])
+    def batch_verify():
+        return core.batch_verify_votes(n, state["items"])
+    def product():
+        return core.ciphertext_product(public_key.nsquare, [c for c, _ in state["encs"]])
+
+    return [("encrypt", encrypt), ("prove", prove), ("verify", verify),
+            ("batch verify", batch_verify), ("product", product)]
+
+def run(routines):
+    timings = {}
+    for name, fn in routines:
+        result, dt = timed(fn)
+        if isinstance(result, list) and not all(result):
+            raise SystemExit(f"{name}: {result.count(False)} proofs failed to verify")
+        timings[name] = dt
+    return timings
 
 def benchmark():
-    print("--- BENCHMARK: Python (phe) vs Rust (secure-voting-core) ---")
-    
-    # Python Baseline
-    print("1. Python KeyGen (1024-bit)...")
-    start = time.time()
-    # Using 512 for speed test if 1024 takes too long, but let's try 1024
-    # python_keygen(key_size=1024) 
-    # Note: python_keygen saves files, let's just do math if possible, 
-    # but our func saves. We'll skip deep bench for python to save disk I/O.
-    print("   (Skipped full Python Gen to avoid disk I/O spam)")
-    
-    # Rust Benchmark
-    print("\n2. Rust KeyGen (1024-bit)...")
-    start = time.time()
-    res = generate_keypair(1024)
-    dt_rust = time.time() - start
-    
-    n, g, p, q = res
-    print(f"   Time: {dt_rust:.4f}s")
-    print(f"   Result n (first 50 chars): {n[:50]}...")
-    print(f"   Result p (first 50 chars): {p[:50]}...")
-    
-    # Verification
-    print("\n3. Validity Check")
-    n_int = int(n)
-    p_int = int(p)
-    q_int = int(q)
-    
-    if p_int * q_int == n_int:
-        print("   ✅ Math Checks Out (n = p * q)")
-    else:
-        print("   ❌ Math Error")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ballots", type=int, default=200)
+    parser.add_argument("--key-bits", type=int, default=2048)
+    args = parser.parse_args()
+
+    print("--- BENCHMARK: Python vs Rust (secure-voting-core) ---")
+    print(f"Generating {args.key_bits}-bit key...")
+    public_key, _ = paillier.generate_paillier_keypair(n_length=args.key_bits)
+    votes = [i % 2 for i in range(args.ballots)]
+
+    py = run(python_routines(public_key, votes))
+    rs = run(rust_routines(public_key, votes)) if native.HAVE_NATIVE else None
+    if rs is None:
+        print("Rust extension not found: showing Python only.")
+        print("Build it with: cd backend/secure-voting-core && maturin develop --release")
+
+    print(f"\n{args.ballots} ballots")
+    print(f"{'routine':<14}{'python (s)':>12}{'ballots/s':>12}" + (f"{'rust (s)':>12}{'ballots/s':>12}{'speedup':>10}" if rs else ""))
+    for name, dt in py.items():
+        line = f"{name:<14}{dt:>12.3f}{args.ballots / dt:>12.0f}"
+        if rs:
+            line += f"{rs[name]:>12.3f}{args.ballots / rs[name]:>12.0f}{dt / rs[name]:>9.1f}x"
+        print(line)
 
 if __name__ == "__main__":
     benchmark()
@@ -0,0 +1,72 @@
+import time
+import sys
+import os
+import random
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.sss import PRIME, split_secret, split_secrets, recover_secret, lagrange_coefficients
+
+CEREMONIES = ((3, 5), (20, 40), (100, 200))
+SECRETS = 50
+
+def legacy_split(secret_int, t, n):
+    """The previous engine: Horner with a full % PRIME per step."""
+    coeffs = [secret_int] + [random.SystemRandom().randint(0, PRIME - 1) for _ in range(t - 1)]
+    shares = []
+    for x in range(1, n + 1):
+        result = 0
+        for coeff in reversed(coeffs):
+            result = (result * x + coeff) % PRIME
+        shares.append((x, result))
+    return shares
+
+def legacy_recover(shares):
+    """The previous engine: one extended-GCD inverse per share, O(t^2) basis every call."""
+    def mod_inverse(k):
+        x0, x1, a, b = 0, 1, k % PRIME, PRIME
+        while a != 0:
+            q, b, a = b // a, a, b % a
+            x0, x1 = x1, x0 - q * x1
+        return x0 % PRIME
+
+    xs = [s[0] for s in shares]
+    total = 0
+    for j in range(len(shares)):
+        numerator = denominator = 1
+        for m in range(len(shares)):
+            if m != j:
+                numerator = numerator * (0 - xs[m]) % PRIME
+                denominator = denominator * (xs[j] - xs[m]) % PRIME
+        total = (total + shares[j][1] * numerator * mod_inverse(denominator)) % PRIME
+    return total
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def benchmark():
+    print("--- BENCHMARK: Shamir secret sharing over M2203 ---")
+    for t, n in CEREMONIES:
+        secret = random.SystemRandom().getrandbits(2048)
+        shares = split_secret(secret, t, n)
+        subset = shares[:t]
+
+        old_split, _ = timed(lambda: legacy_split(secret, t, n), 5)
+        new_split, _ = timed(lambda: split_secret(secret, t, n), 5)
+        batch, _ = timed(lambda: split_secrets([secret] * SECRETS, t, n), 1)
+
+        old_rec, old_val = timed(lambda: legacy_recover(subset), 5)
+        lagrange_coefficients.cache_clear()
+        cold_rec, _ = timed(lambda: recover_secret(subset), 1)
+        warm_rec, new_val = timed(lambda: recover_secret(subset), 20)
+        assert old_val == new_val == secret
+
+        print(f"\n{t}-of-{n}")
+        print(f"   split    legacy {old_split:9.2f} ms   new {new_split:9.2f} ms   "
+              f"({SECRETS} secrets batched: {batch / SECRETS:7.2f} ms each)")
+        print(f"   recover  legacy {old_rec:9.2f} ms   new cold {cold_rec:9.2f} ms   cached {warm_rec:7.2f} ms")
+
+if __name__ == "__main__":
+    benchmark()
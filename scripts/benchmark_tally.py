@@ -0,0 +1,60 @@
+import time
+import sys
+import os
+import random
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from phe import paillier
+from src.keygen import load_public_key
+from src.tally import compute_tally
+
+BALLOTS = 200000
+
+def phe_sum(public_key):
+    """The previous tally: one EncryptedNumber per ballot, summed with phe's __add__."""
+    encrypted_sum = None
+    for c_str in db.iter_ciphertexts():
+        enc_vote = paillier.EncryptedNumber(public_key, int(c_str), 0)
+        encrypted_sum = enc_vote if encrypted_sum is None else encrypted_sum + enc_vote
+    return encrypted_sum
+
+def fill_ledger(public_key, count):
+    # Random elements of Z_{n^2}: tallying cost does not depend on proofs
+    rng = random.Random(1)
+    conn = db.get_db_connection()
+    conn.executemany('''
+        INSERT INTO ballots (ballot_id, ciphertext, proof, prev_hash, merkle_root, timestamp, kiosk_id)
+        VALUES (?, ?, '{}', '', '', 0, 'bench')
+    ''', ((f"b{i}", str(rng.randrange(1, public_key.nsquare))) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def benchmark():
+    print("--- BENCHMARK: Homomorphic tally ---")
+    public_key = load_public_key()
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'tally.db')
+        db.init_db()
+        fill_ledger(public_key, BALLOTS)
+        print(f"{BALLOTS} ballots, {public_key.n.bit_length()}-bit n, {os.cpu_count()} cores\n")
+
+        base_t, base = timed(lambda: phe_sum(public_key))
+        print(f"   phe sum()          {base_t:7.2f}s   {BALLOTS / base_t:10.0f} ballots/s")
+        expected = base.ciphertext(be_secure=False)
+
+        for workers in sorted({1, 2, os.cpu_count() or 1}):
+            t, tally = timed(lambda: compute_tally(public_key, workers=workers, range_size=BALLOTS // 8))
+            assert tally.ciphertext(be_secure=False) == expected
+            print(f"   raw, {workers:>2} worker(s)  {t:7.2f}s   {BALLOTS / t:10.0f} ballots/s   "
+                  f"{base_t / t:5.1f}x")
+        db.close_db_connections()
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,14 +1,19 @@
 import requests
 import time
-import re
 import urllib3
 import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from src.otp import FileOutbox
 
 # Suppress self-signed cert warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 BASE_URL = "https://127.0.0.1:5001"
-LOG_FILE = "backend_results.log"
+# The server's OTP outbox: start the server with OTP_DELIVERY=file for this
+# simulation (the default, queue, keeps codes in the server's memory)
+OUTBOX = FileOutbox()
 
 VOTERS = [
     "1000-0000-0001",
@@ -23,21 +28,13 @@ VOTES = [1, 1, 0, 1, 0]
 
 def get_latest_otp(voter_id):
     """
-    Scans the log file for the latest OTP generated for the given voter_id.
+    Reads the latest OTP delivered to the given voter_id from the outbox.
     Retries for a few seconds if not found immediately.
     """
-    otp_pattern = re.compile(f"\\[OTP\\] Generated for {voter_id}: (\\d+)")
-    
     for _ in range(10): # Try for 2 seconds
-        if not os.path.exists(LOG_FILE):
-            time.sleep(0.2)
-            continue
-            
-        with open(LOG_FILE, "r") as f:
-            content = f.read()
-            matches = otp_pattern.findall(content)
-            if matches:
-                return matches[-1] # Return the most recent one
+        otp = OUTBOX.latest(voter_id)
+        if otp:
+            return otp
         time.sleep(0.2)
     return None
 
@@ -60,10 +57,10 @@ def run_simulation():
                 print(f"   ❌ Login Failed: {resp.text}")
                 continue
                 
-            # 2. Get OTP from Log
+            # 2. Get OTP from the delivery outbox
             otp = get_latest_otp(voter_id)
             if not otp:
-                print("   ❌ OTP not found in logs. Is the server writing to backend_results.log?")
+                print(f"   ❌ OTP not found in {OUTBOX.path}. Start the server with OTP_DELIVERY=file.")
                 continue
             
             # 3. Verify OTP
@@ -0,0 +1,40 @@
+"""
+Loads an electoral roll (CSV with an `aadhaar` column, or JSONL; .gz ok)
+into the voters table. Restart the server afterwards so the in-memory
+eligibility index picks up the new roll.
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.roll_import import import_roll, BATCH_SIZE
+
+def print_progress(rows, elapsed):
+    print(f"    {rows:>12,} rows  {rows / elapsed if elapsed else 0.0:>10,.0f} rows/s", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("roll", help="path to the roll file")
+    parser.add_argument("--db", help="SQLite database (default: backend/secure_voting.db)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--shards", type=int, default=1, help="staging shards by ID prefix, sorted in parallel")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--replace", action="store_true", help="clear the roll first (only before voting starts)")
+    args = parser.parse_args()
+
+    if args.db:
+        db.DB_PATH = args.db
+    print(f"--- ROLL IMPORT: {args.roll} -> {db.DB_PATH} ---")
+    report = import_roll(args.roll, fmt=args.format, shards=args.shards, workers=args.workers,
+                         batch_size=args.batch_size, replace=args.replace, on_progress=print_progress)
+    print(f"\nRows read:   {report['rows']:,}")
+    print(f"Inserted:    {report['inserted']:,}")
+    print(f"Duplicates:  {report['duplicates']:,}")
+    print(f"Invalid IDs: {report['invalid']:,}")
+    print(f"Elapsed:     {report['elapsed']:.1f}s ({report['rows_per_s']:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Load test for the async serving path, over HTTP: the ASGI app (asgi.py
+under uvicorn) is started with 1, 2, 4, ... up to --max-workers crypto
+worker processes against a temporary database, and --clients concurrent
+"kiosks" each log a voter in (/login + /verify_otp, codes read from the
+file outbox) and cast a ballot with POST /api/vote (encrypt + prove in a
+worker, batch verification of the committed group in the workers too).
+Reports ballots/s and 503 rejections per pool size; the login phase is not
+timed. Throughput should grow with the number of cores.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.otp import FileOutbox
+
+def fmt_id(i):
+    s = f"{i:012d}"
+    return f"{s[:4]}-{s[4:8]}-{s[8:]}"
+
+def serve(db_path, port):
+    """Server process: the same ASGI stack as production, on a scratch database."""
+    db.DB_PATH = db_path
+    import uvicorn
+    from asgi import asgi_app
+    from src.workers import get_crypto_pool
+    from src.precompute import get_randomness_pool
+    try:
+        uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning")
+    finally:
+        get_crypto_pool().shutdown()
+        get_randomness_pool().stop()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class Kiosk:
+    """One voter's browser: cookie session against the test server."""
+    def __init__(self, base_url, outbox):
+        self.base_url = base_url
+        self.outbox = outbox
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def post(self, path, body):
+        request = urllib.request.Request(self.base_url + path, data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with self.opener.open(request, timeout=120) as resp:
+                return resp.status, json.loads(resp.read()), resp.headers
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}"), e.headers
+
+    def login(self, aadhaar):
+        status, body, _ = self.post("/login", {"aadhaar": aadhaar})
+        if body.get("status") != "otp_sent":
+            raise RuntimeError(f"Login failed for {aadhaar}: {status} {body}")
+        status, body, _ = self.post("/verify_otp", {"otp": self.outbox.latest(aadhaar)})
+        if body.get("status") != "success":
+            raise RuntimeError(f"OTP failed for {aadhaar}: {status} {body}")
+
+    def vote(self, vote, counters):
+        while True:
+            status, body, headers = self.post("/api/vote", {"vote": vote})
+            if status != 503:
+                break
+            # Backpressure: every crypto slot is taken
+            with counters["lock"]:
+                counters["rejected"] += 1
+            time.sleep(min(float(headers.get("Retry-After", 1)), 0.05))
+        if body.get("status") != "success":
+            raise RuntimeError(f"Vote failed: {status} {body}")
+
+def run_server(tmp, workers, voters):
+    db_path = os.path.join(tmp, f"load_test_{workers}.db")
+    roll = os.path.join(tmp, "roll.csv")
+    with open(roll, "w") as f:
+        f.write("aadhaar,name,phone\n")
+        f.writelines(f"{aadhaar},Voter {k},9{k:09d}\n" for k, aadhaar in enumerate(voters))
+    db.DB_PATH = db_path
+    from src.roll_import import import_roll
+    import_roll(roll)
+    db.close_db_connections()
+
+    outbox_path = os.path.join(tmp, f"outbox_{workers}.jsonl")
+    port = free_port()
+    env = dict(os.environ, CRYPTO_WORKERS=str(workers), OTP_DELIVERY="file", OTP_OUTBOX=outbox_path,
+               # Every kiosk connects from 127.0.0.1: lift the per-IP login limit
+               OTP_IP_BURST=str(10 ** 9), OTP_IP_RATE=str(10 ** 9))
+    server = subprocess.Popen([sys.executable, __file__, "--serve", db_path, "--port", str(port)],
+                              env=env, cwd=os.path.join(os.path.dirname(__file__), '../backend'),
+                              stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while True:
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1).read()
+            break
+        except OSError:
+            if server.poll() is not None or time.time() > deadline:
+                server.kill()
+                raise RuntimeError("Test server did not start")
+            time.sleep(0.2)
+    return server, base_url, FileOutbox(outbox_path)
+
+def cast_all(base_url, outbox, voters, clients, counters):
+    kiosks = [Kiosk(base_url, outbox) for _ in voters]
+    with ThreadPoolExecutor(clients) as ex:
+        list(ex.map(lambda pair: pair[0].login(pair[1]), zip(kiosks, voters)))
+        start = time.perf_counter()
+        list(ex.map(lambda k: kiosks[k].vote(k % 2, counters), range(len(kiosks))))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ballots", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent kiosks")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--serve", metavar="DB", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve, args.port)
+
+    sizes = []
+    workers = 1
+    while workers < args.max_workers:
+        sizes.append(workers)
+        workers *= 2
+    sizes.append(args.max_workers)
+
+    print(f"--- LOAD TEST: {args.ballots} ballots over HTTP, {args.clients} concurrent kiosks ---")
+    print(f"{'workers':>8}{'ballots/s':>12}{'elapsed (s)':>13}{'rejected':>10}")
+    baseline = None
+    for workers in sizes:
+        voters = [fmt_id(10 ** 11 + i) for i in range(workers + args.ballots)]
+        with tempfile.TemporaryDirectory() as tmp:
+            server, base_url, outbox = run_server(tmp, workers, voters)
+            try:
+                # Warm up: start the worker processes before timing
+                cast_all(base_url, outbox, voters[:workers], workers, {"rejected": 0, "lock": threading.Lock()})
+                counters = {"rejected": 0, "lock": threading.Lock()}
+                elapsed = cast_all(base_url, outbox, voters[workers:], args.clients, counters)
+            finally:
+                # SIGINT unwinds through serve(), which shuts the pools down
+                server.send_signal(signal.SIGINT)
+                server.wait()
+        rate = args.ballots / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8}{rate:>12.1f}{elapsed:>13.2f}{counters['rejected']:>10}   ({rate / baseline:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Login storm: --voters distinct voters run /login + /verify_otp against the
+Flask app (test client, temporary database) with OTP_DELIVERY=queue, so
+codes are read from the in-memory outbox instead of scraping logs. Each
+voter comes from its own client IP; a second phase has one IP hammer
+/login until its token bucket answers 429. Reports logins/s, the session
+cookie size and the OTP store's footprint.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+os.environ.setdefault("OTP_DELIVERY", "queue")
+
+import src.db as db
+
+def fmt_id(i):
+    s = f"{i:012d}"
+    return f"{s[:4]}-{s[4:8]}-{s[8:]}"
+
+def session_cookie_size(client):
+    cookie = client.get_cookie("session")
+    return len(cookie.value) if cookie else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voters", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "storm.db")
+        roll = os.path.join(tmp, "roll.csv")
+        ids = [fmt_id(10**11 + i) for i in range(args.voters)]
+        with open(roll, "w") as f:
+            f.write("aadhaar,name,phone\n")
+            f.writelines(f"{aadhaar},Voter {k},9{k:09d}\n" for k, aadhaar in enumerate(ids))
+
+        from src.roll_import import import_roll
+        from src.eligibility import reload_eligibility_index
+        import_roll(roll)
+        reload_eligibility_index()
+
+        import app as appmod
+        from src.otp import get_otp_store
+        app = appmod.app
+        app.config['TESTING'] = True
+        store = get_otp_store()
+
+        print(f"Logging in {args.voters:,} voters...")
+        cookie_sizes = set()
+        failures = 0
+        start = time.perf_counter()
+        for k, aadhaar in enumerate(ids):
+            client = app.test_client()
+            env = {"REMOTE_ADDR": f"10.{k >> 16 & 255}.{k >> 8 & 255}.{k & 255}"}
+            r = client.post('/login', json={'aadhaar': aadhaar}, environ_base=env)
+            if r.status_code != 200:
+                failures += 1
+                continue
+            cookie_sizes.add(session_cookie_size(client))
+            code = store.delivery.latest(aadhaar)
+            r = client.post('/verify_otp', json={'otp': code}, environ_base=env)
+            if r.status_code != 200:
+                failures += 1
+        elapsed = time.perf_counter() - start
+        print(f"  {args.voters / elapsed:,.0f} logins/s ({failures} failed), "
+              f"session cookie {min(cookie_sizes)}-{max(cookie_sizes)} bytes while the OTP is pending")
+
+        # One client IP tries every ID: the per-IP bucket cuts it off
+        client = app.test_client()
+        env = {"REMOTE_ADDR": "192.0.2.1"}
+        attempts = 0
+        while attempts < len(ids):
+            r = client.post('/login', json={'aadhaar': ids[attempts]}, environ_base=env)
+            attempts += 1
+            if r.status_code == 429:
+                print(f"  single IP: 429 after {attempts} attempts (Retry-After {r.headers['Retry-After']}s)")
+                break
+        print(f"  OTP store: {store.stats()}, outbox holds {len(store.delivery.messages):,} messages")
+        db.close_db_connections()
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,74 @@
-import json
+import argparse
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
 
+import src.db as db
 from src.keygen import load_public_key
-from src.zkp import ZKPVerifier
+from src.audit import audit_ledger, audit_running_tally
 
-def run_audit():
+def print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed else 0.0
+    pct = 100.0 * done / total if total else 100.0
+    print(f"    {done}/{total} proofs ({pct:5.1f}%)  {rate:8.1f} ballots/s", flush=True)
+
+def run_audit(db_path=None, workers=None, chunk_size=2000, check_tally=False):
     print("\n--- INDEPENDENT PUBLIC AUDIT ---\n")
     
     # 1. Load Public Data
     print("[1] Loading Public Key...")
     public_key = load_public_key()
-    verifier = ZKPVerifier(public_key)
     
-    print("[2] Loading Bulletin Board (the 'Blockchain')...")
-    try:
-        # Since BB code handles loading, we should ideally use BB class, 
-        # but for independent audit we read file directly.
-        # We need to find the backend dir.
-        backend_dir = os.path.join(os.path.dirname(__file__), '../backend')
-        bb_path = os.path.join(backend_dir, "bb.json")
-        with open(bb_path, "r") as f:
-            ledger = json.load(f)
-    except FileNotFoundError:
+    print("[2] Opening Bulletin Board (SQLite ledger)...")
+    if db_path:
+        db.DB_PATH = db_path
+    if not os.path.exists(db.DB_PATH):
         print("Error: No ledger found to audit.")
-        return
+        return None
+    print(f"    {db.DB_PATH}")
 
-    print(f"[3] Verifying {len(ledger)} Blocks...")
-    
-    valid_count = 0
-    invalid_count = 0
-    
-    for entry in ledger:
-        idx = entry['index']
-        ballot = entry['ballot']
-        c_int = int(ballot['ciphertext'])
-        proof = ballot['proof']
-        
-        # Verify specific proof
-        if verifier.verify(c_int, proof):
-            valid_count += 1
-            # print(f"    Block {idx}: ✓ Verified")
-        else:
-            invalid_count += 1
-            print(f"    Block {idx}: ❌ FAILED VERIFICATION")
+    print(f"[3] Verifying ZKPs on {workers or os.cpu_count()} worker processes, "
+          f"hash chain and Merkle roots in parallel...")
+    report = audit_ledger(public_key, workers=workers, chunk_size=chunk_size,
+                          on_progress=print_progress)
+
+    if check_tally:
+        print("[4] Recomputing the running encrypted tally from scratch...")
+        tally = audit_running_tally(public_key, workers=workers)
+        report['tally'] = tally
+        report['valid'] = report['valid'] and tally['match']
+        status = "✓ matches" if tally['match'] else "❌ DOES NOT MATCH"
+        print(f"    Stored product over {tally['checkpoint_ballots']} of "
+              f"{tally['ledger_ballots']} ballots: {status}")
+
+    for idx in report['invalid_proofs'][:20]:
+        print(f"    Block {idx}: ❌ FAILED VERIFICATION")
+    for err in report['chain_errors'][:20]:
+        print(f"    Block {err['block']}: ❌ {err['error']}")
     
     print("\n" + "="*30)
     print("AUDIT RESULTS")
     print("="*30)
-    print(f"Total Block Processed: {len(ledger)}")
-    print(f"Valid Ballots:         {valid_count}")
-    print(f"Invalid Ballots:       {invalid_count}")
+    print(f"Total Block Processed: {report['blocks']}")
+    print(f"Valid Ballots:         {report['proofs_checked'] - len(report['invalid_proofs'])}")
+    print(f"Invalid Ballots:       {len(report['invalid_proofs'])}")
+    print(f"Chain/Merkle Errors:   {len(report['chain_errors'])}")
+    print(f"Chain Head:            {report['head']}")
+    print(f"Merkle Root:           {report['merkle_root']}")
+    print(f"Elapsed:               {report['elapsed']:.2f}s "
+          f"({report['throughput']:.1f} ballots/s, {report['workers']} workers)")
     
-    if invalid_count == 0:
+    if report['valid']:
         print("\n✅ ELECTION INTEGRITY CONFIRMED")
     else:
         print("\n❌ ELECTION COMPROMISED")
+    return report
 
 if __name__ == "__main__":
-    run_audit()
+    parser = argparse.ArgumentParser(description="Public audit of the ballot ledger")
+    parser.add_argument("db_path", nargs="?", help="ledger database (default: backend/secure_voting.db)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="ballots per worker task")
+    parser.add_argument("--tally", action="store_true", help="also check the stored running tally")
+    args = parser.parse_args()
+    run_audit(args.db_path, args.workers, args.chunk_size, args.tally)
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import src.db as db
+from src.audit import verify_chain, iter_chain_rows
+
+def run_chain_check(db_path=None):
+    print("\n--- OFFLINE HASH-CHAIN CHECK ---\n")
+    if db_path:
+        db.DB_PATH = db_path
+    print(f"[1] Ledger: {db.DB_PATH}")
+    if not os.path.exists(db.DB_PATH):
+        print("Error: No ledger found to audit.")
+        return None
+
+    start = time.time()
+    report = verify_chain(iter_chain_rows())
+    dt = time.time() - start
+
+    print(f"[2] Checked {report['blocks']} blocks in {dt:.2f}s")
+    for err in report['errors'][:20]:
+        print(f"    Block {err['block']}: ❌ {err['error']}")
+    if len(report['errors']) > 20:
+        print(f"    ... {len(report['errors']) - 20} more")
+
+    print(f"\nChain Head: {report['head']}")
+    if report['valid']:
+        print("✅ HASH CHAIN INTACT")
+    else:
+        print("❌ HASH CHAIN BROKEN")
+    return report
+
+if __name__ == "__main__":
+    run_chain_check(sys.argv[1] if len(sys.argv) > 1 else None)